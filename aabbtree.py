@@ -0,0 +1,361 @@
+"""Dynamiczne drzewo AABB (BVH) z poszerzonymi prostokątami: ciała można
+wstawiać i usuwać pojedynczo, bez przebudowy całości, przy dowolnie
+różnych promieniach.
+
+    tree = AABBTree(margin=2.0)
+    proxy = tree.insert(ball, x - r, y - r, x + r, y + r)
+    tree.move(proxy, x - r, y - r, x + r, y + r, vx * dt, vy * dt)
+    tree.update_pairs()
+    for a, b in tree.pairs: ...              # numery liści, a < b
+    tree.remove(proxy)
+
+Liść trzyma prostokąt poszerzony o margin i wydłużony w kierunku ruchu, więc
+move() przebudowuje drzewo tylko wtedy, gdy ciało wyjdzie poza swój zapas.
+Nowe liście wstawiane są tam, gdzie najmniej rośnie suma obwodów węzłów, a
+rotacje jak w drzewie AVL trzymają wysokość rzędu log n. Zbiór par
+nakładających się liści jest trwały: update_pairs() sprawdza tylko liście
+przeniesione od poprzedniego wywołania.
+
+W czystym Pythonie drzewo jest wolniejsze od Sweep & Prune także przy
+ciągłej wymianie kulek (zadanie3.py --churn) - zysk to mniej kandydatów
+dla fazy wąskiej, nie kroki/s.
+
+    python aabbtree.py --check      # pary zgodne z porównaniem każdy z każdym
+"""
+import sys
+import random
+import argparse
+
+NULL = -1
+
+class AABBTree:
+    def __init__(self, margin=2.0, predict=4.0):
+        self.margin = margin
+        # prostokąt wydłużany o predict przemieszczeń z move()
+        self.predict = predict
+        self.root = NULL
+        self.boxes = []  # [lo_x, lo_y, hi_x, hi_y]
+        self.parent, self.child1, self.child2, self.height, self.item = [], [], [], [], []
+        self._free = []
+        self.leaves = 0
+        # słowniki zamiast zbiorów: kolejność par to kolejność ich powstania,
+        # niezależna od haszy - od kolejności par zależy wynik rozwiązywania zderzeń
+        self.moved = {}
+        self.pairs = {}
+        self.partners = {}
+        self.reinserts = 0
+
+    # --- węzły ---
+    def _allocate(self):
+        if self._free:
+            node = self._free.pop()
+        else:
+            node = len(self.boxes)
+            for nodes in (self.boxes, self.parent, self.child1, self.child2, self.height, self.item):
+                nodes.append(None)
+        self.boxes[node] = [0.0, 0.0, 0.0, 0.0]
+        self.parent[node] = self.child1[node] = self.child2[node] = NULL
+        self.height[node] = 0
+        self.item[node] = None
+        return node
+
+    def _release(self, node):
+        self.item[node] = None
+        self.height[node] = -1
+        self._free.append(node)
+
+    def _union(self, node, a, b):
+        """Prostokąt i wysokość node z dzieci a, b; True, gdy się zmieniły."""
+        ba, bb = self.boxes[a], self.boxes[b]
+        box = [ba[0] if ba[0] < bb[0] else bb[0], ba[1] if ba[1] < bb[1] else bb[1],
+               ba[2] if ba[2] > bb[2] else bb[2], ba[3] if ba[3] > bb[3] else bb[3]]
+        ha, hb = self.height[a], self.height[b]
+        height = 1 + (ha if ha > hb else hb)
+        if box == self.boxes[node] and height == self.height[node]:
+            return False
+        self.boxes[node] = box
+        self.height[node] = height
+        return True
+
+    # --- API ---
+    def insert(self, item, lo_x, lo_y, hi_x, hi_y):
+        """Nowy liść dla item; zwraca jego numer (proxy)."""
+        leaf = self._allocate()
+        m = self.margin
+        self.boxes[leaf] = [lo_x - m, lo_y - m, hi_x + m, hi_y + m]
+        self.item[leaf] = item
+        self._insert_leaf(leaf)
+        self.leaves += 1
+        self.partners[leaf] = set()
+        self.moved[leaf] = None
+        return leaf
+
+    def remove(self, proxy):
+        self._remove_leaf(proxy)
+        self._release(proxy)
+        self.leaves -= 1
+        self.moved.pop(proxy, None)
+        for other in self.partners.pop(proxy):
+            self.partners[other].discard(proxy)
+            self.pairs.pop((proxy, other) if proxy < other else (other, proxy), None)
+
+    def move(self, proxy, lo_x, lo_y, hi_x, hi_y, dx=0.0, dy=0.0):
+        """Nowy ciasny prostokąt liścia i przemieszczenie na krok. Zwraca True,
+        gdy liść trzeba było przenieść (wyszedł poza poszerzony prostokąt)."""
+        box = self.boxes[proxy]
+        if box[0] <= lo_x and box[1] <= lo_y and hi_x <= box[2] and hi_y <= box[3]:
+            return False
+        self._remove_leaf(proxy)
+        m = self.margin
+        lo_x, lo_y, hi_x, hi_y = lo_x - m, lo_y - m, hi_x + m, hi_y + m
+        dx, dy = self.predict * dx, self.predict * dy
+        if dx < 0:
+            lo_x += dx
+        else:
+            hi_x += dx
+        if dy < 0:
+            lo_y += dy
+        else:
+            hi_y += dy
+        self.boxes[proxy] = [lo_x, lo_y, hi_x, hi_y]
+        self._insert_leaf(proxy)
+        self.moved[proxy] = None
+        self.reinserts += 1
+        return True
+
+    def query(self, lo_x, lo_y, hi_x, hi_y):
+        """Liście, których poszerzone prostokąty przecinają podany."""
+        found = []
+        boxes, child1, child2 = self.boxes, self.child1, self.child2
+        # na stos trafiają tylko węzły, których prostokąt przecina zapytanie
+        stack = []
+        if self.root != NULL:
+            b = boxes[self.root]
+            if b[0] <= hi_x and lo_x <= b[2] and b[1] <= hi_y and lo_y <= b[3]:
+                stack.append(self.root)
+        while stack:
+            node = stack.pop()
+            c1 = child1[node]
+            if c1 == NULL:
+                found.append(node)
+                continue
+            b = boxes[c1]
+            if b[0] <= hi_x and lo_x <= b[2] and b[1] <= hi_y and lo_y <= b[3]:
+                stack.append(c1)
+            c2 = child2[node]
+            b = boxes[c2]
+            if b[0] <= hi_x and lo_x <= b[2] and b[1] <= hi_y and lo_y <= b[3]:
+                stack.append(c2)
+        return found
+
+    def update_pairs(self):
+        """Aktualizuje pairs dla liści przeniesionych od ostatniego wywołania;
+        pary pozostałych liści nie mogły się zmienić."""
+        boxes, pairs, partners, moved = self.boxes, self.pairs, self.partners, self.moved
+        for a in moved:
+            ba = boxes[a]
+            # stare pary, których prostokąty już się rozeszły
+            for b in [b for b in partners[a]
+                      if not (boxes[b][0] <= ba[2] and ba[0] <= boxes[b][2]
+                              and boxes[b][1] <= ba[3] and ba[1] <= boxes[b][3])]:
+                partners[a].discard(b)
+                partners[b].discard(a)
+                pairs.pop((a, b) if a < b else (b, a), None)
+            for b in self.query(*ba):
+                # para dwóch przeniesionych liści wychodzi z zapytania każdego z nich
+                if b == a or (b in moved and b < a):
+                    continue
+                key = (a, b) if a < b else (b, a)
+                if key not in pairs:
+                    pairs[key] = None
+                    partners[a].add(b)
+                    partners[b].add(a)
+        moved.clear()
+        return pairs
+
+    def item_pairs(self):
+        item = self.item
+        return [(item[a], item[b]) for a, b in self.update_pairs()]
+
+    # --- wstawianie, usuwanie i równoważenie ---
+    def _insert_leaf(self, leaf):
+        if self.root == NULL:
+            self.root = leaf
+            self.parent[leaf] = NULL
+            return
+        boxes, child1, child2 = self.boxes, self.child1, self.child2
+        lb = boxes[leaf]
+
+        lx, ly, hx, hy = lb
+
+        def grown(node):
+            # obwód sumy prostokątów liścia i węzła
+            b = boxes[node]
+            return 2 * ((b[2] if b[2] > hx else hx) - (b[0] if b[0] < lx else lx)
+                        + (b[3] if b[3] > hy else hy) - (b[1] if b[1] < ly else ly))
+
+        def perimeter(node):
+            b = boxes[node]
+            return 2 * (b[2] - b[0] + b[3] - b[1])
+
+        # zejście po najtańszej ścieżce (heurystyka obwodów, jak w Box2D)
+        index = self.root
+        while child1[index] != NULL:
+            combined = grown(index)
+            cost = 2 * combined
+            inheritance = 2 * (combined - perimeter(index))
+            c1, c2 = child1[index], child2[index]
+            cost1 = grown(c1) + inheritance - (perimeter(c1) if child1[c1] != NULL else 0)
+            cost2 = grown(c2) + inheritance - (perimeter(c2) if child1[c2] != NULL else 0)
+            if cost < cost1 and cost < cost2:
+                break
+            index = c1 if cost1 < cost2 else c2
+
+        sibling = index
+        old_parent = self.parent[sibling]
+        new_parent = self._allocate()
+        self.parent[new_parent] = old_parent
+        child1[new_parent], child2[new_parent] = sibling, leaf
+        self._union(new_parent, sibling, leaf)
+        self.parent[sibling] = self.parent[leaf] = new_parent
+        if old_parent == NULL:
+            self.root = new_parent
+        elif child1[old_parent] == sibling:
+            child1[old_parent] = new_parent
+        else:
+            child2[old_parent] = new_parent
+        self._refit(old_parent)
+
+    def _remove_leaf(self, leaf):
+        if leaf == self.root:
+            self.root = NULL
+            return
+        parent = self.parent[leaf]
+        grand = self.parent[parent]
+        sibling = self.child2[parent] if self.child1[parent] == leaf else self.child1[parent]
+        self.parent[sibling] = grand
+        if grand == NULL:
+            self.root = sibling
+        else:
+            if self.child1[grand] == parent:
+                self.child1[grand] = sibling
+            else:
+                self.child2[grand] = sibling
+        self._release(parent)
+        self._refit(grand)
+
+    def _refit(self, index):
+        # w górę od index: rotacje, potem prostokąt i wysokość z dzieci; gdy
+        # węzeł się nie zmienił, przodkowie też już są aktualni
+        while index != NULL:
+            balanced = self._balance(index)
+            changed = self._union(balanced, self.child1[balanced], self.child2[balanced])
+            if balanced == index and not changed:
+                break
+            index = self.parent[balanced]
+
+    def _balance(self, a):
+        """Rotacja, gdy wysokości poddrzew a różnią się o więcej niż 1;
+        zwraca węzeł, który zajął miejsce a."""
+        child1, child2, parent, height = self.child1, self.child2, self.parent, self.height
+        if child1[a] == NULL or height[a] < 2:
+            return a
+        b, c = child1[a], child2[a]
+        balance = height[c] - height[b]
+        if -1 <= balance <= 1:
+            return a
+        # wyższe dziecko (up) idzie w górę, jego niższe dziecko przechodzi do a
+        up, stay = (c, b) if balance > 1 else (b, c)
+        f, g = child1[up], child2[up]
+        child1[up] = a
+        parent[up] = parent[a]
+        parent[a] = up
+        if parent[up] == NULL:
+            self.root = up
+        elif child1[parent[up]] == a:
+            child1[parent[up]] = up
+        else:
+            child2[parent[up]] = up
+        keep, give = (f, g) if height[f] > height[g] else (g, f)
+        child2[up] = keep
+        if balance > 1:
+            child2[a] = give
+        else:
+            child1[a] = give
+        parent[give] = a
+        self._union(a, stay, give)
+        self._union(up, a, keep)
+        return up
+
+    def validate(self):
+        """Spójność drzewa: rodzice, wysokości, prostokąty węzłów zawierają dzieci."""
+        if self.root == NULL:
+            assert self.leaves == 0
+            return
+        assert self.parent[self.root] == NULL
+        leaves = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            c1, c2 = self.child1[node], self.child2[node]
+            if c1 == NULL:
+                assert c2 == NULL and self.height[node] == 0
+                leaves += 1
+                continue
+            assert self.parent[c1] == node and self.parent[c2] == node
+            assert self.height[node] == 1 + max(self.height[c1], self.height[c2])
+            b = self.boxes[node]
+            for c in (c1, c2):
+                bc = self.boxes[c]
+                assert b[0] <= bc[0] and b[1] <= bc[1] and bc[2] <= b[2] and bc[3] <= b[3]
+            stack += [c1, c2]
+        assert leaves == self.leaves
+
+# --- sprawdzenie ---
+def check(n=400, steps=200, seed=0):
+    """Losowe wstawianie, usuwanie i ruch; pairs porównywane z testem każdy z każdym."""
+    rng = random.Random(seed)
+    tree = AABBTree(margin=1.0)
+    bodies = {}
+
+    def spawn():
+        x, y, r = rng.uniform(0, 500), rng.uniform(0, 500), rng.choice((0.5, 2, 5, 40))
+        body = [x, y, r, rng.uniform(-3, 3), rng.uniform(-3, 3)]
+        bodies[tree.insert(id(body), x - r, y - r, x + r, y + r)] = body
+
+    for _ in range(n):
+        spawn()
+    for step in range(steps):
+        for proxy in rng.sample(sorted(bodies), n // 20):
+            tree.remove(proxy)
+            del bodies[proxy]
+        for _ in range(n // 20):
+            spawn()
+        for proxy, body in bodies.items():
+            body[0] += body[3]
+            body[1] += body[4]
+            x, y, r = body[:3]
+            tree.move(proxy, x - r, y - r, x + r, y + r, body[3], body[4])
+        pairs = tree.update_pairs()
+        boxes = tree.boxes
+        proxies = sorted(bodies)
+        expected = {(a, b) for k, a in enumerate(proxies) for b in proxies[k + 1:]
+                    if boxes[a][0] <= boxes[b][2] and boxes[b][0] <= boxes[a][2]
+                    and boxes[a][1] <= boxes[b][3] and boxes[b][1] <= boxes[a][3]}
+        tree.validate()
+        if pairs.keys() != expected:
+            print(f"krok {step}: pary {len(pairs)} / {len(expected)} | RÓŻNE")
+            return False
+    print(f"liście: {tree.leaves} | kroki: {steps} | przeniesienia: {tree.reinserts} "
+          f"| wysokość: {tree.height[tree.root]} | pary: {len(tree.pairs)} | OK")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dynamiczne drzewo AABB")
+    parser.add_argument("--check", action="store_true", help="porównaj pary z testem każdy z każdym")
+    parser.add_argument("--bodies", type=int, default=400)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check(args.bodies, args.steps) else 1)
+    parser.print_help()
@@ -0,0 +1,204 @@
+"""Benchmark wszystkich trzech symulacji: kroki/s i ns na ciało-krok w funkcji N.
+
+    python benchmark.py                          # pomiar -> benchmark_results.json
+    python benchmark.py --save-baseline          # pomiar zapisany jako punkt odniesienia
+    python benchmark.py --baseline benchmark_baseline.json --threshold 0.2
+
+Przy porównaniu z punktem odniesienia kod wyjścia 1 oznacza, że któryś
+przypadek zwolnił o więcej niż threshold (0.2 = 20%).
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import zadanie1
+import zadanie2
+import zadanie3
+import kernels
+
+# --- rejestr przypadków ---
+CASES = {}
+
+def case(name, counts, quick_counts, steps_per_call=1):
+    """Rejestruje przypadek: setup(n) zwraca funkcję wykonującą jedno wywołanie.
+    steps_per_call - ile kroków symulacji robi jedno wywołanie (np. podkroki)."""
+    def register(setup):
+        CASES[name] = (setup, counts, quick_counts, steps_per_call)
+        return setup
+    return register
+
+def seed(value=12345):
+    random.seed(value)
+    np.random.seed(value)
+
+# --- zadanie1: RK4 + domek, pełny krok ---
+@case("zadanie1.integrate_house", (100, 1000, 10_000, 100_000), (100, 10_000))
+def _zadanie1_integrate_house(n):
+    seed()
+    scene = zadanie1.BallScene(n, layout="random")
+    balls = scene.balls
+    def step():
+        balls.pos, balls.vel = zadanie1.rk4_step(balls.pos, balls.vel, scene.dt, zadanie1.acceleration)
+        zadanie1.collide_house(balls, scene.segment_coords, scene.segment_index)
+        zadanie1.bounce_walls(balls)
+    return step
+
+@case("zadanie1.step", (100, 1000, 10_000), (100, 1000))
+def _zadanie1_step(n):
+    seed()
+    return zadanie1.BallScene(n, layout="random").step
+
+# --- zadanie2: simulate(), jedno wywołanie = num_steps podkroków ---
+@case("zadanie2.simulate.objects", (5, 20, 50), (5, 20), steps_per_call=100)
+def _zadanie2_objects(n):
+    seed()
+    scene = zadanie2.PhysicsScene("objects")
+    zadanie2.setup_scene(800, 600, n, scene)
+    return scene.step
+
+@case("zadanie2.simulate.arrays", (5, 50, 500, 5000), (5, 500), steps_per_call=100)
+def _zadanie2_arrays(n):
+    seed()
+    scene = zadanie2.PhysicsScene("arrays")
+    zadanie2.setup_scene(800, 600, n, scene)
+    return scene.step
+
+@case("zadanie2.simulate.angles", (5, 50, 500, 5000), (5, 500), steps_per_call=zadanie2.PhysicsScene().angle_steps)
+def _zadanie2_angles(n):
+    seed()
+    scene = zadanie2.PhysicsScene("angles")
+    zadanie2.setup_scene(800, 600, n, scene)
+    return scene.step
+
+# --- zadanie3: sama detekcja (broad-phase) i pełny krok z rozwiązywaniem ---
+def _broadphase(detect):
+    def setup(n):
+        seed()
+        circles = [zadanie3.Circle(random.random()*1000, random.random()*1000,
+                                   random.uniform(2, 8)) for _ in range(n)]
+        return lambda: detect(circles)
+    return setup
+
+for _name, _detect in zadanie3.DETECTORS.items():
+    if _name == "Brute Force":
+        case("zadanie3.broadphase." + _name, (200, 1000), (200,))(_broadphase(_detect))
+    else:
+        case("zadanie3.broadphase." + _name, (200, 1000, 5000), (200, 1000))(_broadphase(_detect))
+
+def _resolve(algorithm):
+    def setup(n):
+        seed()
+        scene = zadanie3.BallSimScene(n, algorithm=algorithm)
+        return scene.step
+    return setup
+
+for _algorithm in list(zadanie3.RESOLVERS) + ["auto"]:
+    if _algorithm == "brute":
+        case("zadanie3.resolve." + _algorithm, (200,), (200,))(_resolve(_algorithm))
+    else:
+        case("zadanie3.resolve." + _algorithm, (200, 1000, 3000), (200, 1000))(_resolve(_algorithm))
+
+# --- pomiar ---
+def measure(call, min_time=0.2, repeats=3):
+    # rozgrzewka i dobór liczby wywołań na rundę; wynik to najlepsza runda
+    t0 = time.perf_counter()
+    call()
+    single = max(time.perf_counter() - t0, 1e-9)
+    calls = max(1, int(min_time / single))
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            call()
+        best = min(best, (time.perf_counter() - t0) / calls)
+    return best
+
+def run(quick=False, selected=None, min_time=0.2, repeats=3):
+    results = {}
+    for name, (setup, counts, quick_counts, steps_per_call) in CASES.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        for n in (quick_counts if quick else counts):
+            seconds = measure(setup(n), min_time, repeats)
+            steps_per_s = steps_per_call / seconds
+            key = f"{name}[n={n}]"
+            results[key] = {
+                "case": name,
+                "n": n,
+                "steps_per_s": steps_per_s,
+                "ns_per_body_step": seconds / (steps_per_call * n) * 1e9,
+            }
+            print(f"{key:45s} | {steps_per_s:12.1f} kroków/s | {results[key]['ns_per_body_step']:10.1f} ns/ciało-krok")
+    return results
+
+def compare(results, baseline, threshold):
+    # zwraca listę przypadków, które zwolniły o więcej niż threshold
+    slower = []
+    print(f"\n=== Porównanie z punktem odniesienia (próg {threshold:.0%}) ===")
+    for key, current in results.items():
+        ref = baseline.get(key)
+        if ref is None:
+            continue
+        change = ref["steps_per_s"] / current["steps_per_s"] - 1
+        flag = "ZWOLNIENIE" if change > threshold else ""
+        print(f"{key:45s} | {ref['steps_per_s']:12.1f} -> {current['steps_per_s']:12.1f} kroków/s | {-change:+7.1%} {flag}")
+        if change > threshold:
+            slower.append(key)
+    return slower
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        # jądra numba zmieniają czasy zadanie2.arrays i SAP NumPy - bez tego wyniki są nieporównywalne
+        "kernels": f"numba {kernels.numba.__version__}" if kernels.enabled else "numpy",
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark symulacji zadanie1-3")
+    parser.add_argument("--output", default="benchmark_results.json", help="plik JSON z wynikami")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="wyniki odniesienia do porównania")
+    parser.add_argument("--save-baseline", action="store_true", help="zapisz wyniki jako punkt odniesienia")
+    parser.add_argument("--threshold", type=float, default=0.2, help="dopuszczalne zwolnienie (0.2 = 20%%)")
+    parser.add_argument("--quick", action="store_true", help="mniej rozmiarów N")
+    parser.add_argument("--only", nargs="*", help="tylko przypadki zawierające te napisy")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimalny czas rundy [s]")
+    parser.add_argument("--repeats", type=int, default=3, help="liczba rund (brana najlepsza)")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.only, args.min_time, args.repeats)
+    report = {"environment": environment(), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWyniki zapisane w {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Punkt odniesienia zapisany w {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Brak {args.baseline} - pomijam porównanie (utwórz go przez --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    slower = compare(results, baseline, args.threshold)
+    if slower:
+        print(f"\nZwolniło {len(slower)} przypadków powyżej progu")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
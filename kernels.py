@@ -0,0 +1,451 @@
+"""Opcjonalne jądra kompilowane (Numba) dla fragmentów, które źle się
+wektoryzują: przejście Sweep & Prune po liście aktywnych przedziałów,
+sekwencyjne łańcuchy resolve() i collide_balls() oraz pętle podkroków
+z zadanie2 (XPBD i kąty).
+
+Bez numby enabled = False i zadanie1-3 zostają przy ścieżkach NumPy;
+z numbą można je wyłączyć, ustawiając kernels.enabled = False.
+
+    python kernels.py check    # oba backendy dają te same wyniki
+    python kernels.py bench    # przyspieszenie każdego jądra
+"""
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+enabled = numba is not None
+
+def _jit(func):
+    # bez numby funkcja zostaje zwykłym Pythonem - wywołujący i tak jej wtedy nie używają
+    if numba is None:
+        return func
+    return numba.njit(cache=True, nogil=True)(func)
+
+# --- Sweep & Prune ---
+@_jit
+def sap_walk(order, left, right, x, y, r):
+    """Przedziały [left, right] posortowane (order - indeksy kół w tej
+    kolejności). Dla każdego koła idzie po kolejnych, dopóki ich lewy koniec
+    < prawy koniec bieżącego. Zwraca (candidates, collisions) jako (K,2)
+    z i < j w wierszu, w kolejności przemiatania - jak _ordered_pairs
+    w sweep_and_prune_pairs, więc bez osobnego sortowania wierszy."""
+    n = len(order)
+    total = 0
+    for a in range(n):
+        b = a + 1
+        while b < n and left[b] < right[a]:
+            b += 1
+        total += b - a - 1
+    candidates = np.empty((total, 2), np.intp)
+    hit = np.empty(total, np.bool_)
+    k = 0
+    for a in range(n):
+        i = order[a]
+        b = a + 1
+        while b < n and left[b] < right[a]:
+            j = order[b]
+            dx = x[i] - x[j]
+            dy = y[i] - y[j]
+            candidates[k, 0] = min(i, j)
+            candidates[k, 1] = max(i, j)
+            hit[k] = dx * dx + dy * dy < (r[i] + r[j]) ** 2
+            k += 1
+            b += 1
+    return candidates, candidates[hit]
+
+# --- łańcuch resolve() ---
+@_jit
+def resolve_chain(x, y, vx, vy, r, mass, pairs):
+    """resolve() dla par po kolei, jak pętla na obiektach BallSim; tablice
+    zmieniane w miejscu. Zwraca maskę par, które zostały rozwiązane."""
+    resolved = np.zeros(len(pairs), np.bool_)
+    for k in range(len(pairs)):
+        i = pairs[k, 0]
+        j = pairs[k, 1]
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        dist = math.hypot(dx, dy)
+        if dist == 0 or dist >= r[i] + r[j]:
+            continue
+        nx = dx / dist
+        ny = dy / dist
+        vn = (vx[j] - vx[i]) * nx + (vy[j] - vy[i]) * ny
+        if vn > 0:
+            continue
+        jn = -(1 + 1.0) * vn / (1 / mass[i] + 1 / mass[j])
+        vx[i] -= (jn * nx) / mass[i]
+        vy[i] -= (jn * ny) / mass[i]
+        vx[j] += (jn * nx) / mass[j]
+        vy[j] += (jn * ny) / mass[j]
+        overlap = (r[i] + r[j] - dist) / 2
+        x[i] -= overlap * nx
+        y[i] -= overlap * ny
+        x[j] += overlap * nx
+        y[j] += overlap * ny
+        resolved[k] = True
+    return resolved
+
+# --- zderzenia kulek (zadanie1) ---
+@_jit
+def _collide_pair(pos, vel, radius, mass, i, j):
+    # collide_balls z zadanie1; zwraca True, jeśli kulki zostały rozsunięte
+    dx = pos[j, 0] - pos[i, 0]
+    dy = pos[j, 1] - pos[i, 1]
+    dist = math.hypot(dx, dy)
+    min_dist = radius[i] + radius[j]
+    if dist == 0 or dist >= min_dist:
+        return False
+    nx = dx / dist
+    ny = dy / dist
+    overlap = (min_dist - dist) / 2
+    pos[i, 0] -= nx * overlap
+    pos[i, 1] -= ny * overlap
+    pos[j, 0] += nx * overlap
+    pos[j, 1] += ny * overlap
+    v1n = vel[i, 0] * nx + vel[i, 1] * ny
+    v2n = vel[j, 0] * nx + vel[j, 1] * ny
+    m1 = mass[i]
+    m2 = mass[j]
+    v1n_new = (v1n * (m1 - m2) + 2 * m2 * v2n) / (m1 + m2)
+    v2n_new = (v2n * (m2 - m1) + 2 * m1 * v1n) / (m1 + m2)
+    vel[i, 0] += (v1n_new - v1n) * nx
+    vel[i, 1] += (v1n_new - v1n) * ny
+    vel[j, 0] += (v2n_new - v2n) * nx
+    vel[j, 1] += (v2n_new - v2n) * ny
+    return True
+
+@_jit
+def _cell_slot(keys, used, key):
+    # otwarte adresowanie: szczelina klucza key albo pierwsza wolna za nim
+    mask = len(keys) - 1
+    h = (np.uint64(key) * np.uint64(11400714819323198485)) >> np.uint64(40)
+    s = np.intp(h) & mask
+    while used[s] and keys[s] != key:
+        s = (s + 1) & mask
+    return s
+
+@_jit
+def _cell_key(pos, k, cell):
+    cx = np.int64(math.floor(pos[k, 0] / cell))
+    cy = np.int64(math.floor(pos[k, 1] / cell))
+    return (cx << 32) ^ (cy & 0xFFFFFFFF)
+
+@_jit
+def collide_sequential(pos, vel, radius, mass):
+    """Pętla collide_balls po wszystkich parach i < j w tej kolejności, ale
+    j brane tylko z komórek siatki wokół bieżącej pozycji i. Siatka (komórka
+    = średnica największej kulki, tablica haszująca komórek) jest poprawiana
+    po każdym rozsunięciu, więc para, która zetknie się dopiero po
+    wcześniejszej korekcie, też jest sprawdzana - wynik jest taki sam jak
+    z pełnej pętli."""
+    n = len(pos)
+    if n < 2:
+        return
+    cell = 2 * radius.max()
+    # listy dwukierunkowe kulek w komórkach; home - szczelina komórki kulki
+    nxt = np.full(n, -1, np.intp)
+    prv = np.full(n, -1, np.intp)
+    home = np.empty(n, np.intp)
+    size = 1 << 4
+    while size < 8 * n:
+        size <<= 1
+    rebuild = True
+    while True:
+        if rebuild:
+            # nowa tablica (na starcie albo gdy zajętych komórek jest ponad połowa)
+            keys = np.zeros(size, np.int64)
+            used = np.zeros(size, np.bool_)
+            head = np.full(size, -1, np.intp)
+            count = 0
+            for k in range(n):
+                key = _cell_key(pos, k, cell)
+                s = _cell_slot(keys, used, key)
+                if not used[s]:
+                    used[s] = True
+                    keys[s] = key
+                    count += 1
+                home[k] = s
+                prv[k] = -1
+                nxt[k] = head[s]
+                if head[s] >= 0:
+                    prv[head[s]] = k
+                head[s] = k
+            rebuild = False
+            start = 0
+        for i in range(start, n):
+            last = i
+            while True:
+                # najmniejsze j > last w komórkach wokół i
+                cx = np.int64(math.floor(pos[i, 0] / cell))
+                cy = np.int64(math.floor(pos[i, 1] / cell))
+                j = n
+                for oy in range(-1, 2):
+                    for ox in range(-1, 2):
+                        s = _cell_slot(keys, used, ((cx + ox) << 32) ^ ((cy + oy) & 0xFFFFFFFF))
+                        if not used[s]:
+                            continue
+                        k = head[s]
+                        while k >= 0:
+                            if last < k < j:
+                                j = k
+                            k = nxt[k]
+                if j == n:
+                    break
+                if _collide_pair(pos, vel, radius, mass, i, j):
+                    for k in (i, j):
+                        key = _cell_key(pos, k, cell)
+                        if keys[home[k]] == key:
+                            continue
+                        # wyjęcie z dawnej komórki i wstawienie do nowej
+                        if prv[k] >= 0:
+                            nxt[prv[k]] = nxt[k]
+                        else:
+                            head[home[k]] = nxt[k]
+                        if nxt[k] >= 0:
+                            prv[nxt[k]] = prv[k]
+                        s = _cell_slot(keys, used, key)
+                        if not used[s]:
+                            used[s] = True
+                            keys[s] = key
+                            count += 1
+                        home[k] = s
+                        prv[k] = -1
+                        nxt[k] = head[s]
+                        if head[s] >= 0:
+                            prv[head[s]] = k
+                        head[s] = k
+                last = j
+            if 2 * count > size:
+                # następne i na nowej tablicy; pary do last dla i są już za nami
+                size <<= 1
+                rebuild = True
+                start = i + 1
+                break
+        if not rebuild:
+            return
+
+# --- podkroki XPBD (zadanie2) ---
+@_jit
+def bead_substeps(pos, prev_pos, vel, radius, mass, pairs, gravity, center, wire_radius, sdt, num_steps):
+    """num_steps podkroków simulate_arrays: start_step, keep_on_wire, end_step
+    i zderzenia par (bez wspólnych koralików w kolejnych grupach, więc
+    kolejność par jest dowolna w obrębie grupy). Tablice zmieniane w miejscu."""
+    n = len(pos)
+    restitution = 1.0
+    for _ in range(num_steps):
+        for b in range(n):
+            vel[b, 0] += gravity[0] * sdt
+            vel[b, 1] += gravity[1] * sdt
+            prev_pos[b, 0] = pos[b, 0]
+            prev_pos[b, 1] = pos[b, 1]
+            pos[b, 0] += vel[b, 0] * sdt
+            pos[b, 1] += vel[b, 1] * sdt
+            dx = pos[b, 0] - center[0]
+            dy = pos[b, 1] - center[1]
+            length = math.hypot(dx, dy)
+            if length != 0.0:
+                scale = (wire_radius - length) / length
+                pos[b, 0] += dx * scale
+                pos[b, 1] += dy * scale
+            vel[b, 0] = (pos[b, 0] - prev_pos[b, 0]) / sdt
+            vel[b, 1] = (pos[b, 1] - prev_pos[b, 1]) / sdt
+        for k in range(len(pairs)):
+            i = pairs[k, 0]
+            j = pairs[k, 1]
+            dx = pos[j, 0] - pos[i, 0]
+            dy = pos[j, 1] - pos[i, 1]
+            d = math.hypot(dx, dy)
+            if d == 0.0 or d > radius[i] + radius[j]:
+                continue
+            dx /= d
+            dy /= d
+            corr = (radius[i] + radius[j] - d) / 2.0
+            pos[i, 0] -= dx * corr
+            pos[i, 1] -= dy * corr
+            pos[j, 0] += dx * corr
+            pos[j, 1] += dy * corr
+            v1 = vel[i, 0] * dx + vel[i, 1] * dy
+            v2 = vel[j, 0] * dx + vel[j, 1] * dy
+            m1 = mass[i]
+            m2 = mass[j]
+            new_v1 = (m1*v1 + m2*v2 - m2*(v1-v2)*restitution) / (m1 + m2)
+            new_v2 = (m1*v1 + m2*v2 - m1*(v2-v1)*restitution) / (m1 + m2)
+            vel[i, 0] += dx * (new_v1 - v1)
+            vel[i, 1] += dy * (new_v1 - v1)
+            vel[j, 0] += dx * (new_v2 - v2)
+            vel[j, 1] += dy * (new_v2 - v2)
+
+# --- podkroki w kątach (zadanie2, tryb "angles") ---
+@_jit
+def angle_substeps(theta, omega, mass, pairs, wrap, min_gap, gx, gy, sdt, num_steps):
+    """num_steps podkroków simulate_angles: prędkościowy Verlet i zderzenia
+    par w kątach (pary w kolejności grup, wrap i min_gap w tej samej
+    kolejności). Tablice zmieniane w miejscu."""
+    n = len(theta)
+    restitution = 1.0
+    for _ in range(num_steps):
+        for b in range(n):
+            omega[b] += 0.5 * sdt * (gy * math.cos(theta[b]) - gx * math.sin(theta[b]))
+            theta[b] += omega[b] * sdt
+            omega[b] += 0.5 * sdt * (gy * math.cos(theta[b]) - gx * math.sin(theta[b]))
+        for k in range(len(pairs)):
+            i = pairs[k, 0]
+            j = pairs[k, 1]
+            overlap = min_gap[k] - (theta[j] + wrap[k] - theta[i])
+            if overlap <= 0.0:
+                continue
+            theta[i] -= overlap / 2.0
+            theta[j] += overlap / 2.0
+            w1 = omega[i]
+            w2 = omega[j]
+            if w1 <= w2:
+                continue
+            m1 = mass[i]
+            m2 = mass[j]
+            omega[i] = (m1*w1 + m2*w2 - m2*(w1-w2)*restitution) / (m1 + m2)
+            omega[j] = (m1*w1 + m2*w2 - m1*(w2-w1)*restitution) / (m1 + m2)
+
+# --- sprawdzenie i pomiar ---
+def _with_backend(flag, call, *args):
+    """call(*args) z jądrami numba (flag=True) albo na ścieżkach NumPy."""
+    global enabled
+    saved, enabled = enabled, flag
+    try:
+        return call(*args)
+    finally:
+        enabled = saved
+
+def _kernel_cases():
+    """{jądro: (stan(n), kopia(stan) -> argumenty, wywołanie(argumenty) -> wynik)};
+    mierzone jest tylko wywołanie."""
+    import random
+    import zadanie1
+    import zadanie2
+    import zadanie3
+
+    def circles(n, seed=0):
+        # pas o stałej gęstości jak w benchmark_detection
+        rng = np.random.default_rng(seed)
+        return rng.random(n) * n, rng.random(n) * 1000, rng.uniform(2, 8, n)
+
+    def balls(n):
+        x, y, r = circles(n)
+        vx, vy = np.random.default_rng(1).normal(0, 50, (2, n))
+        _, pairs = zadanie3.sweep_and_prune_pairs(x, y, r)
+        return x, y, vx, vy, r, r ** 2, pairs
+
+    def resolve(x, y, vx, vy, r, mass, pairs):
+        resolved = zadanie3.resolve_pairs(x, y, vx, vy, r, mass, pairs)
+        return np.concatenate((x, y, vx, vy)), resolved
+
+    def ball_scene(n):
+        # stan tuż przed zderzeniami kulek
+        np.random.seed(0)
+        scene = zadanie1.BallScene(n, layout="random", ball_collisions=False)
+        scene.step()
+        return scene.balls.pos, scene.balls.vel, scene.balls
+
+    def collide_all(pos, vel, balls):
+        state = zadanie1.BallState(pos, vel, balls.radius, balls.mass, balls.color)
+        zadanie1.collide_balls_all(state)
+        return state.pos, state.vel
+
+    def beads(n):
+        random.seed(0)
+        scene = zadanie2.PhysicsScene("arrays")
+        zadanie2.setup_scene(800, 600, n, scene)
+        arrays = scene.arrays()
+        return scene, arrays.pos.copy(), arrays.prev_pos.copy(), arrays.vel.copy()
+
+    def fresh_beads(state):
+        # scena jest wspólna, stan początkowy kopiowany przy każdym wywołaniu
+        scene, *vectors = state
+        return [scene] + [v.copy() for v in vectors]
+
+    def substeps(scene, pos, prev_pos, vel):
+        arrays = scene.arrays()
+        arrays.pos[:], arrays.prev_pos[:], arrays.vel[:] = pos, prev_pos, vel
+        zadanie2.simulate_arrays(scene, arrays)
+        return arrays.pos.copy(), arrays.vel.copy()
+
+    def angle_beads(n):
+        random.seed(0)
+        scene = zadanie2.PhysicsScene("angles")
+        zadanie2.setup_scene(800, 600, n, scene)
+        angles = scene.angles()
+        return scene, angles.theta.copy(), angles.omega.copy()
+
+    def angle_steps(scene, theta, omega):
+        angles = scene.angles()
+        angles.theta[:], angles.omega[:] = theta, omega
+        zadanie2.simulate_angles(scene, angles)
+        return angles.theta.copy(), angles.omega.copy()
+
+    copy = lambda state: [a.copy() for a in state]
+    return {
+        "sap_walk": (circles, copy, zadanie3.sweep_and_prune_pairs),
+        "resolve_chain": (balls, copy, resolve),
+        "collide_sequential": (ball_scene, lambda state: [state[0].copy(), state[1].copy(), state[2]], collide_all),
+        "bead_substeps": (beads, fresh_beads, substeps),
+        "angle_substeps": (angle_beads, fresh_beads, angle_steps),
+    }
+
+def check(counts=(10, 500, 5000)):
+    if numba is None:
+        print("Brak numby — działają tylko ścieżki NumPy, nie ma czego porównywać.")
+        return True
+    print("=== Zgodność jąder numba z NumPy ===")
+    ok = True
+    for name, (setup, prepare, call) in _kernel_cases().items():
+        for n in counts:
+            state = setup(n)
+            expected = _with_backend(False, call, *prepare(state))
+            result = _with_backend(True, call, *prepare(state))
+            same = all(np.shape(a) == np.shape(b) for a, b in zip(expected, result))
+            error = max(float(np.max(np.abs(np.asarray(a, float) - np.asarray(b, float)), initial=0.0))
+                        for a, b in zip(expected, result)) if same else float("inf")
+            good = error <= 1e-9
+            ok &= good
+            print(f"{name:18s} | n={n:6d} | max różnica: {error:9.2e} | {'OK' if good else 'RÓŻNE'}")
+    return ok
+
+def bench(counts=(500, 5000, 50_000), repeats=5):
+    if numba is None:
+        print("Brak numby — pomiar jąder niedostępny (pip install numba).")
+        return
+    print(f"=== Jądra numba {numba.__version__} vs NumPy (najlepszy z {repeats}) ===")
+    for name, (setup, prepare, call) in _kernel_cases().items():
+        for n in counts:
+            state = setup(n)
+            times = {}
+            for flag in (False, True):
+                _with_backend(flag, call, *prepare(state))  # kompilacja / wczytanie z cache
+                best = float("inf")
+                for _ in range(repeats):
+                    args = prepare(state)
+                    t0 = time.perf_counter()
+                    _with_backend(flag, call, *args)
+                    best = min(best, time.perf_counter() - t0)
+                times[flag] = best
+            print(f"{name:18s} | n={n:6d} | NumPy {times[False] * 1e3:9.3f} ms | numba {times[True] * 1e3:9.3f} ms "
+                  f"| {times[False] / times[True]:6.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Jądra numba: zgodność z NumPy i przyspieszenie")
+    parser.add_argument("command", choices=("check", "bench"))
+    parser.add_argument("--counts", type=int, nargs="+", help="liczby ciał (domyślnie zależnie od polecenia)")
+    args = parser.parse_args()
+    # zadanie2/zadanie3 czytają flagę enabled z modułu kernels, nie z __main__
+    import kernels
+    if args.command == "check":
+        sys.exit(0 if kernels.check(*[args.counts] if args.counts else []) else 1)
+    kernels.bench(*[args.counts] if args.counts else [])
+    sys.exit()
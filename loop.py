@@ -0,0 +1,77 @@
+"""Pętla ze stałym krokiem fizyki wspólna dla podglądów zadanie1-3.
+
+    loop = FixedStepLoop(dt=1/60)
+    while running:
+        for _ in range(loop.frame()):
+            previous = pos.copy()
+            scene.step()
+        if loop.render():
+            draw(interpolate(previous, pos, loop.alpha))
+
+Czas rzeczywisty trafia do akumulatora, z którego fizyka zabiera po dt.
+Przy wolnych klatkach kroków jest najwyżej max_steps na klatkę, a nadmiar czasu
+jest porzucany - symulacja zwalnia zamiast się rozpadać. Gdy fizyka nie nadąża,
+rysowanie jest pomijane (najwyżej max_skip klatek z rzędu).
+"""
+import time
+
+class FixedStepLoop:
+    """Akumulator czasu: frame() mówi, ile kroków dt wykonać, alpha - gdzie
+    między poprzednim a bieżącym stanem wypada chwila rysowania."""
+
+    def __init__(self, dt=1/60, max_steps=5, max_skip=2, max_frame=0.25, clock=time.perf_counter):
+        self.dt = dt
+        self.max_steps = max_steps
+        self.max_skip = max_skip
+        # dłuższa przerwa (np. przeciąganie okna) liczy się jak max_frame
+        self.max_frame = max_frame
+        self.clock = clock
+        self.last = None
+        self.accumulator = 0.0
+        self.behind = False
+        self.skipped = 0
+        # liczniki do HUD / raportów
+        self.steps_total = 0
+        self.frames_skipped = 0
+        self.time_dropped = 0.0
+
+    def frame(self):
+        """Dolicza czas od poprzedniej klatki i zwraca liczbę kroków fizyki."""
+        now = self.clock()
+        if self.last is None:
+            self.last = now - self.dt
+        elapsed = min(now - self.last, self.max_frame)
+        self.last = now
+        self.accumulator += elapsed
+
+        steps = int(self.accumulator / self.dt)
+        self.behind = steps > self.max_steps
+        if self.behind:
+            # porzucamy zaległość ponad max_steps, zostaje ułamek kroku
+            dropped = (steps - self.max_steps) * self.dt
+            self.accumulator -= dropped
+            self.time_dropped += dropped
+            steps = self.max_steps
+        self.accumulator -= steps * self.dt
+        self.steps_total += steps
+        return steps
+
+    @property
+    def alpha(self):
+        """Ułamek kroku, który został w akumulatorze (0..1) - waga interpolacji."""
+        return min(self.accumulator / self.dt, 1.0)
+
+    def render(self):
+        """Czy rysować tę klatkę: pomijamy ją, gdy fizyka nie nadąża."""
+        if self.behind and self.skipped < self.max_skip:
+            self.skipped += 1
+            self.frames_skipped += 1
+            return False
+        self.skipped = 0
+        return True
+
+def interpolate(previous, current, alpha):
+    """Położenia do rysowania między dwoma stanami fizyki."""
+    if previous is None or previous.shape != current.shape:
+        return current
+    return previous + (current - previous) * alpha
@@ -0,0 +1,159 @@
+"""Równoległe wykrywanie kolizji dla bardzo dużych zbiorów kół (10^6 i więcej).
+
+    python partition.py --circles 1000000 --workers 8 --detector sap
+    python partition.py --circles 1000000 --scaling          # sprawność 1..N procesów
+    python partition.py --circles 20000 --check              # zgodność z jednym procesem
+
+Obszar dzielony jest na pionowe pasy o równej liczbie środków kół. Koło
+należy do każdego pasa, który przecina jego przedział [x - r, x + r] - to
+margines równy promieniowi (najwyżej max r). Para jest zgłaszana tylko przez
+pas zawierający max(x_i - r_i, x_j - r_j): ten punkt leży w przedziałach obu
+kół, więc taki pas zawsze ma obie kule i każda para wychodzi dokładnie raz.
+
+x, y, r trafiają do procesów przez multiprocessing.shared_memory - do puli
+idą tylko numery pasów, z powrotem wracają tablice par indeksów.
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import zadanie3
+
+# detektory na tablicach: (x, y, r) -> (liczba kandydatów, kolizje (K,2) z i < j)
+def _sap(x, y, r):
+    candidates, collisions = zadanie3.sweep_and_prune_pairs(x, y, r)
+    return len(candidates), collisions
+
+def _grid(x, y, r):
+    candidates, collisions = zadanie3.grid_pairs(np.column_stack((x, y)), r)
+    return len(candidates), collisions
+
+def _brute(x, y, r):
+    return len(x) * (len(x) - 1) // 2, zadanie3.brute_force_pairs(x, y, r)
+
+DETECTORS = {"sap": _sap, "grid": _grid, "brute": _brute}
+
+# --- podział na pasy ---
+def strip_edges(x, strips):
+    """Wewnętrzne granice pasów: kwantyle środków, po tyle samo kół na pas."""
+    return np.quantile(x, np.linspace(0, 1, strips + 1)[1:-1])
+
+def strip_index(edges, values):
+    return np.searchsorted(edges, values, side="right")
+
+# --- proces roboczy ---
+_shared = {}
+
+def _attach(name, n, edges, detector):
+    """Inicjalizator puli: widok x, y, r i zakresy pasów kół ze wspólnej pamięci."""
+    # procesy puli dzielą resource_tracker z głównym, który blok zwalnia (unlink)
+    shm = shared_memory.SharedMemory(name=name)
+    data = np.ndarray((5, n), np.float64, shm.buf)
+    _shared.update(shm=shm, data=data, edges=edges, detector=detector)
+
+def _detect_strip(strip):
+    data, edges = _shared["data"], _shared["edges"]
+    x, y, r, first, last = data
+    members = np.flatnonzero((first <= strip) & (last >= strip))
+    candidates, pairs = DETECTORS[_shared["detector"]](x[members], y[members], r[members])
+    i, j = members[pairs[:, 0]], members[pairs[:, 1]]
+    own = strip_index(edges, np.maximum(x[i] - r[i], x[j] - r[j])) == strip
+    return candidates, np.column_stack((i[own], j[own]))
+
+def detect_parallel(x, y, r, workers=None, strips=None, detector="sap"):
+    """Kolizje (K,2) posortowane leksykograficznie, jak sweep_and_prune_pairs,
+    i łączna liczba kandydatów ze wszystkich pasów (z marginesami)."""
+    workers = workers or os.cpu_count() or 1
+    strips = strips or 4 * workers  # kilka pasów na proces wyrównuje obciążenie
+    n = len(x)
+    edges = strip_edges(x, strips)
+    shm = shared_memory.SharedMemory(create=True, size=max(5 * n * 8, 1))
+    try:
+        data = np.ndarray((5, n), np.float64, shm.buf)
+        data[0], data[1], data[2] = x, y, r
+        # pierwszy i ostatni pas, który przecina przedział koła
+        data[3] = strip_index(edges, x - r)
+        data[4] = strip_index(edges, x + r)
+        args = (shm.name, n, edges, detector)
+        if workers == 1:
+            _attach(*args)
+            parts = list(map(_detect_strip, range(strips)))
+            _shared.clear()
+        else:
+            with ProcessPoolExecutor(workers, initializer=_attach, initargs=args) as pool:
+                parts = list(pool.map(_detect_strip, range(strips)))
+        del data
+    finally:
+        shm.close()
+        shm.unlink()
+    candidates = sum(c for c, _ in parts)
+    pairs = np.concatenate([p for _, p in parts])
+    return candidates, pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+# --- dane, sprawdzenie i skalowanie ---
+def band_circles(n, seed=0, height=1000, radius=(2, 8)):
+    """Pas o stałej gęstości jak w benchmark_detection (2000 kół na 1000 x 1000)."""
+    rng = np.random.default_rng(seed)
+    width = 1000 * n / 2000
+    return rng.random(n) * width, rng.random(n) * height, rng.uniform(*radius, n)
+
+def check(n=20000, workers=2, detector="sap"):
+    x, y, r = band_circles(n)
+    _, expected = zadanie3.sweep_and_prune_pairs(x, y, r)
+    ok = True
+    for strips in (1, 3, 4 * workers, 64):
+        _, pairs = detect_parallel(x, y, r, workers, strips, detector)
+        same = np.array_equal(pairs, expected)
+        ok &= same
+        print(f"{detector} | koła: {n} | pasy: {strips:3d} | kolizje: {len(pairs)} / {len(expected)} "
+              f"| {'OK' if same else 'RÓŻNE'}")
+    return ok
+
+def scaling_report(n=1_000_000, max_workers=None, detector="sap"):
+    max_workers = max_workers or os.cpu_count() or 1
+    x, y, r = band_circles(n)
+    print(f"=== Skalowanie: {n} kół, detektor {detector}, {os.cpu_count()} rdzeni ===")
+    t0 = time.perf_counter()
+    DETECTORS[detector](x, y, r)
+    single = time.perf_counter() - t0
+    print(f"bez podziału    | czas: {single:7.3f} s")
+    base = None
+    for workers in range(1, max_workers + 1):
+        t0 = time.perf_counter()
+        candidates, pairs = detect_parallel(x, y, r, workers, detector=detector)
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        speedup = base / elapsed
+        print(f"procesy: {workers:3d} | czas: {elapsed:7.3f} s | przyspieszenie: {speedup:5.2f}x "
+              f"| sprawność: {speedup / workers:6.1%} | kolizje: {len(pairs)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Równoległe wykrywanie kolizji w pasach")
+    parser.add_argument("--circles", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=None, help="liczba procesów (domyślnie wszystkie rdzenie)")
+    parser.add_argument("--strips", type=int, default=None, help="liczba pasów (domyślnie 4 na proces)")
+    parser.add_argument("--detector", choices=list(DETECTORS), default="sap")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="porównaj z jednym procesem bez podziału")
+    parser.add_argument("--scaling", action="store_true", help="raport sprawności dla 1..workers procesów")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check(args.circles, args.workers or 2, args.detector) else 1)
+    if args.scaling:
+        scaling_report(args.circles, args.workers, args.detector)
+        sys.exit()
+
+    x, y, r = band_circles(args.circles, args.seed)
+    t0 = time.perf_counter()
+    candidates, pairs = detect_parallel(x, y, r, args.workers, args.strips, args.detector)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.detector} | koła: {args.circles} | procesy: {args.workers or os.cpu_count()} "
+          f"| czas: {elapsed:.3f} s | kandydaci: {candidates} | kolizje: {len(pairs)}")
@@ -0,0 +1,118 @@
+"""Czasy faz klatki (całkowanie, kolizje, rysowanie...) ze statystyką kroczącą.
+
+    profiler = PhaseProfiler(enabled=True, export="frames.csv")
+    with profiler.phase("integrate"):
+        ...
+    profiler.end_frame()
+    profiler.hud_lines()      # ["integrate  1.20 / 1.85 ms", ...] - średnia / p95
+    profiler.close()
+
+Wyłączony profiler zwraca z phase() wspólny pusty kontekst, więc zostaje
+tylko koszt wywołania; w najgorętszych pętlach lepiej sumować czas samemu
+(gdy profiler.enabled) i oddać go przez add(). Eksport: .csv - wiersze frame,phase,ms;
+inne rozszerzenia - JSON Lines, jeden obiekt na klatkę.
+"""
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+_NULL = nullcontext()
+
+class _Phase:
+    __slots__ = ("frame", "name", "start")
+
+    def __init__(self, frame, name):
+        self.frame, self.name, self.start = frame, name, 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        frame = self.frame
+        frame[self.name] = frame.get(self.name, 0.0) + time.perf_counter() - self.start
+
+class PhaseProfiler:
+    """Sumuje czas każdej fazy w bieżącej klatce; end_frame() przenosi sumy do
+    okna ostatnich window klatek (średnia i p95) i do eksportu."""
+
+    def __init__(self, enabled=False, window=120, export=None, hud_refresh=0.5):
+        self.enabled = enabled
+        self.window = window
+        self.history = {}
+        self.current = {}
+        self.frames = 0
+        self._phases = {}
+        self._file = None
+        self._csv = False
+        if enabled and export:
+            self._file = open(export, "w")
+            self._csv = export.endswith(".csv")
+            if self._csv:
+                self._file.write("frame,phase,ms\n")
+        # HUD liczony co hud_refresh s, żeby napisy nie zmieniały się co klatkę
+        self.hud_refresh = hud_refresh
+        self._hud = []
+        self._hud_time = 0.0
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self.current, name)
+        return phase
+
+    def add(self, name, seconds):
+        """Dolicza czas zmierzony samodzielnie (np. zsumowany w gorącej pętli)."""
+        if self.enabled:
+            self.current[name] = self.current.get(name, 0.0) + seconds
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        current = self.current
+        for name in current:
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+        for name, times in self.history.items():
+            times.append(current.get(name, 0.0))
+        if self._file is not None:
+            if self._csv:
+                self._file.writelines(f"{self.frames},{name},{seconds * 1e3:.4f}\n"
+                                      for name, seconds in current.items())
+            else:
+                self._file.write(json.dumps({"frame": self.frames,
+                                             "ms": {k: round(v * 1e3, 4) for k, v in current.items()}}) + "\n")
+        # fazy trzymają referencję do słownika klatki - czyścimy go w miejscu
+        current.clear()
+        self.frames += 1
+
+    def stats(self):
+        """{faza: (średnia ms, p95 ms)} z ostatnich window klatek."""
+        return {name: (float(np.mean(times)) * 1e3, float(np.percentile(times, 95)) * 1e3)
+                for name, times in self.history.items() if times}
+
+    def hud_lines(self):
+        if not self.enabled:
+            return []
+        now = time.perf_counter()
+        if now - self._hud_time >= self.hud_refresh:
+            self._hud_time = now
+            self._hud = [f"{name:12s} {mean:6.2f} / {p95:6.2f} ms"
+                         for name, (mean, p95) in self.stats().items()]
+        return self._hud
+
+    def report(self):
+        stats = self.stats()
+        total = sum(mean for mean, _ in stats.values()) or 1.0
+        print(f"=== Fazy klatki (ostatnie {min(self.frames, self.window)} klatek) ===")
+        for name, (mean, p95) in stats.items():
+            print(f"{name:12s} | średnio {mean:8.3f} ms | p95 {p95:8.3f} ms | {mean / total:6.1%}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,257 @@
+"""Zapis trajektorii krok po kroku do plików .npy (memmap) i odtwarzanie bez fizyki.
+
+    python zadanie1.py --headless --steps 3000 --record runs/balls
+    python recorder.py info runs/balls
+    python recorder.py replay runs/balls
+
+Nagranie to katalog:
+    meta.json               - dt, świat, lista fragmentów
+    00000.pos.npy, ...      - (wiersze, D) pozycje kolejnych kroków jedna za drugą
+    00000.vel.npy           - (wiersze, D) prędkości, zapisywane przez memmap
+    00000.radius.npy        - (wiersze stylu,) promienie, 00000.color.npy - (wiersze stylu, 3) kolory
+    00000.index.npy         - (kroki, 3) dla każdego kroku: pierwszy wiersz, liczba ciał,
+                              pierwszy wiersz stylu
+Liczba ciał może się zmieniać co krok bez otwierania nowego fragmentu;
+promienie i kolory dopisujemy tylko wtedy, gdy różnią się od poprzedniego
+kroku. W pamięci jest najwyżej jeden fragment. Fragmenty zaczynają od
+first_steps kroków, a gdy się zapełnią, następny jest dwa razy większy (do
+chunk_bytes); przy zamknięciu pliki są przycinane do zapisanych wierszy.
+meta.json zapisujemy tylko przy zamknięciu fragmentu.
+"""
+import io
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+FIELDS = ("pos", "vel")
+STYLE = ("radius", "color")
+
+# --- zapis ---
+class TrajectoryRecorder:
+    """Strumieniowy zapis pos/vel; chunk_bytes ogranicza rozmiar jednego fragmentu."""
+
+    def __init__(self, path, dt, world, y_up=True, source="", dtype=np.float32,
+                 chunk_bytes=64 << 20, first_steps=64):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunk_bytes = chunk_bytes
+        self.first_steps = first_steps
+        self.meta = {"version": 2, "source": source, "dt": dt, "world": list(world),
+                     "y_up": y_up, "dtype": self.dtype.str, "steps": 0, "chunks": []}
+        os.makedirs(path, exist_ok=True)
+        self.arrays = None
+        self.style = None
+
+    def _open_chunk(self, steps, rows, n, dim):
+        # miejsce na steps kroków i rows wierszy pos/vel (tyle samo na style),
+        # ale nie więcej niż chunk_bytes - chyba że jeden krok jest większy
+        self._close_chunk()
+        name = f"{len(self.meta['chunks']):05d}"
+        row_bytes = len(FIELDS) * dim * self.dtype.itemsize
+        rows = max(n, 1, min(rows, self.chunk_bytes // row_bytes))
+        steps = max(1, min(steps, self.chunk_bytes // (3 * 8)))
+        open_array = lambda field, dtype, shape: np.lib.format.open_memmap(
+            os.path.join(self.path, f"{name}.{field}.npy"), "w+", dtype, shape)
+        self.arrays = {field: open_array(field, self.dtype, (rows, dim)) for field in FIELDS}
+        self.arrays["radius"] = open_array("radius", np.float64, (rows,))
+        self.arrays["color"] = open_array("color", np.uint8, (rows, 3))
+        self.arrays["index"] = open_array("index", np.int64, (steps, 3))
+        self.filled = dict.fromkeys(self.arrays, 0)
+        self.meta["chunks"].append({"name": name, "steps": 0, "rows": 0})
+        self.style = None
+
+    def _close_chunk(self):
+        if self.arrays is None:
+            return
+        for field, array in self.arrays.items():
+            array.flush()
+            self._shrink(array.filename, array.offset, (self.filled[field],) + array.shape[1:], array.dtype)
+        self.arrays = None
+        self._write_meta()
+
+    def _shrink(self, path, offset, shape, dtype):
+        # nagłówek .npy z liczbą zapisanych wierszy i plik ucięty za nimi;
+        # gdy nowy nagłówek ma inną długość, przepisujemy cały plik
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            "descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape})
+        header = header.getvalue()
+        if len(header) != offset:
+            data = np.load(path, mmap_mode="r")[:shape[0]].copy()
+            np.save(path, data)
+            return
+        with open(path, "r+b") as f:
+            f.write(header)
+            f.truncate(offset + int(np.prod(shape)) * dtype.itemsize)
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=2)
+
+    def _fits(self, n, restyle):
+        filled, rows = self.filled, len(self.arrays["pos"])
+        return (filled["index"] < len(self.arrays["index"]) and filled["pos"] + n <= rows
+                and (not restyle or filled["radius"] + n <= rows))
+
+    def record(self, pos, vel, radius=0.0, color=(255, 255, 255)):
+        """Dopisuje jeden krok; liczba ciał może się zmieniać między krokami,
+        radius i color są zapisywane tylko, gdy się zmieniły."""
+        pos = np.asarray(pos)
+        n, dim = pos.shape
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), (n,))
+        color = np.broadcast_to(np.asarray(color, dtype=np.uint8), (n, 3))
+        restyle = (self.style is None or len(self.style[0]) != n
+                   or not np.array_equal(self.style[0], radius) or not np.array_equal(self.style[1], color))
+        if self.arrays is None or self.arrays["pos"].shape[1] != dim:
+            self._open_chunk(self.first_steps, self.first_steps * n, n, dim)
+            restyle = True
+        elif not self._fits(n, restyle):
+            self._open_chunk(2 * self.filled["index"], 2 * self.filled["pos"], n, dim)
+            restyle = True
+        arrays, filled = self.arrays, self.filled
+        if restyle:
+            s = filled["radius"]
+            arrays["radius"][s:s + n] = radius
+            arrays["color"][s:s + n] = color
+            filled["radius"] = filled["color"] = s + n
+            self.style = radius.copy(), color.copy()
+        row = filled["pos"]
+        arrays["pos"][row:row + n] = pos
+        arrays["vel"][row:row + n] = vel
+        filled["pos"] = filled["vel"] = row + n
+        arrays["index"][filled["index"]] = row, n, filled["radius"] - n
+        filled["index"] += 1
+        chunk = self.meta["chunks"][-1]
+        chunk["steps"], chunk["rows"] = filled["index"], row + n
+        self.meta["steps"] += 1
+
+    def close(self):
+        self._close_chunk()
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --- odczyt ---
+class Trajectory:
+    """Nagranie otwarte bez kopiowania: frame(t) zwraca widoki na memmap."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.dt = self.meta["dt"]
+        self.world = self.meta["world"]
+        self.y_up = self.meta["y_up"]
+        self.chunks = []
+        for chunk in self.meta["chunks"]:
+            load = lambda field: np.load(os.path.join(path, f"{chunk['name']}.{field}.npy"), mmap_mode="r")
+            self.chunks.append({field: load(field) for field in FIELDS + STYLE + ("index",)})
+            self.chunks[-1]["index"] = self.chunks[-1]["index"][:chunk["steps"]]
+        # pierwszy krok każdego fragmentu, do szukania fragmentu dla kroku t
+        self.offsets = np.cumsum([0] + [len(c["index"]) for c in self.chunks])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @staticmethod
+    def _step(chunk, i):
+        row, n, style = chunk["index"][i]
+        return (chunk["pos"][row:row + n], chunk["vel"][row:row + n],
+                chunk["radius"][style:style + n], chunk["color"][style:style + n])
+
+    def frame(self, t):
+        """Krok t jako (pos, vel, radius, color)."""
+        k = int(np.searchsorted(self.offsets, t, side="right")) - 1
+        return self._step(self.chunks[k], t - self.offsets[k])
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            for i in range(len(chunk["index"])):
+                yield self._step(chunk, i)
+
+# --- odtwarzanie ---
+def replay(path, window=1000):
+    """Rysuje nagranie klatka po klatce. SPACJA - pauza, strzałki - krok/prędkość."""
+    if pygame is None:
+        print("Brak pygame — odtwarzanie niedostępne.")
+        return
+    trajectory = Trajectory(path)
+    if len(trajectory) == 0:
+        print("Puste nagranie.")
+        return
+
+    world_w, world_h = trajectory.world
+    scale = window / max(world_w, world_h)
+    size = (int(world_w * scale), int(world_h * scale))
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(f"Odtwarzanie: {path}")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("Consolas", 18)
+    fps = round(1 / trajectory.dt)
+
+    t, speed, paused = 0, 1, False
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (
+               event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_RIGHT:
+                    t = min(t + (1 if paused else 10 * speed), len(trajectory) - 1)
+                elif event.key == pygame.K_LEFT:
+                    t = max(t - (1 if paused else 10 * speed), 0)
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed = max(1, speed // 2)
+
+        pos, _, radius, color = trajectory.frame(t)
+        x = pos[:, 0] * scale
+        y = size[1] - pos[:, 1] * scale if trajectory.y_up else pos[:, 1] * scale
+        screen.fill((12, 12, 20))
+        for px, py, r, c in zip(x.astype(int), y.astype(int), radius * scale, color):
+            pygame.draw.circle(screen, c, (px, py), max(1, int(r)))
+        info = f"krok {t + 1}/{len(trajectory)} | x{speed}" + (" | pauza" if paused else "")
+        screen.blit(font.render(info, True, (240, 240, 240)), (12, 12))
+        pygame.display.flip()
+        clock.tick(fps)
+
+        if not paused:
+            t = (t + speed) % len(trajectory)
+
+    pygame.quit()
+
+def info(path):
+    trajectory = Trajectory(path)
+    meta = trajectory.meta
+    print(f"{path}: {meta['source']} | kroki: {len(trajectory)} | dt: {meta['dt']:.5f} "
+          f"| świat: {meta['world']} | fragmenty: {len(meta['chunks'])}")
+    for chunk in meta["chunks"]:
+        print(f"  {chunk['name']}: kroki: {chunk['steps']} | wiersze: {chunk['rows']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Odtwarzanie nagranych trajektorii")
+    parser.add_argument("command", choices=("replay", "info"))
+    parser.add_argument("path", help="katalog nagrania")
+    args = parser.parse_args()
+    if args.command == "info":
+        info(args.path)
+    else:
+        replay(args.path)
+    sys.exit()
@@ -0,0 +1,160 @@
+"""Rysowanie wielu kół naraz: gotowe powierzchnie per (promień, kolor),
+jedno wywołanie Surface.blits na klatkę i odświeżanie tylko brudnych prostokątów.
+
+    renderer = SpriteRenderer(screen, background)
+    renderer.clear()                          # tło pod poprzednią klatką
+    renderer.circles(x, y, radius, colors)    # współrzędne ekranu
+    renderer.text(font, info, (240, 240, 240), (12, 12))
+    renderer.present()
+
+    SDL_VIDEODRIVER=dummy python render.py --bodies 5000    # pomiar czasu klatki
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+COLORKEY = (255, 0, 255)
+
+class SpriteRenderer:
+    """background - powierzchnia z nieruchomą częścią sceny (domek, drut) albo kolor tła."""
+
+    def __init__(self, screen, background, max_dirty=1000, max_sprites=4096):
+        self.screen = screen
+        if not isinstance(background, pygame.Surface):
+            color = background
+            background = pygame.Surface(screen.get_size()).convert()
+            background.fill(color)
+        self.background = background
+        self.sprites = {}
+        # limit powierzchni w pamięci - przy spawnie z losowym promieniem i kolorem kluczy przybywa bez końca
+        self.max_sprites = max_sprites
+        self.texts = {}
+        # przy większej liczbie prostokątów taniej odmalować i odświeżyć cały ekran
+        self.max_dirty = max_dirty
+        self.previous = None
+        self.current = []
+
+    def sprite(self, radius, color):
+        key = (radius, color)
+        surface = self.sprites.get(key)
+        if surface is None:
+            size = 2 * radius + 1
+            surface = pygame.Surface((size, size)).convert()
+            key_color = COLORKEY if color != COLORKEY else (0, 255, 0)
+            surface.fill(key_color)
+            pygame.draw.circle(surface, color, (radius, radius), radius)
+            surface.set_colorkey(key_color, pygame.RLEACCEL)
+            self.sprites[key] = surface
+        return surface
+
+    def clear(self):
+        """Przywraca tło pod tym, co narysowano w poprzedniej klatce."""
+        if self.previous is None or len(self.previous) > self.max_dirty:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            background = self.background
+            self.screen.blits([(background, rect, rect) for rect in self.previous], doreturn=False)
+        self.current = []
+
+    def circles(self, x, y, radius, colors):
+        """Koła o środkach (x, y) w pikselach; radius - skalar albo tablica,
+        colors - jeden kolor albo (N,3)."""
+        n = len(x)
+        if n == 0:
+            return
+        radius = np.broadcast_to(np.asarray(radius).astype(np.int64), (n,))
+        colors = np.broadcast_to(np.asarray(colors).astype(np.int64), (n, 3))
+        visible = np.flatnonzero(radius > 0)
+        radius, colors = radius[visible], colors[visible]
+        # jeden klucz na (promień, kolor); powierzchnie tylko dla unikalnych kluczy
+        key = (radius << 24) | (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+        unique, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        keys = [(int(radius[i]), tuple(colors[i].tolist())) for i in first]
+        sprites = np.empty(len(unique), dtype=object)
+        sprites[:] = [self.sprite(*k) for k in keys]
+        if len(self.sprites) > self.max_sprites:
+            # jak w text(): po przekroczeniu limitu zostają tylko powierzchnie tej klatki
+            self.sprites = dict(zip(keys, sprites.tolist()))
+        corners = np.column_stack((np.asarray(x)[visible].astype(np.int64) - radius,
+                                   np.asarray(y)[visible].astype(np.int64) - radius))
+        self.current += self.screen.blits(list(zip(sprites[inverse].tolist(), corners.tolist())))
+
+    def text(self, font, text, color, pos):
+        """Napis z pamięci podręcznej - font.render tylko przy zmianie treści."""
+        key = (id(font), text, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) > 64:
+                self.texts.clear()
+            surface = self.texts[key] = font.render(text, True, color)
+        self.current.append(self.screen.blit(surface, pos))
+
+    def present(self):
+        if self.previous is None or len(self.previous) + len(self.current) > self.max_dirty:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
+
+# --- pomiar ---
+def benchmark(bodies=5000, frames=60, size=(1000, 700), radius=(2, 8)):
+    """Czas klatki: draw.circle + fill + font.render co klatkę vs SpriteRenderer."""
+    if pygame is None:
+        print("Brak pygame — pomiar niedostępny.")
+        return
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    font = pygame.font.SysFont("Consolas", 18)
+    rng = np.random.default_rng(0)
+    pos = rng.uniform((0, 0), size, (bodies, 2))
+    vel = rng.normal(0, 60, (bodies, 2))
+    radii = rng.integers(*radius, bodies)
+    palette = np.array([(0, 200, 0), (255, 50, 50)])
+    colors = palette[rng.integers(0, 2, bodies)]
+
+    def move():
+        pos[:] = (pos + vel / 60) % size
+
+    def old_frame(frame):
+        screen.fill((12, 12, 20))
+        for (x, y), r, c in zip(pos, radii, colors):
+            pygame.draw.circle(screen, c, (int(x), int(y)), int(r))
+        screen.blit(font.render(f"Balls: {bodies}", True, (240, 240, 240)), (12, 12))
+        pygame.display.flip()
+
+    renderer = SpriteRenderer(screen, (12, 12, 20))
+
+    def new_frame(frame):
+        renderer.clear()
+        renderer.circles(pos[:, 0], pos[:, 1], radii, colors)
+        renderer.text(font, f"Balls: {bodies}", (240, 240, 240), (12, 12))
+        renderer.present()
+
+    print(f"=== Rysowanie {bodies} kół, {frames} klatek ({pygame.display.get_driver()}) ===")
+    results = {}
+    for name, draw in (("draw.circle", old_frame), ("SpriteRenderer", new_frame)):
+        draw(0)
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            move()
+            draw(frame)
+        results[name] = (time.perf_counter() - t0) / frames
+        print(f"{name:15s} | {results[name] * 1e3:7.2f} ms/klatka")
+    print(f"przyspieszenie: {results['draw.circle'] / results['SpriteRenderer']:.1f}x")
+    pygame.quit()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pomiar czasu klatki rysowania")
+    parser.add_argument("--bodies", type=int, default=5000)
+    parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args()
+    benchmark(args.bodies, args.frames)
+    sys.exit()
@@ -0,0 +1,169 @@
+"""Surogat całkowania zadanie1: model liniowy na cechach wielomianowych,
+uczony na przebiegach rk4_step, przewiduje stan za k kroków jednym mnożeniem.
+
+    python surrogate.py train --k 30 --out surrogate_k30.npz
+    python surrogate.py eval --horizons 1 5 15 30 60
+    python surrogate.py bench --balls 100000 --k 30
+    python zadanie1.py --headless --integrator surrogate
+
+W locie swobodnym przyspieszenie zależy tylko od prędkości (grawitacja + opór),
+więc przyrost stanu po k krokach jest gładką funkcją (vx, vy), a położenie
+początkowe tylko się przesuwa. Model nie zna ścian ani domku - kolizje liczy
+dalej scena, tak jak po zwykłym kroku RK4.
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+import zadanie1
+
+# --- model ---
+def poly_features(u, degree):
+    """Jednomiany ux^a * uy^b dla a + b <= degree, każdy też razy |u|
+    (opór -c|v|v nie jest wielomianem prędkości); wynik (liczba cech, M)."""
+    ux, uy = u[:, 0], u[:, 1]
+    px = [np.ones_like(ux)]
+    py = [np.ones_like(uy)]
+    for _ in range(degree):
+        px.append(px[-1] * ux)
+        py.append(py[-1] * uy)
+    monomials = [(a, total - a) for total in range(degree + 1) for a in range(total + 1)]
+    features = np.empty((2 * len(monomials), len(u)))
+    for row, (a, b) in enumerate(monomials):
+        np.multiply(px[a], py[b], out=features[row])
+    np.multiply(features[:len(monomials)], np.hypot(ux, uy), out=features[len(monomials):])
+    return features
+
+class Surrogate:
+    """Stan za k kroków dt: [pos, vel] + cechy(vel / vmax) @ weights.
+    Poza zakresem uczenia (|v| > vmax) step() wraca do rk4_step."""
+
+    def __init__(self, k, dt, degree, vmax, drag, weights):
+        self.k, self.dt, self.degree = k, dt, degree
+        self.vmax, self.drag = vmax, drag
+        self.weights = weights
+
+    def predict(self, pos, vel):
+        delta = (self.weights.T @ poly_features(vel / self.vmax, self.degree)).T
+        return pos + delta[:, :2], vel + delta[:, 2:]
+
+    def step(self, pos, vel):
+        """Zastępuje k wywołań rk4_step; kulki spoza zakresu liczone są RK4."""
+        outside = np.flatnonzero(np.einsum("ij,ij->i", vel, vel) > self.vmax ** 2)
+        if not len(outside):
+            return self.predict(pos, vel)
+        pos_new, vel_new = self.predict(pos, vel)
+        p, v = rollout(pos[outside], vel[outside], self.k, self.dt, self.drag)
+        pos_new[outside], vel_new[outside] = p, v
+        return pos_new, vel_new
+
+    def save(self, path):
+        np.savez(path, k=self.k, dt=self.dt, degree=self.degree, vmax=self.vmax,
+                 drag=self.drag, weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(int(data["k"]), float(data["dt"]), int(data["degree"]), float(data["vmax"]),
+                   float(data["drag"]), data["weights"])
+
+# --- dane i uczenie ---
+def rollout(pos, vel, k, dt=zadanie1.time_step, drag=zadanie1.air_resistance):
+    """k kroków rk4_step w locie swobodnym (bez ścian i domku)."""
+    accel = lambda p, v: zadanie1.acceleration(p, v, drag)
+    for _ in range(k):
+        pos, vel = zadanie1.rk4_step(pos, vel, dt, accel)
+    return pos, vel
+
+def sample_velocities(n, vmax, rng):
+    # jednostajnie w kole |v| <= vmax
+    r = vmax * np.sqrt(rng.uniform(0, 1, n))
+    angle = rng.uniform(0, 2 * np.pi, n)
+    return np.column_stack((r * np.cos(angle), r * np.sin(angle)))
+
+def fit(k=1, degree=6, samples=20000, vmax=40.0, dt=zadanie1.time_step,
+        drag=zadanie1.air_resistance, seed=0, ridge=1e-12):
+    """Uczy surogat na k-krokowych przebiegach RK4 (najmniejsze kwadraty z małą regularyzacją)."""
+    rng = np.random.default_rng(seed)
+    vel = sample_velocities(samples, vmax, rng)
+    pos = np.zeros_like(vel)
+    pos_k, vel_k = rollout(pos, vel, k, dt, drag)
+    target = np.hstack((pos_k - pos, vel_k - vel))
+    features = poly_features(vel / vmax, degree)
+    gram = features @ features.T + ridge * np.eye(len(features))
+    weights = np.linalg.solve(gram, features @ target)
+    return Surrogate(k, dt, degree, vmax, drag, weights)
+
+def evaluate(model, samples=5000, seed=1, steps=None):
+    """Błąd położenia i prędkości względem RK4 na świeżych próbkach.
+    steps - horyzont w krokach dt; model jest składany steps // k razy."""
+    steps = steps or model.k
+    rng = np.random.default_rng(seed)
+    # żeby składanie nie wyszło poza zakres uczenia, start z |v| <= vmax / 2
+    vel = sample_velocities(samples, model.vmax / 2, rng)
+    pos = rng.uniform(0, 20, (samples, 2))
+    ref_pos, ref_vel = rollout(pos, vel, steps, model.dt, model.drag)
+    p, v = pos, vel
+    for _ in range(steps // model.k):
+        p, v = model.predict(p, v)
+    err_pos = np.hypot(*(p - ref_pos).T)
+    err_vel = np.hypot(*(v - ref_vel).T)
+    return {"rms_pos": float(np.sqrt(np.mean(err_pos ** 2))), "max_pos": float(err_pos.max()),
+            "rms_vel": float(np.sqrt(np.mean(err_vel ** 2))), "max_vel": float(err_vel.max())}
+
+# --- raporty ---
+def error_vs_horizon(horizons=(1, 5, 15, 30, 60, 120), degree=6):
+    print(f"=== Błąd surogatu względem RK4 (dt = 1/{round(1 / zadanie1.time_step)}, stopień {degree}) ===")
+    print(f"{'horyzont':>8s} | {'model':>14s} | {'RMS pos':>9s} | {'max pos':>9s} | {'RMS vel':>9s} | {'max vel':>9s}")
+    one_step = fit(1, degree)
+    for steps in horizons:
+        for label, model in ((f"k={steps}", fit(steps, degree)), (f"k=1 x {steps}", one_step)):
+            e = evaluate(model, steps=steps)
+            print(f"{steps:8d} | {label:>14s} | {e['rms_pos']:9.2e} | {e['max_pos']:9.2e} "
+                  f"| {e['rms_vel']:9.2e} | {e['max_vel']:9.2e}")
+
+def throughput(n=100_000, k=30, degree=6, repeats=3):
+    model = fit(k, degree)
+    rng = np.random.default_rng(2)
+    vel = sample_velocities(n, model.vmax / 2, rng)
+    pos = rng.uniform(0, 20, (n, 2))
+
+    def best(call):
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            call()
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    t_rk4 = best(lambda: rollout(pos, vel, k, model.dt, model.drag))
+    t_model = best(lambda: model.step(pos, vel))
+    print(f"=== {n} kulek, {k} kroków naprzód ===")
+    print(f"RK4 ({k} kroków) | {t_rk4 * 1e3:9.2f} ms | {n * k / t_rk4 / 1e6:8.2f} M kulko-kroków/s")
+    print(f"surogat k={k:<4d} | {t_model * 1e3:9.2f} ms | {n * k / t_model / 1e6:8.2f} M kulko-kroków/s "
+          f"| {t_rk4 / t_model:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Surogat całkowania RK4 dla zadanie1")
+    parser.add_argument("command", choices=("train", "eval", "bench"))
+    parser.add_argument("--k", type=int, default=1, help="ile kroków dt przewiduje model")
+    parser.add_argument("--degree", type=int, default=6, help="stopień cech wielomianowych")
+    parser.add_argument("--samples", type=int, default=20000, help="liczba przebiegów uczących")
+    parser.add_argument("--out", default="surrogate.npz")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5, 15, 30, 60, 120])
+    parser.add_argument("--balls", type=int, default=100_000, help="liczba kulek w bench")
+    args = parser.parse_args()
+    if args.command == "train":
+        t0 = time.perf_counter()
+        model = fit(args.k, args.degree, args.samples)
+        model.save(args.out)
+        e = evaluate(model)
+        print(f"k={args.k} | uczenie: {time.perf_counter() - t0:.2f} s | RMS pos: {e['rms_pos']:.2e} "
+              f"| RMS vel: {e['rms_vel']:.2e} -> {args.out}")
+    elif args.command == "eval":
+        error_vs_horizon(args.horizons, args.degree)
+    else:
+        throughput(args.balls, args.k, args.degree)
+    sys.exit()
@@ -0,0 +1,149 @@
+"""Przegląd parametrów zadanie1 na wielu procesach -> jeden zbiór trajektorii.
+
+    python sweep.py --random 10000 --steps 600 --workers 8 --out dataset.npz
+    python sweep.py --grid --speeds 10 20 30 --angles 30 60 90 --bounciness 0.7 0.95
+    python sweep.py --random 10000 --shard 3 --out shard3.npz   # tylko jeden fragment
+    python sweep.py --random 2000 --scaling                     # sprawność 1..N procesów
+
+Każdy przebieg to jedna kulka wystrzelona z (0.2, 0.2) w domku, bez kolizji
+z innymi kulkami. Parametry przebiegu i zależą tylko od (seed, i), więc dowolny
+fragment (shard) można policzyć ponownie osobno i dostać te same liczby.
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+
+import zadanie1
+
+PARAMS = ("speed", "angle_deg", "bounciness", "air_resistance")
+
+# domyślne zakresy losowania (min, max)
+RANGES = {
+    "speed": (min(zadanie1.speeds), max(zadanie1.speeds)),
+    "angle_deg": (min(zadanie1.angles_deg), max(zadanie1.angles_deg)),
+    "bounciness": (0.5, 1.0),
+    "air_resistance": (0.0, 0.05),
+}
+
+# --- opis przeglądu i parametry przebiegów ---
+def grid_config(speeds, angles_deg, bounciness, air_resistance, steps=600, dt=zadanie1.time_step):
+    """Przegląd po iloczynie kartezjańskim list wartości."""
+    values = [list(map(float, v)) for v in (speeds, angles_deg, bounciness, air_resistance)]
+    return {"mode": "grid", "values": values, "runs": int(np.prod([len(v) for v in values])),
+            "steps": steps, "dt": dt, "seed": 0}
+
+def random_config(runs, seed=0, ranges=RANGES, steps=600, dt=zadanie1.time_step):
+    """Przegląd losowy: każdy parametr jednostajnie z zakresu ranges[nazwa]."""
+    return {"mode": "random", "ranges": [list(map(float, ranges[p])) for p in PARAMS],
+            "runs": runs, "steps": steps, "dt": dt, "seed": seed}
+
+def run_params(config, start, stop):
+    """Parametry przebiegów start..stop-1 jako tablica (k, 4) w kolejności PARAMS."""
+    index = np.arange(start, stop)
+    if config["mode"] == "grid":
+        values = config["values"]
+        cells = np.unravel_index(index, [len(v) for v in values])
+        return np.column_stack([np.asarray(v)[c] for v, c in zip(values, cells)])
+    low, high = np.asarray(config["ranges"]).T
+    # osobny generator na przebieg - wynik nie zależy od podziału na fragmenty
+    return np.array([np.random.default_rng([config["seed"], i]).uniform(low, high) for i in index])
+
+# --- symulacja fragmentu ---
+def simulate_runs(params, steps, dt):
+    """Wszystkie przebiegi naraz jako niezależne kulki; zwraca (k, steps+1, 4) [x, y, vx, vy]."""
+    speed, angle_deg, restitution, drag = params.T
+    angle_rad = np.radians(angle_deg)
+    vel = np.column_stack((speed * np.cos(angle_rad), speed * np.sin(angle_rad)))
+    pos = np.tile((0.2, 0.2), (len(params), 1))
+    balls = zadanie1.BallState(pos, vel, 0.3, 1.0, (0, 0, 0), restitution, drag)
+    scene = zadanie1.BallScene(dt=dt, balls=balls, ball_collisions=False)
+
+    out = np.empty((len(params), steps + 1, 4), dtype=np.float32)
+    out[:, 0, :2], out[:, 0, 2:] = balls.pos, balls.vel
+    for t in range(1, steps + 1):
+        scene.step()
+        out[:, t, :2], out[:, t, 2:] = balls.pos, balls.vel
+    return out
+
+def run_shard(config, start, stop):
+    params = run_params(config, start, stop)
+    return params, simulate_runs(params, config["steps"], config["dt"])
+
+def shard_bounds(runs, shard_size):
+    return [(s, min(s + shard_size, runs)) for s in range(0, runs, shard_size)]
+
+def run_sweep(config, workers=None, shard_size=256, shards=None):
+    """Liczy wybrane fragmenty (domyślnie wszystkie) w puli procesów i skleja je w kolejności."""
+    bounds = shard_bounds(config["runs"], shard_size)
+    if shards is not None:
+        bounds = [bounds[k] for k in shards]
+    starts, stops = zip(*bounds)
+    if workers == 1:
+        parts = list(map(run_shard, [config] * len(bounds), starts, stops))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(run_shard, [config] * len(bounds), starts, stops))
+    params = np.concatenate([p for p, _ in parts])
+    trajectories = np.concatenate([t for _, t in parts])
+    run_index = np.concatenate([np.arange(s, e) for s, e in bounds])
+    return params, trajectories, run_index
+
+def save_dataset(path, config, params, trajectories, run_index):
+    np.savez(path, params=params, param_names=np.array(PARAMS), trajectories=trajectories,
+             run_index=run_index, dt=config["dt"], steps=config["steps"], seed=config["seed"],
+             mode=config["mode"])
+
+# --- skalowanie ---
+def scaling_report(config, max_workers=None, shard_size=64):
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"=== Skalowanie: {config['runs']} przebiegów x {config['steps']} kroków, "
+          f"{os.cpu_count()} rdzeni ===")
+    base = None
+    for workers in range(1, max_workers + 1):
+        t0 = time.perf_counter()
+        run_sweep(config, workers, shard_size)
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        speedup = base / elapsed
+        print(f"procesy: {workers:3d} | czas: {elapsed:7.3f} s | przyspieszenie: {speedup:5.2f}x "
+              f"| sprawność: {speedup / workers:6.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Przegląd parametrów symulacji zadanie1")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--random", type=int, metavar="RUNS", help="liczba losowych przebiegów")
+    mode.add_argument("--grid", action="store_true", help="siatka z list --speeds/--angles/...")
+    parser.add_argument("--speeds", type=float, nargs="+", default=zadanie1.speeds)
+    parser.add_argument("--angles", type=float, nargs="+", default=zadanie1.angles_deg)
+    parser.add_argument("--bounciness", type=float, nargs="+", default=[zadanie1.bounciness])
+    parser.add_argument("--air-resistance", type=float, nargs="+", default=[zadanie1.air_resistance])
+    parser.add_argument("--steps", type=int, default=600, help="kroki na przebieg")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="liczba procesów (domyślnie wszystkie rdzenie)")
+    parser.add_argument("--shard-size", type=int, default=256, help="przebiegów na fragment")
+    parser.add_argument("--shard", type=int, nargs="+", help="policz tylko te fragmenty")
+    parser.add_argument("--out", default="dataset.npz")
+    parser.add_argument("--scaling", action="store_true", help="raport sprawności dla 1..workers procesów")
+    args = parser.parse_args()
+
+    if args.grid:
+        config = grid_config(args.speeds, args.angles, args.bounciness, args.air_resistance, args.steps)
+    else:
+        config = random_config(args.random or 1000, args.seed, steps=args.steps)
+
+    if args.scaling:
+        scaling_report(config, args.workers)
+        sys.exit()
+
+    t0 = time.perf_counter()
+    params, trajectories, run_index = run_sweep(config, args.workers, args.shard_size, args.shard)
+    elapsed = time.perf_counter() - t0
+    save_dataset(args.out, config, params, trajectories, run_index)
+    print(f"Przebiegi: {len(run_index)} | kroki: {config['steps']} | czas: {elapsed:.3f} s "
+          f"| {len(run_index) * config['steps'] / elapsed:.0f} kulko-kroków/s -> {args.out}")
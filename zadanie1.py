@@ -1,8 +1,20 @@
-import pygame
 import numpy as np
 import sys
+import time
+import argparse
 import itertools
-import random
+
+from zadanie3 import grid_pairs, color_pairs
+from recorder import TrajectoryRecorder
+from loop import FixedStepLoop, interpolate
+from render import SpriteRenderer
+from profiling import PhaseProfiler
+import kernels
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
 
 # --- parametry symulacji ---
 N = 10
@@ -11,16 +23,17 @@ angles_deg = [30, 40, 50, 60, 70, 80, 90, 100, 110, 120]
 gravity_y = -9.8
 bounciness = 0.95
 air_resistance = 0.025
+# ułamek prędkości poziomej traconej przy każdym odbiciu od podłogi (domyślnie bez tarcia)
+floor_friction = 0.0
 kick_force = 10.0
 kick_force_min = 0.0
 kick_force_max = 30.0
+# usypianie: kulka wolniejsza niż sleep_speed [m/s] przez sleep_time [s] przestaje być liczona
+sleep_speed = 0.25
+sleep_time = 0.5
 
-# --- inicjalizacja pygame ---
-pygame.init()
+# --- rozmiar okna (wyznacza też wymiary świata) ---
 width, height = 800, 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Balls Simulation with RK4 solver")
-clock = pygame.time.Clock()
 
 # --- skalowanie fizyki do ekranu ---
 sim_min_width = 20.0
@@ -31,26 +44,79 @@ sim_height = height / c_scale
 def cX(x): return int(x * c_scale)
 def cY(y): return int(height - y * c_scale)
 
-# --- inicjalizacja kulek ---
-balls = []
-for i in range(N):
-    speed = speeds[i] if i < len(speeds) else speeds[-1]
-    angle_deg_i = angles_deg[i] if i < len(angles_deg) else angles_deg[-1]
-    angle_rad = np.radians(angle_deg_i)
-    balls.append({
-        'radius': 0.3,
-        'mass': 1.0,
-        'pos': {'x': 0.2, 'y': 0.2},
-        'vel': {
-            'x': speed * np.cos(angle_rad),
-            'y': speed * np.sin(angle_rad)
-        },
-        'color': (
-            np.random.randint(50, 255),
-            np.random.randint(50, 255),
-            np.random.randint(50, 255)
-        )
-    })
+# --- stan kulek (struktura tablic) ---
+class BallState:
+    """Stan wszystkich kulek jako ciągłe tablice: pos/vel (N,2), radius/mass (N,).
+    Sprężystość, opór powietrza i tarcie o podłogę też są per kulka
+    (domyślnie parametry modułu)."""
+
+    def __init__(self, pos, vel, radius, mass, color, restitution=bounciness, drag=air_resistance,
+                 friction=floor_friction):
+        self.pos = np.array(pos, dtype=np.float64).reshape(-1, 2)
+        self.vel = np.array(vel, dtype=np.float64).reshape(-1, 2)
+        n = len(self.pos)
+        self.radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), (n,)).copy()
+        self.mass = np.broadcast_to(np.asarray(mass, dtype=np.float64), (n,)).copy()
+        self.color = np.broadcast_to(np.asarray(color, dtype=np.uint8), (n, 3)).copy()
+        self.bounciness = np.broadcast_to(np.asarray(restitution, dtype=np.float64), (n,)).copy()
+        self.air_resistance = np.broadcast_to(np.asarray(drag, dtype=np.float64), (n,)).copy()
+        self.friction = np.broadcast_to(np.asarray(friction, dtype=np.float64), (n,)).copy()
+
+    def __len__(self):
+        return len(self.pos)
+
+    @classmethod
+    def settled(cls, n, width, height, moving=0.01, group=5, skip=None, mass=1.0, friction=0.5,
+                restitution=0.3):
+        # prawie uspokojona scena: kulki leżą bez ruchu na podłodze w grupkach po
+        # group stykających się (poza przedziałem x skip - domyślnie domkiem),
+        # a ułamek moving spada swobodnie z górnej połowy świata; tarcie
+        # i słabe odbicie od podłogi wygaszają ruch trafionych grupek, więc
+        # scena nie rozkręca się
+        if skip is None:
+            skip = (x1, x2)
+        resting = n - int(moving * n)
+        groups = -(-resting // group)
+        pitch_r = 2 * group + 3  # grupka 2r * group i przerwa 3r
+        radius = (width - (skip[1] - skip[0])) / ((groups + 2) * pitch_r)
+        pitch = pitch_r * radius
+        start = radius + np.arange(groups) * pitch
+        start[start + pitch > skip[0]] += skip[1] - skip[0] + pitch
+        k = np.arange(resting)
+        rest_pos = np.column_stack((start[k // group] + (k % group) * 2 * radius, np.zeros(resting)))
+        m = n - resting
+        pos = np.vstack((rest_pos, np.random.uniform((radius, height / 2), (width - radius, height - radius), (m, 2))))
+        color = np.random.randint(50, 255, size=(n, 3))
+        return cls(pos, np.zeros((n, 2)), radius, mass, color, restitution, friction=friction)
+
+    def subset(self, index):
+        # kopia wybranych kulek (np. tylko obudzonych); zmiany trzeba przepisać z powrotem
+        return BallState(self.pos[index], self.vel[index], self.radius[index], self.mass[index],
+                         self.color[index], self.bounciness[index], self.air_resistance[index],
+                         self.friction[index])
+
+    @classmethod
+    def launch(cls, n, speeds, angles_deg, radius=0.3, mass=1.0, start=(0.2, 0.2)):
+        # i-ta kulka dostaje i-tą prędkość i kąt, po końcu listy - ostatni element
+        speed = np.asarray(speeds, dtype=np.float64)[np.minimum(np.arange(n), len(speeds) - 1)]
+        angle_rad = np.radians(
+            np.asarray(angles_deg, dtype=np.float64)[np.minimum(np.arange(n), len(angles_deg) - 1)])
+        vel = np.column_stack((speed * np.cos(angle_rad), speed * np.sin(angle_rad)))
+        pos = np.tile(np.asarray(start, dtype=np.float64), (n, 1))
+        color = np.random.randint(50, 255, size=(n, 3))
+        return cls(pos, vel, radius, mass, color)
+
+    @classmethod
+    def scatter(cls, n, width, height, fill=0.2, radius=0.3, mass=1.0):
+        # losowe położenia w całym świecie; promień maleje, gdy n kulek o danym
+        # promieniu nie zmieściłoby się przy zadanym wypełnieniu
+        radius = min(radius, np.sqrt(fill * width * height / (np.pi * n)))
+        pos = np.random.uniform((radius, radius), (width - radius, height - radius), size=(n, 2))
+        speed = np.random.uniform(min(speeds), max(speeds), n)
+        angle_rad = np.radians(np.random.uniform(min(angles_deg), max(angles_deg), n))
+        vel = np.column_stack((speed * np.cos(angle_rad), speed * np.sin(angle_rad)))
+        color = np.random.randint(50, 255, size=(n, 3))
+        return cls(pos, vel, radius, mass, color)
 
 gravity = {'x': 0.0, 'y': gravity_y}
 time_step = 1.0 / 60.0
@@ -85,37 +151,352 @@ def reflect(vx, vy, x1, y1, x2, y2, bounciness):
     vy_new = vy - 2 * dot * ny
     return vx_new * bounciness, vy_new * bounciness
 
-def collide_balls(b1, b2):
-    dx = b2['pos']['x'] - b1['pos']['x']
-    dy = b2['pos']['y'] - b1['pos']['y']
+def collide_balls(state, i, j):
+    pos, vel = state.pos, state.vel
+    dx = pos[j, 0] - pos[i, 0]
+    dy = pos[j, 1] - pos[i, 1]
     dist = np.hypot(dx, dy)
-    min_dist = b1['radius'] + b2['radius']
+    min_dist = state.radius[i] + state.radius[j]
     if dist == 0 or dist >= min_dist:
         return
 
     nx = dx / dist
     ny = dy / dist
     overlap = (min_dist - dist) / 2
-    b1['pos']['x'] -= nx * overlap
-    b1['pos']['y'] -= ny * overlap
-    b2['pos']['x'] += nx * overlap
-    b2['pos']['y'] += ny * overlap
-
-    v1n = b1['vel']['x'] * nx + b1['vel']['y'] * ny
-    v2n = b2['vel']['x'] * nx + b2['vel']['y'] * ny
-    m1, m2 = b1['mass'], b2['mass']
+    pos[i, 0] -= nx * overlap
+    pos[i, 1] -= ny * overlap
+    pos[j, 0] += nx * overlap
+    pos[j, 1] += ny * overlap
+
+    v1n = vel[i, 0] * nx + vel[i, 1] * ny
+    v2n = vel[j, 0] * nx + vel[j, 1] * ny
+    m1, m2 = state.mass[i], state.mass[j]
     v1n_new = (v1n * (m1 - m2) + 2 * m2 * v2n) / (m1 + m2)
     v2n_new = (v2n * (m2 - m1) + 2 * m1 * v1n) / (m1 + m2)
 
-    b1['vel']['x'] += (v1n_new - v1n) * nx
-    b1['vel']['y'] += (v1n_new - v1n) * ny
-    b2['vel']['x'] += (v2n_new - v2n) * nx
-    b2['vel']['y'] += (v2n_new - v2n) * ny
+    vel[i, 0] += (v1n_new - v1n) * nx
+    vel[i, 1] += (v1n_new - v1n) * ny
+    vel[j, 0] += (v2n_new - v2n) * nx
+    vel[j, 1] += (v2n_new - v2n) * ny
+
+def collide_balls_batch(state, pairs, groups=None, reach=None):
+    # collide_balls dla tablicy par (K,2); grupy z color_pairs nie mają
+    # wspólnych kulek, więc każdą liczymy naraz, a wynik jest jak w pętli po parach.
+    # reach (N,), jeśli podane, zbiera największe odsunięcie kulki od pozycji z wejścia
+    pos, vel, radius, mass = state.pos, state.vel, state.radius, state.mass
+    start = pos.copy()
+    if reach is None:
+        reach = np.zeros(len(pos))
+    if groups is None:
+        groups = color_pairs(pairs)
+    for g in groups:
+        i, j = pairs[g, 0], pairs[g, 1]
+        dx = pos[j, 0] - pos[i, 0]
+        dy = pos[j, 1] - pos[i, 1]
+        dist = np.hypot(dx, dy)
+        min_dist = radius[i] + radius[j]
+        ok = (dist != 0) & (dist < min_dist)
+        i, j, dx, dy, dist, min_dist = i[ok], j[ok], dx[ok], dy[ok], dist[ok], min_dist[ok]
+
+        nx = dx / dist
+        ny = dy / dist
+        overlap = (min_dist - dist) / 2
+        pos[i, 0] -= nx * overlap
+        pos[i, 1] -= ny * overlap
+        pos[j, 0] += nx * overlap
+        pos[j, 1] += ny * overlap
+        for k in (i, j):
+            reach[k] = np.maximum(reach[k], np.hypot(*(pos[k] - start[k]).T))
+
+        v1n = vel[i, 0] * nx + vel[i, 1] * ny
+        v2n = vel[j, 0] * nx + vel[j, 1] * ny
+        m1, m2 = mass[i], mass[j]
+        v1n_new = (v1n * (m1 - m2) + 2 * m2 * v2n) / (m1 + m2)
+        v2n_new = (v2n * (m2 - m1) + 2 * m1 * v1n) / (m1 + m2)
+
+        vel[i, 0] += (v1n_new - v1n) * nx
+        vel[i, 1] += (v1n_new - v1n) * ny
+        vel[j, 0] += (v2n_new - v2n) * nx
+        vel[j, 1] += (v2n_new - v2n) * ny
+
+def reach_pairs(pos, radius, reach):
+    # pary i < j bliższe niż radius_i + radius_j + reach_i + reach_j, posortowane
+    # leksykograficznie; siatka z reach przyciętym do połowy największego
+    # promienia, a kulki z większym reach - przeciw wszystkim w pasie po x
+    n = len(pos)
+    cap = radius.max()
+    _, pairs = grid_pairs(pos, radius + np.minimum(reach, cap))
+    far = np.flatnonzero(reach > cap)
+    if not len(far):
+        return pairs
+    ext = radius + reach
+    order = np.argsort(pos[:, 0])
+    xs = pos[order, 0]
+    half = ext[far] + ext.max()
+    lo = np.searchsorted(xs, pos[far, 0] - half)
+    count = np.searchsorted(xs, pos[far, 0] + half, side="right") - lo
+    total = np.cumsum(count)
+    a = np.repeat(far, count)
+    b = order[np.repeat(lo - total + count, count) + np.arange(total[-1])]
+    d = pos[a] - pos[b]
+    hit = (a != b) & (np.einsum("ij,ij->i", d, d) < (ext[a] + ext[b]) ** 2)
+    a, b = a[hit], b[hit]
+    keys = np.union1d(pairs[:, 0] * n + pairs[:, 1], np.minimum(a, b) * n + np.maximum(a, b))
+    return np.stack([keys // n, keys % n], axis=1)
+
+def collide_balls_all(state):
+    """Ten sam wynik co pętla collide_balls po wszystkich parach i < j, bez
+    sprawdzania wszystkich par. Pętla rozwiązuje też parę, która zaczyna się
+    stykać dopiero po wcześniejszym wypchnięciu, a kulka odsuwa się w kroku
+    najwyżej o reach, więc zetknąć mogły się tylko pary z reach_pairs.
+    Zaczynamy od par bliższych niż suma promieni + połowa największego
+    promienia; dopóki sprawdzenie znajduje parę spoza listy, dokładamy ją
+    (w kolejności pętli) i krok liczymy od nowa. Lista tylko rośnie, więc
+    pętla się kończy. Z numbą pętla idzie wprost po siatce
+    (kernels.collide_sequential)."""
+    pos, vel, radius = state.pos, state.vel, state.radius
+    n = len(pos)
+    if kernels.enabled:
+        kernels.collide_sequential(pos, vel, radius, state.mass)
+        return
+    if n < 2:
+        return
+    saved = pos.copy(), vel.copy()
+    _, near = grid_pairs(pos, radius + radius.max() / 2)
+    while True:
+        reach = np.zeros(n)
+        collide_balls_batch(state, near, reach=reach)
+        keys = reach_pairs(saved[0], radius, reach) @ [n, 1]
+        known = near @ [n, 1]
+        missing = keys[~np.isin(keys, known)]
+        if not len(missing):
+            return
+        keys = np.union1d(known, missing)
+        near = np.stack([keys // n, keys % n], axis=1)
+        pos[:], vel[:] = saved
+
+def segment_array(segments):
+    # [((x1, y1), (x2, y2)), ...] -> tablica (S,4) z kolumnami x1, y1, x2, y2
+    return np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+
+class SegmentGrid:
+    """Statyczna siatka nad odcinkami: każda komórka zna odcinki, których
+    prostokąt otaczający (poszerzony o pad) na nią zachodzi. Kulka sprawdza
+    tylko odcinki ze swojej komórki, więc pad musi być >= jej promienia
+    (z zapasem na przesunięcie przy odbiciu)."""
+
+    def __init__(self, segments, pad, cell_size=None):
+        seg = segment_array(segments)
+        lo = np.minimum(seg[:, :2], seg[:, 2:]) - pad
+        hi = np.maximum(seg[:, :2], seg[:, 2:]) + pad
+        if cell_size is None:
+            cell_size = max(2.0 * pad, float(np.median((hi - lo).max(axis=1))))
+        self.cell_size = cell_size
+        self.origin = lo.min(axis=0)
+        self.shape = (np.floor((hi.max(axis=0) - self.origin) / cell_size).astype(int) + 1)
+
+        c0 = np.floor((lo - self.origin) / cell_size).astype(int)
+        c1 = np.floor((hi - self.origin) / cell_size).astype(int)
+        cells, ids = [], []
+        for s in range(len(seg)):
+            ix, iy = np.meshgrid(np.arange(c0[s, 0], c1[s, 0] + 1),
+                                 np.arange(c0[s, 1], c1[s, 1] + 1), indexing="ij")
+            cells.append((ix * self.shape[1] + iy).ravel())
+            ids.append(np.full(ix.size, s))
+        cells = np.concatenate(cells)
+        ids = np.concatenate(ids)
+        order = np.argsort(cells, kind="stable")  # w komórce zostaje kolejność odcinków
+        self.seg_ids = ids[order]
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+
+    def candidates(self, pos):
+        # pary (kulka, odcinek) z komórki środka kulki, posortowane po kulce
+        cell = np.floor((pos - self.origin) / self.cell_size).astype(int)
+        inside = np.all((cell >= 0) & (cell < self.shape), axis=1)
+        balls = np.flatnonzero(inside)
+        flat = cell[inside, 0] * self.shape[1] + cell[inside, 1]
+        start = self.cell_start[flat]
+        count = self.cell_start[flat + 1] - start
+        ball_idx = np.repeat(balls, count)
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return ball_idx, self.seg_ids[np.repeat(start, count) + offset]
+
+def closest_on_segments(pos, seg):
+    # najbliższe punkty odcinków seg (K,4) dla punktów pos (K,2)
+    line_vec = seg[:, 2:] - seg[:, :2]
+    p_vec = pos - seg[:, :2]
+    t = np.clip(np.einsum("ij,ij->i", p_vec, line_vec) / np.einsum("ij,ij->i", line_vec, line_vec), 0, 1)
+    closest = seg[:, :2] + t[:, None] * line_vec
+    normal = pos - closest
+    return closest, normal, np.hypot(normal[:, 0], normal[:, 1])
+
+def collide_house(state, segments, index=None):
+    pos, vel, radius = state.pos, state.vel, state.radius
+    seg = segment_array(segments)
+
+    # jedno przejście po wszystkich parach kulka × odcinek wybiera kulki,
+    # które czegoś dotykają
+    if index is None:
+        line_vec = seg[:, 2:] - seg[:, :2]
+        px = pos[:, 0, None] - seg[:, 0]
+        py = pos[:, 1, None] - seg[:, 1]
+        t = np.clip((px * line_vec[:, 0] + py * line_vec[:, 1]) / (line_vec ** 2).sum(axis=1), 0, 1)
+        dist = np.hypot(px - t * line_vec[:, 0], py - t * line_vec[:, 1])
+        hit_balls = np.flatnonzero((dist < radius[:, None]).any(axis=1))
+        ball_idx = np.repeat(hit_balls, len(seg))
+        seg_idx = np.tile(np.arange(len(seg)), len(hit_balls))
+    else:
+        ball_idx, seg_idx = index.candidates(pos)
+        _, _, dist = closest_on_segments(pos[ball_idx], seg[seg_idx])
+        hit = np.isin(ball_idx, ball_idx[dist < radius[ball_idx]])
+        ball_idx, seg_idx = ball_idx[hit], seg_idx[hit]
+    if len(ball_idx) == 0:
+        return
+
+    # tylko dla nich odcinki po kolei, jak w pętli per kulka: w k-tym przebiegu
+    # każda kulka ma co najwyżej jeden odcinek, więc przebieg jest wektorowy
+    starts = np.flatnonzero(np.r_[True, ball_idx[1:] != ball_idx[:-1]])
+    counts = np.diff(np.r_[starts, len(ball_idx)])
+    rank = np.arange(len(ball_idx)) - np.repeat(starts, counts)
+    for k in range(counts.max()):
+        sel = rank == k
+        b, s = ball_idx[sel], seg[seg_idx[sel]]
+        closest, normal, dist = closest_on_segments(pos[b], s)
+        # środek dokładnie na odcinku nie ma kierunku wypchnięcia (jak dist == 0 w collide_balls)
+        contact = (dist < radius[b]) & (dist > 0)
+        if not contact.any():
+            continue
+        b, s = b[contact], s[contact]
+        vel[b, 0], vel[b, 1] = reflect(vel[b, 0], vel[b, 1], s[:, 0], s[:, 1], s[:, 2], s[:, 3],
+                                       state.bounciness[b])
+        pos[b] = closest[contact] + normal[contact] / dist[contact, None] * radius[b, None]
+
+def swept_hits(p0, d, radius, seg):
+    """Pierwszy styk kół o środkach p0 + t * d (t w [0, 1]) z odcinkami seg
+    (K,4), para po parze. Zwraca (t, normalna styku od odcinka); t = inf, gdy
+    koło odcinka nie dotknie. Koło, które już na starcie zachodzi na odcinek
+    i dalej się do niego zbliża, ma styk w t = 0."""
+    a, b = seg[:, :2], seg[:, 2:]
+    length = np.hypot(b[:, 0] - a[:, 0], b[:, 1] - a[:, 1])
+    u = (b - a) / length[:, None]
+    side_normal = np.column_stack((-u[:, 1], u[:, 0]))
+    s0 = np.einsum("ij,ij->i", p0 - a, side_normal)
+    sign = np.where(s0 < 0, -1.0, 1.0)
+    approach = -sign * np.einsum("ij,ij->i", d, side_normal)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # bok: prosta odcinka odsunięta o r w stronę środka
+        t = np.maximum((np.abs(s0) - radius) / approach, 0.0)
+        along = np.einsum("ij,ij->i", p0 + t[:, None] * d - a, u)
+        ok = (approach > 0) & (t <= 1) & (along >= 0) & (along <= length)
+        toi = np.where(ok, t, np.inf)
+        normal = sign[:, None] * side_normal
+        # końce: okrąg o promieniu r wokół każdego końca odcinka
+        dd = np.einsum("ij,ij->i", d, d)
+        for end in (a, b):
+            m = p0 - end
+            half_b = np.einsum("ij,ij->i", m, d)
+            c = np.einsum("ij,ij->i", m, m) - radius ** 2
+            disc = half_b ** 2 - dd * c
+            t = np.maximum((-half_b - np.sqrt(np.maximum(disc, 0.0))) / dd, 0.0)
+            ok = (half_b < 0) & (disc >= 0) & (t <= 1) & (t <= toi)
+            toi = np.where(ok, t, toi)
+            hit = m + t[:, None] * d
+            normal = np.where(ok[:, None], hit / np.hypot(hit[:, 0], hit[:, 1])[:, None], normal)
+    return toi, normal
+
+def sweep_house(state, start, seg, passes=3):
+    """Ciągłe wykrywanie zderzeń z odcinkami: ruch w kroku to odcinek start -> pos.
+    Kulka staje w chwili pierwszego styku, odbija się jak w collide_house
+    (prędkość i reszta przesunięcia) i leci dalej; po passes odbiciach w jednym
+    kroku kolejny styk już tylko zatrzymuje kulkę. Działa dla każdego
+    przesunięcia, także wypchnięcia przez inne kulki."""
+    pos, vel, radius = state.pos, state.vel, state.radius
+    d = pos - start
+    balls = np.flatnonzero((d != 0).any(axis=1))
+    p0, d = start[balls], d[balls]
+    seg_lo = np.minimum(seg[:, :2], seg[:, 2:])
+    seg_hi = np.maximum(seg[:, :2], seg[:, 2:])
+    for bounce in range(passes + 1):
+        if len(balls) == 0:
+            return
+        # prostokąty zakreślone przez kulki: najpierw kontra prostokąt całego
+        # domku (większość kulek jest daleko), potem kontra prostokąty odcinków
+        r = radius[balls, None]
+        lo = np.minimum(p0, p0 + d) - r
+        hi = np.maximum(p0, p0 + d) + r
+        near = np.flatnonzero(np.all((lo <= seg_hi.max(axis=0)) & (hi >= seg_lo.min(axis=0)), axis=1))
+        k, s = np.nonzero(np.all(lo[near, None] <= seg_hi, axis=2) & np.all(hi[near, None] >= seg_lo, axis=2))
+        k = near[k]
+        if len(k) == 0:
+            return
+        toi, normal = swept_hits(p0[k], d[k], radius[balls[k]], seg[s])
+        # najwcześniejszy styk każdej kulki
+        order = np.lexsort((toi, k))
+        k, toi, normal = k[order], toi[order], normal[order]
+        first = np.r_[True, k[1:] != k[:-1]] & np.isfinite(toi)
+        k, t, n = k[first], toi[first, None], normal[first]
+        b = balls[k]
+        e = state.bounciness[b, None]
+        contact = p0[k] + t * d[k]
+        rest = (1 - t) * d[k] if bounce < passes else np.zeros_like(contact)
+        rest = (rest - 2 * np.minimum(np.einsum("ij,ij->i", rest, n), 0)[:, None] * n) * e
+        vel[b] = (vel[b] - 2 * np.minimum(np.einsum("ij,ij->i", vel[b], n), 0)[:, None] * n) * e
+        pos[b] = contact + rest
+        balls, p0, d = b, contact, rest
+
+def path_crossings(p0, p1, seg):
+    # (N,) ile odcinków seg przecina droga środka p0 -> p1 (ściśle, samo dotknięcie się nie liczy)
+    a, b = seg[:, :2], seg[:, 2:]
+
+    def cross(o, p, q):
+        return (p[..., 0] - o[..., 0]) * (q[..., 1] - o[..., 1]) - (p[..., 1] - o[..., 1]) * (q[..., 0] - o[..., 0])
+
+    p0, p1 = p0[:, None], p1[:, None]
+    apart = (cross(a, b, p0) * cross(a, b, p1) < 0) & (cross(p0, p1, a) * cross(p0, p1, b) < 0)
+    return apart.sum(axis=1)
+
+def bounce_walls(state):
+    pos, vel = state.pos, state.vel
+    for axis, limit in ((0, sim_width), (1, sim_height)):
+        low = pos[:, axis] < 0.0
+        pos[low, axis] = 0.0
+        vel[low, axis] *= -state.bounciness[low]
+        if axis == 1:
+            vel[low, 0] *= 1.0 - state.friction[low]
+        high = pos[:, axis] > limit
+        pos[high, axis] = limit
+        vel[high, axis] *= -state.bounciness[high]
+
+# --- usypianie i wyspy kontaktów ---
+def island_labels(labels, i, j):
+    """Spójne składowe grafu o krawędziach (i, j): labels (N,) - początkowe
+    etykiety, każda <= numerowi kulki i wskazująca kulkę z tą samą etykietą.
+    Zwraca najmniejszy numer kulki w składowej dla każdej kulki."""
+    labels = labels.copy()
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        new = labels.copy()
+        np.minimum.at(new, i, low)
+        np.minimum.at(new, j, low)
+        new = new[new]  # skok po wskaźnikach skraca łańcuchy etykiet
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+def cell_keys(pos, cell):
+    # klucz komórki siatki; 2^20 komórek na oś wystarcza dla świata sim_width x sim_height
+    c = np.floor(pos / cell).astype(np.int64)
+    return (c[:, 0] << 20) + c[:, 1]
 
 # --- solver RK4 ---
-def acceleration(pos, vel):
-    v = np.linalg.norm(vel)
-    drag = -air_resistance * v * vel
+def acceleration(pos, vel, drag=None):
+    # działa zarówno dla pojedynczej kulki (2,) jak i dla wszystkich naraz (N,2);
+    # drag - współczynnik oporu, skalar albo (N,1) dla oporu per kulka
+    if drag is None:
+        drag = air_resistance
+    v = np.linalg.norm(vel, axis=-1, keepdims=True)
+    drag = -drag * v * vel
     return np.array([gravity['x'], gravity['y']]) + drag
 
 def rk4_step(pos, vel, dt, accel_func):
@@ -135,93 +516,643 @@ def rk4_step(pos, vel, dt, accel_func):
     vel_new = vel + (dt/6.0)*(k1v + 2*k2v + 2*k3v + k4v)
     return pos_new, vel_new
 
-# --- pętla główna ---
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT or (
-           event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:  # lewy - podbijanie w górę
-                for ball in balls:
-                    ball['vel']['y'] += kick_force
-            elif event.button == 3:  # prawy - losowy kąt i moc
-                for ball in balls:
-                    angle = random.uniform(0, 2*np.pi)
-                    force = random.uniform(kick_force_min, kick_force_max)
-                    ball['vel']['x'] += force * np.cos(angle)
-                    ball['vel']['y'] += force * np.sin(angle)
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_RIGHT:
-                angle = np.radians(45)
-                for ball in balls:
-                    ball['vel']['x'] += kick_force * np.cos(angle)
-                    ball['vel']['y'] += kick_force * np.sin(angle)
-            elif event.key == pygame.K_LEFT:
-                angle = np.radians(135)
-                for ball in balls:
-                    ball['vel']['x'] += kick_force * np.cos(angle)
-                    ball['vel']['y'] += kick_force * np.sin(angle)
-
-    # --- fizyka ---
-    for ball in balls:
-        pos = np.array([ball['pos']['x'], ball['pos']['y']])
-        vel = np.array([ball['vel']['x'], ball['vel']['y']])
-        pos, vel = rk4_step(pos, vel, time_step, acceleration)
-        ball['pos']['x'], ball['pos']['y'] = pos
-        ball['vel']['x'], ball['vel']['y'] = vel
-
-        # kolizje z domkiem
-        for (x1, y1), (x2, y2) in house_segments:
-            px, py = ball['pos']['x'], ball['pos']['y']
-            line_vec = np.array([x2 - x1, y2 - y1])
-            p_vec = np.array([px - x1, py - y1])
-            t = np.clip(np.dot(p_vec, line_vec) / np.dot(line_vec, line_vec), 0, 1)
-            closest = np.array([x1, y1]) + t * line_vec
-            dist = np.linalg.norm(np.array([px, py]) - closest)
-            if dist < ball['radius']:
-                ball['vel']['x'], ball['vel']['y'] = reflect(
-                    ball['vel']['x'], ball['vel']['y'], x1, y1, x2, y2, bounciness
-                )
-                normal = np.array([px - closest[0], py - closest[1]])
-                normal /= np.linalg.norm(normal)
-                ball['pos']['x'] = closest[0] + normal[0] * ball['radius']
-                ball['pos']['y'] = closest[1] + normal[1] * ball['radius']
-
-        # odbicia od ścian, podłogi i sufitu
-        if ball['pos']['x'] < 0.0:
-            ball['pos']['x'] = 0.0
-            ball['vel']['x'] *= -bounciness
-        if ball['pos']['x'] > sim_width:
-            ball['pos']['x'] = sim_width
-            ball['vel']['x'] *= -bounciness
-        if ball['pos']['y'] < 0.0:
-            ball['pos']['y'] = 0.0
-            ball['vel']['y'] *= -bounciness
-        if ball['pos']['y'] > sim_height:
-            ball['pos']['y'] = sim_height
-            ball['vel']['y'] *= -bounciness
-
-    # kolizje między piłkami
-    for b1, b2 in itertools.combinations(balls, 2):
-        collide_balls(b1, b2)
-
-    # --- rysowanie ---
-    screen.fill((255, 255, 255))
-    for i, ((x1, y1), (x2, y2)) in enumerate(house_segments):
+# --- adaptacyjny solver Dormanda-Prince'a RK45 ---
+DP_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+)
+DP_B = (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84)
+# różnica wag rzędu 5 i 4 (ostatni współczynnik dotyczy k7 = f(y_new))
+DP_E = (71/57600, 0.0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+def dopri_step(pos, vel, h, accel_func):
+    """Krok Dormanda-Prince'a 5(4) dla wszystkich kulek; h - (M,1).
+    Zwraca pos, vel rzędu 5 oraz oszacowanie błędu (M,4)."""
+    kx, kv = [], []
+    for a in DP_A:
+        p, v = pos, vel
+        for c, dx, dv in zip(a, kx, kv):
+            p = p + (h * c) * dx
+            v = v + (h * c) * dv
+        kx.append(v)
+        kv.append(accel_func(p, v))
+    pos_new, vel_new = pos, vel
+    for b, dx, dv in zip(DP_B, kx, kv):
+        pos_new = pos_new + (h * b) * dx
+        vel_new = vel_new + (h * b) * dv
+    kx.append(vel_new)
+    kv.append(accel_func(pos_new, vel_new))
+    err_x = h * sum(e * dx for e, dx in zip(DP_E, kx))
+    err_v = h * sum(e * dv for e, dv in zip(DP_E, kv))
+    return pos_new, vel_new, np.hstack((err_x, err_v))
+
+def wall_event(pos, vel, pos_new, vel_new, h, limits=None):
+    """Ułamek kroku s (K,), w którym kulka pierwszy raz przecina ścianę, i oś (K,).
+    Położenie w kroku to wielomian Hermite'a z pos/vel na końcach; pierwiastek
+    szukany bisekcją. s == 1 - brak zdarzenia."""
+    if limits is None:
+        limits = (sim_width, sim_height)
+    first = np.ones(len(pos))
+    axis_hit = np.full(len(pos), -1)
+    for axis, limit in enumerate(limits):
+        p0, p1 = pos[:, axis], pos_new[:, axis]
+        m0, m1 = h * vel[:, axis], h * vel_new[:, axis]
+        for wall in (0.0, limit):
+            side = 1.0 if wall == 0.0 else -1.0
+            cross = np.flatnonzero((side * (p0 - wall) >= 0) & (side * (p1 - wall) < 0))
+            if not len(cross):
+                continue
+            lo, hi = np.zeros(len(cross)), np.ones(len(cross))
+            q0, q1, n0, n1 = p0[cross], p1[cross], m0[cross], m1[cross]
+            for _ in range(40):
+                s = 0.5 * (lo + hi)
+                s2, s3 = s * s, s * s * s
+                x = ((2*s3 - 3*s2 + 1) * q0 + (s3 - 2*s2 + s) * n0
+                     + (-2*s3 + 3*s2) * q1 + (s3 - s2) * n1)
+                inside = side * (x - wall) >= 0
+                lo = np.where(inside, s, lo)
+                hi = np.where(inside, hi, s)
+            earlier = hi < first[cross]
+            first[cross[earlier]] = hi[earlier]
+            axis_hit[cross[earlier]] = axis
+    return first, axis_hit
+
+def dopri_advance(state, dt, h, atol=1e-6, rtol=1e-6, stats=None, limits=None):
+    """Przesuwa wszystkie kulki o dt krokami RK45; każda kulka ma własny krok h (N,),
+    który jest poprawiany w miejscu. Uderzenia w ściany i podłogę są liczone jako
+    zdarzenia: krok kończy się w chwili uderzenia, prędkość jest odbijana i ruch
+    trwa dalej. Zdarzenie krótsze niż h_min (kulka leżąca na podłodze) jest
+    obsługiwane jak w bounce_walls - przycięciem położenia."""
+    if limits is None:
+        limits = (sim_width, sim_height)
+    if stats is None:
+        stats = {}
+    for key in ("steps", "rejected", "events", "evals"):
+        stats.setdefault(key, 0)
+    pos, vel = state.pos, state.vel
+    drag = state.air_resistance[:, None]
+    h_min = 1e-6 * dt
+    remaining = np.full(len(state), dt)
+    while True:
+        act = np.flatnonzero(remaining > h_min)
+        if not len(act):
+            break
+        hs = np.maximum(np.minimum(h[act], remaining[act]), h_min)
+        p0, v0 = pos[act], vel[act]
+        accel = lambda p, v: acceleration(p, v, drag[act])
+        p1, v1, err = dopri_step(p0, v0, hs[:, None], accel)
+        stats["evals"] += 7 * len(act)
+
+        # norma błędu na kulkę i nowy krok
+        y0, y1 = np.hstack((p0, v0)), np.hstack((p1, v1))
+        scale = atol + rtol * np.maximum(np.abs(y0), np.abs(y1))
+        e = np.sqrt(np.mean((err / scale) ** 2, axis=1))
+        factor = np.clip(0.9 * np.maximum(e, 1e-10) ** -0.2, 0.2, 5.0)
+        ok = (e <= 1.0) | (hs <= h_min)
+        # krok przycięty do końca klatki nie zmniejsza h na następną klatkę
+        truncated = ok & (hs < h[act])
+        h[act] = np.where(truncated, np.maximum(h[act], hs * factor), hs * factor)
+        stats["steps"] += int(ok.sum())
+        stats["rejected"] += int((~ok).sum())
+        if not ok.any():
+            continue
+
+        acc, p0, v0, p1, v1, hs = act[ok], p0[ok], v0[ok], p1[ok], v1[ok], hs[ok]
+        s, axis = wall_event(p0, v0, p1, v1, hs, limits)
+        hit = np.flatnonzero((s < 1.0) & (s * hs > h_min))
+        if len(hit):
+            # powtórzony krok do chwili uderzenia; interpolant Hermite'a daje
+            # przybliżenie, dwie poprawki Newtona na prawdziwym kroku RK45 je dopracowują
+            rows, cols = np.arange(len(hit)), axis[hit]
+            limit = np.asarray(limits, dtype=np.float64)[cols]
+            walls = np.where(p1[hit, cols] < 0.5 * limit, 0.0, limit)
+            accel = lambda p, v: acceleration(p, v, drag[acc[hit]])
+            tau = s[hit] * hs[hit]
+            for _ in range(2):
+                ph, vh, _ = dopri_step(p0[hit], v0[hit], tau[:, None], accel)
+                vn = vh[rows, cols]
+                shift = np.divide(ph[rows, cols] - walls, vn, out=np.zeros_like(vn), where=np.abs(vn) > 1e-12)
+                tau = np.clip(tau - shift, h_min, hs[hit])
+            ph, vh, _ = dopri_step(p0[hit], v0[hit], tau[:, None], accel)
+            stats["evals"] += 3 * 7 * len(hit)
+            stats["events"] += len(hit)
+            ph[rows, cols] = walls
+            vh[rows, cols] *= -state.bounciness[acc[hit]]
+            floor = (cols == 1) & (walls == 0.0)
+            vh[floor, 0] *= 1.0 - state.friction[acc[hit][floor]]
+            p1[hit], v1[hit] = ph, vh
+            hs[hit] = tau
+        pos[acc], vel[acc] = p1, v1
+        remaining[acc] -= hs
+    # zdarzenia zbyt krótkie na osobny krok
+    bounce_walls(state)
+    return stats
+
+def compare_integrators(t_end=5.0, n=N):
+    """Błąd końcowego położenia i liczba kroków: stały krok RK4 z przycinaniem
+    przy ścianach vs RK45 ze zdarzeniami. Scena bez domku i zderzeń kulek;
+    odniesienie to RK45 z tolerancją 1e-12."""
+    def launch():
+        return BallState.launch(n, speeds, angles_deg)
+
+    reference = launch()
+    dopri_advance(reference, t_end, np.full(n, 1e-3), atol=1e-12, rtol=1e-12)
+
+    rows = []
+    for divisions in (1, 4, 16, 64, 256):
+        dt = time_step / divisions
+        state = launch()
+        steps = int(round(t_end / dt))
+        t0 = time.perf_counter()
+        for _ in range(steps):
+            state.pos, state.vel = rk4_step(state.pos, state.vel, dt, acceleration)
+            bounce_walls(state)
+        elapsed = time.perf_counter() - t0
+        error = np.abs(state.pos - reference.pos).max()
+        rows.append(("RK4", f"dt=1/{int(round(1 / dt))}", steps, 4 * steps * n, error, elapsed))
+
+    for tol in (1e-3, 1e-5, 1e-7, 1e-9):
+        state = launch()
+        t0 = time.perf_counter()
+        stats = dopri_advance(state, t_end, np.full(n, time_step), atol=tol, rtol=tol)
+        elapsed = time.perf_counter() - t0
+        error = np.abs(state.pos - reference.pos).max()
+        rows.append(("RK45", f"tol={tol:.0e}", stats["steps"] / n, stats["evals"], error, elapsed))
+        rows[-1] += (stats["rejected"], stats["events"])
+
+    print(f"=== Całkowanie {n} kulek przez {t_end} s, błąd położenia względem RK45 tol=1e-12 ===")
+    print(f"{'metoda':6s} | {'ustawienie':12s} | {'kroki/kulkę':>11s} | {'wywołania f':>11s} | {'błąd':>9s} | {'czas':>8s}")
+    for method, setting, steps, evals, error, elapsed, *extra in rows:
+        note = f" | odrzucone: {extra[0]}, zdarzenia: {extra[1]}" if extra else ""
+        print(f"{method:6s} | {setting:12s} | {steps:11.0f} | {evals:11d} | {error:9.2e} | {elapsed:7.3f}s{note}")
+
+    # przy równej dokładności: najtańszy RK4 co najmniej tak dokładny jak dany RK45
+    print("\nPrzy równej dokładności (RK4 z najmniejszą liczbą wywołań f o błędzie <= RK45):")
+    rk4 = [r for r in rows if r[0] == "RK4"]
+    for method, setting, _, evals, error, *_ in rows:
+        if method != "RK45":
+            continue
+        match = [r for r in rk4 if r[4] <= error]
+        if match:
+            best = min(match, key=lambda r: r[3])
+            print(f"  RK45 {setting}: {evals} wywołań, RK4 {best[1]}: {best[3]} wywołań ({best[3] / evals:.1f}x)")
+        else:
+            print(f"  RK45 {setting}: błąd {error:.1e} - żaden sprawdzony krok RK4 go nie osiąga")
+    return rows
+
+# --- scena (bez pygame) ---
+class BallScene:
+    """Kulki i domek; step() liczy fizykę bez okna i bez ograniczania FPS."""
+
+    def __init__(self, n=N, segments=house_segments, dt=time_step, layout=None,
+                 balls=None, ball_collisions=True, integrator="rk4", tol=1e-6, surrogate=None,
+                 profiler=None, sleep=False, ccd=False):
+        # "launch" - wszystkie z jednego punktu jak w oryginale; przy większej
+        # liczbie kulek niż prędkości startowych domyślnie "random"; "settled" -
+        # prawie wszystkie leżą już na podłodze (BallState.settled);
+        # balls - gotowy BallState zamiast układu startowego
+        if layout is None:
+            layout = "launch" if n <= len(speeds) else "random"
+        if balls is not None:
+            self.balls = balls
+        elif layout == "launch":
+            self.balls = BallState.launch(n, speeds, angles_deg)
+        elif layout == "settled":
+            self.balls = BallState.settled(n, sim_width, sim_height)
+        else:
+            self.balls = BallState.scatter(n, sim_width, sim_height)
+        # bez kolizji między kulkami każda kulka to niezależny przebieg
+        self.ball_collisions = ball_collisions
+        self.segments = segments
+        self.segment_coords = segment_array(segments)
+        self.segment_index = SegmentGrid(segments, pad=2 * self.balls.radius.max())
+        self.dt = dt
+        self.time = 0.0
+        self.recorder = None
+        # "rk4" - stały krok dt; "rk45" - Dormand-Prince z własnym krokiem każdej kulki
+        self.integrator = integrator
+        self.tol = tol
+        self.h = np.full(len(self.balls), dt)
+        self.integrator_stats = {}
+        # "surrogate" - wyuczony model z surrogate.py zamiast rk4_step (jeden krok dt)
+        if integrator == "surrogate" and surrogate is None:
+            from surrogate import fit
+            surrogate = fit(1, dt=dt)
+        self.surrogate = surrogate
+        # czasy faz kroku; domyślnie wyłączony (prawie zerowy koszt)
+        self.profiler = profiler or PhaseProfiler()
+        # usypianie: śpiące kulki nie są całkowane ani sprawdzane z domkiem i ścianami;
+        # island - etykieta wyspy kontaktów śpiącej kulki (budzą się razem)
+        self.sleep = sleep
+        n = len(self.balls)
+        self.awake = np.ones(n, dtype=bool)
+        self.rest_time = np.zeros(n)
+        self.island = np.arange(n)
+        # komórka siatki kontaktów mieści parę największych kulek z zapasem 5%
+        self.contact_cell = 2.2 * self.balls.radius.max()
+        self._sleeping = None  # (numery śpiących, klucze komórek) posortowane po kluczu
+        # ciągłe wykrywanie zderzeń z domkiem (sweep_house) - szybkie kulki nie
+        # przelatują przez odcinki nawet przy dużym dt
+        self.ccd = ccd
+
+    def record(self, path):
+        # każdy kolejny krok step() trafia do nagrania w katalogu path
+        self.recorder = TrajectoryRecorder(path, self.dt, (sim_width, sim_height), source="zadanie1")
+        return self.recorder
+
+    def step(self, n_steps=1):
+        phase = self.profiler.phase
+        for _ in range(n_steps):
+            # ze śpiącymi kulkami ruch, domek i ściany liczone są na kopii obudzonych
+            active = np.flatnonzero(self.awake) if self.sleep and not self.awake.all() else None
+            balls = self.balls if active is None else self.balls.subset(active)
+            h = self.h if active is None else self.h[active]
+            start = balls.pos.copy() if self.ccd else None
+            with phase("integrate"):
+                if self.integrator == "rk45":
+                    dopri_advance(balls, self.dt, h, self.tol, self.tol, self.integrator_stats)
+                elif self.integrator == "surrogate":
+                    balls.pos, balls.vel = self.surrogate.step(balls.pos, balls.vel)
+                else:
+                    drag = balls.air_resistance[:, None]
+                    balls.pos, balls.vel = rk4_step(balls.pos, balls.vel, self.dt,
+                                                    lambda pos, vel: acceleration(pos, vel, drag))
+
+            # kolizje z domkiem
+            with phase("house"):
+                if start is not None:
+                    # najpierw ściany świata: kulka pod podłogą nie może przejść pod domkiem
+                    bounce_walls(balls)
+                    sweep_house(balls, start, self.segment_coords)
+                collide_house(balls, self.segment_coords, self.segment_index)
+
+            # odbicia od ścian, podłogi i sufitu
+            with phase("walls"):
+                bounce_walls(balls)
+
+            if active is not None:
+                self.balls.pos[active], self.balls.vel[active], self.h[active] = balls.pos, balls.vel, h
+                balls = self.balls
+
+            # z CCD wypchnięcia przez inne kulki też nie mogą przenieść kulki przez domek
+            start = balls.pos.copy() if self.ccd and self.ball_collisions else None
+            # kolizje między piłkami w kolejności pętli po wszystkich parach
+            if self.ball_collisions and not self.sleep:
+                with phase("narrowphase"):
+                    collide_balls_all(balls)
+            elif self.sleep:
+                contacts = np.empty((0, 2), np.intp)
+                if self.ball_collisions:
+                    with phase("broadphase"):
+                        contacts = self._contacts(active)
+                    with phase("narrowphase"):
+                        self._collide_awake(active, contacts)
+                with phase("sleep"):
+                    self._update_sleep(contacts)
+            if start is not None:
+                with phase("house"):
+                    sweep_house(balls, start, self.segment_coords)
+
+            self.time += self.dt
+            if self.recorder is not None:
+                with phase("record"):
+                    self.recorder.record(balls.pos, balls.vel, balls.radius, balls.color)
+
+    # --- usypianie ---
+    def _contacts(self, active):
+        """Pary stykających się kulek (z zapasem 5% sumy promieni), w których
+        przynajmniej jedna nie śpi. Śpiące kulki trafiają do siatki tylko wtedy,
+        gdy leżą w komórce obok obudzonej."""
+        balls = self.balls
+        if active is None:
+            near = np.arange(len(balls))
+        else:
+            if self._sleeping is None:
+                sleeping = np.flatnonzero(~self.awake)
+                keys = cell_keys(balls.pos[sleeping], self.contact_cell)
+                order = np.argsort(keys)
+                self._sleeping = sleeping[order], keys[order]
+            sleeping, keys = self._sleeping
+            cells = cell_keys(balls.pos[active], self.contact_cell)
+            found = []
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    target = cells + (dx << 20) + dy
+                    lo = np.searchsorted(keys, target, "left")
+                    count = np.searchsorted(keys, target, "right") - lo
+                    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+                    found.append(sleeping[np.repeat(lo, count) + offset])
+            near = np.concatenate([active, np.unique(np.concatenate(found))])
+        candidates, _ = grid_pairs(balls.pos[near], balls.radius[near], self.contact_cell)
+        i, j = near[candidates[:, 0]], near[candidates[:, 1]]
+        d = balls.pos[i] - balls.pos[j]
+        touching = (np.einsum("ij,ij->i", d, d) < (1.05 * (balls.radius[i] + balls.radius[j])) ** 2) \
+            & (self.awake[i] | self.awake[j])
+        return np.column_stack((i[touching], j[touching]))
+
+    def _collide_awake(self, active, contacts):
+        """collide_balls_all na obudzonych kulkach i śpiących z ich kontaktów
+        (ta sama kolejność par co bez usypiania; gdy nikt nie śpi - wszystkie
+        kulki). Śpiąca kulka, którą zderzenie pchnęło albo rozpędziło, budzi
+        całą swoją wyspę; samo zbliżenie na zapas kontaktu jej nie budzi."""
+        balls = self.balls
+        if active is None:
+            collide_balls_all(balls)
+            return
+        index = np.union1d(active, contacts.ravel())
+        part = balls.subset(index)
+        pos, vel = part.pos.copy(), part.vel.copy()
+        collide_balls_all(part)
+        balls.pos[index], balls.vel[index] = part.pos, part.vel
+        # drobne wypchnięcia między śpiącymi (stoją dokładnie styk w styk) nie budzą
+        shift = np.hypot(*(part.pos - pos).T)
+        hit = (part.vel != vel).any(axis=1) | (shift > 1e-3 * part.radius)
+        touched = index[hit & ~self.awake[index]]
+        if len(touched):
+            self.wake(touched)
+
+    def _update_sleep(self, contacts):
+        """Kulki wolne przez sleep_time zasypiają całymi wyspami: wyspa (składowa
+        grafu kontaktów między obudzonymi kulkami) zasypia, gdy wszystkie jej kulki
+        są gotowe. Śpiących kulek nic nie dotyka - dotknięcie od razu je budzi."""
+        awake = self.awake
+        # kulka leżąca na podłodze co krok dostaje |g| * dt i odbija się od niej,
+        # więc przy dużym dt próg musi to przekraczać
+        calm = awake & (np.hypot(*self.balls.vel.T) < max(sleep_speed, 1.5 * abs(gravity_y) * self.dt))
+        self.rest_time[awake] = np.where(calm[awake], self.rest_time[awake] + self.dt, 0.0)
+        ready = awake & (self.rest_time >= sleep_time)
+        if not ready.any():
+            return
+        labels = island_labels(np.arange(len(awake)), contacts[:, 0], contacts[:, 1])
+        falling = ready & ~np.isin(labels, labels[awake & ~ready])
+        if not falling.any():
+            return
+        self.island[falling] = labels[falling]
+        awake[falling] = False
+        self.balls.vel[falling] = 0.0
+        self._sleeping = None
+
+    def wake(self, index=None):
+        """Budzi wyspy, do których należą kulki index (domyślnie wszystkie kulki)."""
+        if index is None:
+            woken = ~self.awake
+        else:
+            index = np.asarray(index).reshape(-1)
+            islands = np.unique(self.island[index[~self.awake[index]]])
+            woken = ~self.awake & np.isin(self.island, islands)
+        if woken.any():
+            self.awake[woken] = True
+            self.rest_time[woken] = 0.0
+            self.island[woken] = np.flatnonzero(woken)
+            self._sleeping = None
+
+    # --- pchnięcia (budzą wyspy pchniętych kulek); index - które kulki, domyślnie wszystkie ---
+    def kick_up(self, force=kick_force, index=slice(None)):
+        self.wake(np.arange(len(self.balls))[index])
+        self.balls.vel[index, 1] += force
+
+    def kick_random(self, force_min=kick_force_min, force_max=kick_force_max, index=slice(None)):
+        index = np.arange(len(self.balls))[index]
+        self.wake(index)
+        angle = np.random.uniform(0, 2*np.pi, len(index))
+        force = np.random.uniform(force_min, force_max, len(index))
+        self.balls.vel[index, 0] += force * np.cos(angle)
+        self.balls.vel[index, 1] += force * np.sin(angle)
+
+    def kick_angle(self, angle_deg, force=kick_force, index=slice(None)):
+        self.wake(np.arange(len(self.balls))[index])
+        angle = np.radians(angle_deg)
+        self.balls.vel[index] += force * np.array([np.cos(angle), np.sin(angle)])
+
+def run_headless(n_steps, n=N, layout=None, record=None, integrator="rk4", profiler=None, sleep=False,
+                 ccd=False, dt=time_step):
+    scene = BallScene(n, dt=dt, layout=layout, integrator=integrator, profiler=profiler, sleep=sleep, ccd=ccd)
+    if record:
+        scene.record(record)
+    t0 = time.perf_counter()
+    for _ in range(n_steps):
+        scene.step()
+        scene.profiler.end_frame()
+    elapsed = time.perf_counter() - t0
+    if scene.recorder is not None:
+        scene.recorder.close()
+    print(f"Kulki: {n} | kroki: {n_steps} | czas: {elapsed:.3f} s | {n_steps / elapsed:.1f} kroków/s")
+    if sleep:
+        print(f"Śpiące kulki: {int((~scene.awake).sum())} / {n}")
+    if scene.integrator_stats:
+        stats = scene.integrator_stats
+        print(f"RK45: kroki: {stats['steps']} | odrzucone: {stats['rejected']} | zdarzenia: {stats['events']}"
+              f" | wywołania f: {stats['evals']}")
+    if scene.profiler.enabled:
+        scene.profiler.report()
+        scene.profiler.close()
+    return scene
+
+def benchmark_sleep(n=10_000, steps=600, block=60, warmup=180, stir=0.01, seed=0):
+    """Kroki/s prawie uspokojonej sceny (layout "settled") bez usypiania i z nim,
+    w blokach po block kroków. warmup kroków poza pomiarem: spadające kulki
+    lądują, a trafione grupki wytracają ruch na podłodze z tarciem. Na początku
+    każdego bloku ułamek stir kulek dostaje kick_up, więc w stanie ustalonym
+    część sceny zawsze się rusza; obie sceny dostają te same pchnięcia."""
+    print(f"=== Usypianie: {n} kulek, układ settled, {steps} kroków, pchnięcia {stir:.0%} na blok ===")
+    rates, awake = {}, []
+    for sleep in (False, True):
+        np.random.seed(seed)
+        scene = BallScene(n, layout="settled", sleep=sleep)
+        scene.step(warmup)
+        rng = np.random.default_rng(seed)
+        rates[sleep] = []
+        for _ in range(steps // block):
+            scene.kick_up(index=rng.choice(n, int(stir * n), replace=False))
+            t0 = time.perf_counter()
+            scene.step(block)
+            rates[sleep].append(block / (time.perf_counter() - t0))
+            if sleep:
+                awake.append(int(scene.awake.sum()))
+    for k, (off, on, woken) in enumerate(zip(rates[False], rates[True], awake)):
+        print(f"kroki {warmup + k * block:5d}-{warmup + (k + 1) * block:5d} | bez usypiania {off:7.1f} kroków/s "
+              f"| z usypianiem {on:7.1f} kroków/s | {on / off:5.1f}x | obudzone: {woken} / {n}")
+    total = {sleep: len(r) / sum(1 / v for v in r) for sleep, r in rates.items()}
+    print(f"stan ustalony: {total[False]:.1f} -> {total[True]:.1f} kroków/s ({total[True] / total[False]:.1f}x)"
+          f" | obudzone średnio: {np.mean(awake):.0f} / {n}")
+    # pchnięcie jednej leżącej kulki budzi całą jej wyspę (grupkę stykających się)
+    sleeping = np.flatnonzero(~scene.awake)
+    if len(sleeping):
+        before = int(scene.awake.sum())
+        scene.kick_up(index=sleeping[:1])
+        print(f"pchnięcie 1 śpiącej kulki budzi {int(scene.awake.sum()) - before} kulek jej wyspy")
+    return total
+
+def stress_tunneling(n=2000, seconds=10.0, kick_every=0.5, dts=(1 / 240, 1 / 60, 1 / 30), seed=0):
+    """Kulki co kick_every s pchane kick_random (do kick_force_max); liczy kroki,
+    w których droga środka kulki przecięła odcinek domku (przelot na drugą
+    stronę), bez i z sweep_house, dla każdego dt z dts - także mniejszego niż
+    domyślny, żeby porównać CCD z samym zmniejszeniem kroku."""
+    print(f"=== Przeloty przez domek: {n} kulek, {seconds:.0f} s, pchnięcia do {kick_force_max} m/s ===")
+    seg = segment_array(house_segments)
+    for dt in dts:
+        for ccd in (False, True):
+            np.random.seed(seed)
+            scene = BallScene(n, dt=dt, layout="random", ccd=ccd)
+            steps, kick = int(round(seconds / dt)), int(round(kick_every / dt))
+            events, elapsed = 0, 0.0
+            for k in range(steps):
+                if k % kick == 0:
+                    scene.kick_random()
+                start = scene.balls.pos.copy()
+                t0 = time.perf_counter()
+                scene.step()
+                elapsed += time.perf_counter() - t0
+                events += int((path_crossings(start, scene.balls.pos, seg) > 0).sum())
+            print(f"dt: 1/{1 / dt:3.0f} s | CCD: {'tak' if ccd else 'nie':3s} | przeloty: {events:6d} "
+                  f"| {steps / elapsed:7.1f} kroków/s | {seconds / elapsed:5.2f}x czasu rzeczywistego")
+
+def check_collisions(cases=((10, "launch", 60), (300, "random", 20), (300, "launch", 20), (2000, "random", 3)),
+                     tolerance=1e-9):
+    """Trajektorie BallScene wobec sceny bez zderzeń kulek, w której po każdym
+    kroku idzie dawna pętla collide_balls po itertools.combinations - dla
+    jądra numby i ścieżki NumPy. Pętla jest O(N^2) w Pythonie, stąd małe N."""
+    print("=== BallScene vs pętla po wszystkich parach ===")
+    backends = (True, False) if kernels.enabled else (False,)
+    ok = True
+    for n, layout, steps in cases:
+        for backend in backends:
+            kernels.enabled, saved = backend, kernels.enabled
+            try:
+                np.random.seed(0)
+                scene = BallScene(n, layout=layout)
+                np.random.seed(0)
+                reference = BallScene(n, layout=layout, ball_collisions=False)
+                error = 0.0
+                for _ in range(steps):
+                    scene.step()
+                    reference.step()
+                    for i, j in itertools.combinations(range(n), 2):
+                        collide_balls(reference.balls, i, j)
+                    error = max(error, np.abs(scene.balls.pos - reference.balls.pos).max(),
+                                np.abs(scene.balls.vel - reference.balls.vel).max())
+            finally:
+                kernels.enabled = saved
+            good = error <= tolerance
+            ok &= good
+            print(f"{n:5d} kulek | {layout:7s} | {steps:3d} kroków | {'numba' if backend else 'NumPy':5s} "
+                  f"| max różnica pos/vel: {error:9.2e} | {'OK' if good else 'RÓŻNE'}")
+    return ok
+
+# --- podgląd pygame ---
+def main(n=N, record=None, profiler=None, sleep=False, ccd=False, dt=time_step):
+    if pygame is None:
+        print("Brak pygame — użyj trybu --headless.")
+        return
+
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Balls Simulation with RK4 solver")
+    clock = pygame.time.Clock()
+    scene = BallScene(n, dt=dt, profiler=profiler, sleep=sleep, ccd=ccd)
+    if record:
+        scene.record(record)
+    profiler = scene.profiler
+    font = pygame.font.SysFont("Consolas", 16) if profiler.enabled else None
+    loop = FixedStepLoop(scene.dt)
+    previous = None
+
+    # domek się nie rusza - rysujemy go raz na tło
+    background = pygame.Surface((width, height)).convert()
+    background.fill((255, 255, 255))
+    for i, ((x1, y1), (x2, y2)) in enumerate(scene.segments):
         color = (0, 0, 0)
         if i < 3: color = (0, 0, 255)
         elif i < 5: color = (200, 0, 0)
         else: color = (100, 100, 100)
-        pygame.draw.line(screen, color, (cX(x1), cY(y1)), (cX(x2), cY(y2)), 4)
+        pygame.draw.line(background, color, (cX(x1), cY(y1)), (cX(x2), cY(y2)), 4)
+    renderer = SpriteRenderer(screen, background)
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (
+               event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:  # lewy - podbijanie w górę
+                    scene.kick_up()
+                elif event.button == 3:  # prawy - losowy kąt i moc
+                    scene.kick_random()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RIGHT:
+                    scene.kick_angle(45)
+                elif event.key == pygame.K_LEFT:
+                    scene.kick_angle(135)
+
+        # --- fizyka: stały krok dt niezależnie od FPS ---
+        for _ in range(loop.frame()):
+            previous = scene.balls.pos.copy()
+            scene.step()
 
-    for ball in balls:
-        pygame.draw.circle(screen, ball['color'], (cX(ball['pos']['x']), cY(ball['pos']['y'])),
-                           int(c_scale * ball['radius']))
+        # --- rysowanie (pomijane, gdy fizyka nie nadąża) ---
+        if loop.render():
+            with profiler.phase("draw"):
+                renderer.clear()
+                balls = scene.balls
+                pos = interpolate(previous, balls.pos, loop.alpha)
+                # śpiące kulki przyciemnione
+                color = balls.color if scene.awake.all() else np.where(scene.awake[:, None], balls.color, balls.color // 2)
+                renderer.circles(pos[:, 0] * c_scale, height - pos[:, 1] * c_scale,
+                                 (c_scale * balls.radius).astype(int), color)
+                for row, line in enumerate(profiler.hud_lines()):
+                    renderer.text(font, line, (0, 0, 0), (12, 12 + 18 * row))
+                renderer.present()
+        profiler.end_frame()
+        clock.tick(60)
 
-    pygame.display.flip()
-    clock.tick(60)
+    if scene.recorder is not None:
+        scene.recorder.close()
+    profiler.close()
+    pygame.quit()
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kulki z solverem RK4 odbijające się od domku")
+    parser.add_argument("--headless", action="store_true", help="liczy fizykę bez okna i podaje kroki/s")
+    parser.add_argument("--steps", type=int, default=1000, help="liczba kroków w trybie --headless")
+    parser.add_argument("--balls", type=int, default=None,
+                        help=f"liczba kulek (domyślnie {N}, w --sleep-benchmark 10000, w --tunneling 2000)")
+    parser.add_argument("--layout", choices=("launch", "random", "settled"), default=None,
+                        help="start z jednego punktu, losowo w całym świecie albo prawie wszystkie już leżą")
+    parser.add_argument("--sleep", action="store_true", help="usypiaj kulki, które przestały się ruszać")
+    parser.add_argument("--sleep-benchmark", action="store_true",
+                        help="kroki/s prawie uspokojonej sceny bez usypiania i z nim")
+    parser.add_argument("--ccd", action="store_true",
+                        help="ciągłe wykrywanie zderzeń z domkiem (bez przelotów przy szybkich kulkach)")
+    parser.add_argument("--dt", type=float, default=time_step, help="krok fizyki [s]")
+    parser.add_argument("--tunneling", action="store_true",
+                        help="test przelotów przez domek bez CCD i z nim (--balls, domyślnie 2000)")
+    parser.add_argument("--record", metavar="DIR", help="zapisz trajektorie do katalogu (recorder.py replay DIR)")
+    parser.add_argument("--integrator", choices=("rk4", "rk45", "surrogate"), default="rk4",
+                        help="stały krok RK4, adaptacyjny RK45 ze zdarzeniami uderzeń albo surogat z surrogate.py")
+    parser.add_argument("--check-collisions", action="store_true",
+                        help="porównaj zderzenia kulek z pętlą po wszystkich parach")
+    parser.add_argument("--compare-integrators", action="store_true",
+                        help="kroki i błąd RK45 vs RK4 przy równej dokładności")
+    parser.add_argument("--profile", action="store_true", help="czasy faz kroku (HUD / podsumowanie)")
+    parser.add_argument("--profile-out", metavar="FILE", help="czasy faz każdej klatki do .csv albo .jsonl")
+    args = parser.parse_args()
+    profiler = PhaseProfiler(args.profile or bool(args.profile_out), export=args.profile_out)
+    if args.compare_integrators:
+        compare_integrators()
+    elif args.check_collisions:
+        sys.exit(0 if check_collisions() else 1)
+    elif args.sleep_benchmark:
+        benchmark_sleep(args.balls or 10_000)
+    elif args.tunneling:
+        stress_tunneling(args.balls or 2000)
+    elif args.headless:
+        run_headless(args.steps, args.balls or N, args.layout, args.record, args.integrator, profiler, args.sleep,
+                     args.ccd, args.dt)
+    else:
+        main(args.balls or N, args.record, profiler, args.sleep, args.ccd, args.dt)
+    sys.exit()
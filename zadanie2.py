@@ -1,11 +1,27 @@
-import pygame
 import math
 import random
+import time
+import sys
+import argparse
+import tracemalloc
 
-class Vector2:
-    def __init__(self, x=0.0, y=0.0):
-        self.x = x
-        self.y = y
+import numpy as np
+
+from recorder import TrajectoryRecorder
+from loop import FixedStepLoop, interpolate
+from render import SpriteRenderer
+from profiling import PhaseProfiler
+import kernels
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+class _VectorMath:
+    """Działania na x i y wspólne dla Vector2, Vector2View i PlainVector2;
+    puste __slots__, żeby podklasy same decydowały o przechowywaniu x i y."""
+    __slots__ = ()
 
     def set(self, v):
         self.x = v.x
@@ -48,13 +64,52 @@ class Vector2:
     def perp(self):
         return Vector2(-self.y, self.x)
 
+class Vector2(_VectorMath):
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+class Vector2View(_VectorMath):
+    """Wektor, którego x i y to wiersz wspólnej tablicy (N,2).
+
+    buf to płaski memoryview tablicy - odczyt daje zwykły float, bez
+    pośrednich skalarów numpy. Każdy odczyt i zapis to wywołanie property,
+    więc simulate() na widokach jest ok. 3x wolniejsze niż na Vector2 - widoki
+    są dla silnika "arrays", któremu oszczędzają kopiowanie w store()."""
+    __slots__ = ("_buf", "_i")
+
+    def __init__(self, buf, i):
+        self._buf = buf
+        self._i = 2 * i
+
+    @property
+    def x(self):
+        return self._buf[self._i]
+
+    @x.setter
+    def x(self, value):
+        self._buf[self._i] = value
+
+    @property
+    def y(self):
+        return self._buf[self._i + 1]
+
+    @y.setter
+    def y(self, value):
+        self._buf[self._i + 1] = value
+
 class Bead:
+    __slots__ = ("radius", "mass", "pos", "prev_pos", "vel", "_dir")
+
     def __init__(self, radius, mass, pos):
         self.radius = radius
         self.mass = mass
         self.pos = pos.clone()
         self.prev_pos = pos.clone()
         self.vel = Vector2()
+        self._dir = Vector2()  # wektor roboczy keep_on_wire
 
     def start_step(self, dt, gravity):
         self.vel.add(gravity, dt)
@@ -62,7 +117,7 @@ class Bead:
         self.pos.add(self.vel, dt)
 
     def keep_on_wire(self, center, radius):
-        dir = Vector2()
+        dir = self._dir
         dir.subtract_vectors(self.pos, center)
         length = dir.length()
         if length == 0.0:
@@ -76,18 +131,181 @@ class Bead:
         self.vel.subtract_vectors(self.pos, self.prev_pos)
         self.vel.scale(1.0 / dt)
 
+# --- punkt odniesienia: wektory i koraliki sprzed __slots__ ---
+class PlainVector2(_VectorMath):
+    """Vector2 ze zwykłym __dict__, jak przed dodaniem __slots__."""
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+    def clone(self):
+        return PlainVector2(self.x, self.y)
+
+    def perp(self):
+        return PlainVector2(-self.y, self.x)
+
+class PlainBead:
+    """Bead z __dict__ i wektorami PlainVector2; wektor roboczy _dir powstaje
+    przy każdym użyciu, jak nowy Vector2 w keep_on_wire i zderzeniu przed
+    zmianą. Metody kroku są te same co w Bead."""
+
+    def __init__(self, radius, mass, pos):
+        self.radius = radius
+        self.mass = mass
+        self.pos = PlainVector2(pos.x, pos.y)
+        self.prev_pos = PlainVector2(pos.x, pos.y)
+        self.vel = PlainVector2()
+
+    @property
+    def _dir(self):
+        return PlainVector2()
+
+    start_step = Bead.start_step
+    keep_on_wire = Bead.keep_on_wire
+    end_step = Bead.end_step
+
+class BeadArrays:
+    """Stan koralików jako tablice (N,2)/(N,) dla silnika wektorowego.
+
+    Przy shared=True pos/prev_pos/vel koralików zostają podmienione na
+    Vector2View tych tablic - obiekty i tablice to wtedy ta sama pamięć."""
+
+    def __init__(self, beads, shared=False):
+        self.beads = beads
+        self.shared = shared
+        vectors = lambda name: np.array(
+            [(getattr(b, name).x, getattr(b, name).y) for b in beads], dtype=np.float64).reshape(-1, 2)
+        self.pos = vectors("pos")
+        self.prev_pos = vectors("prev_pos")
+        self.vel = vectors("vel")
+        self.radius = np.array([b.radius for b in beads], dtype=np.float64)
+        self.mass = np.array([b.mass for b in beads], dtype=np.float64)
+        if shared:
+            for name in ("pos", "prev_pos", "vel"):
+                buf = memoryview(getattr(self, name)).cast("B").cast("d")
+                for i, bead in enumerate(beads):
+                    setattr(bead, name, Vector2View(buf, i))
+
+    def store(self):
+        # przepisuje stan z tablic do obiektów Bead (rysowanie, API obiektowe)
+        if self.shared:
+            return
+        for bead, (px, py), (qx, qy), (vx, vy) in zip(
+                self.beads, self.pos.tolist(), self.prev_pos.tolist(), self.vel.tolist()):
+            bead.pos.x, bead.pos.y = px, py
+            bead.prev_pos.x, bead.prev_pos.y = qx, qy
+            bead.vel.x, bead.vel.y = vx, vy
+
+class BeadAngles:
+    """Stan koralików we współrzędnych zredukowanych: kąt na drucie theta
+    i prędkość kątowa omega (N,). pos/vel liczone z nich na żądanie,
+    store() przepisuje je do obiektów Bead."""
+
+    def __init__(self, beads, center, wire_radius):
+        self.beads = beads
+        self.center = np.array([center.x, center.y])
+        self.wire_radius = wire_radius
+        rel = np.array([(b.pos.x, b.pos.y) for b in beads], dtype=np.float64).reshape(-1, 2) - self.center
+        vel = np.array([(b.vel.x, b.vel.y) for b in beads], dtype=np.float64).reshape(-1, 2)
+        self.theta = np.arctan2(rel[:, 1], rel[:, 0])
+        # tylko składowa styczna prędkości - radialną drut i tak by zniósł
+        self.omega = (rel[:, 0] * vel[:, 1] - rel[:, 1] * vel[:, 0]) / np.einsum("ij,ij->i", rel, rel)
+        self.radius = np.array([b.radius for b in beads], dtype=np.float64)
+        self.mass = np.array([b.mass for b in beads], dtype=np.float64)
+
+    @property
+    def pos(self):
+        return self.center + self.wire_radius * np.column_stack((np.cos(self.theta), np.sin(self.theta)))
+
+    @property
+    def vel(self):
+        speed = self.wire_radius * self.omega
+        return np.column_stack((-speed * np.sin(self.theta), speed * np.cos(self.theta)))
+
+    def store(self):
+        for bead, (px, py), (vx, vy) in zip(self.beads, self.pos.tolist(), self.vel.tolist()):
+            bead.pos.x, bead.pos.y = px, py
+            bead.prev_pos.x, bead.prev_pos.y = px, py
+            bead.vel.x, bead.vel.y = vx, vy
+
 class PhysicsScene:
-    def __init__(self):
+    def __init__(self, engine="objects", shared_arrays=False, profiler=None):
         self.gravity = Vector2(0.0, -10.0)
         self.dt = 1/60
         self.num_steps = 100
+        # podkroki trybu "angles": ruch jest dokładnie na drucie, więc wystarczy kilka
+        self.angle_steps = 4
         self.wire_center = Vector2()
         self.wire_radius = 0.0
         self.beads = []
+        # "objects" - simulate() na obiektach Bead, "arrays" - simulate_arrays(),
+        # "angles" - simulate_angles() na kątach zamiast położeń 2D
+        self.engine = engine
+        # koraliki jako widoki wspólnych tablic (BeadArrays(shared=True))
+        self.shared_arrays = shared_arrays
+        self.bead_arrays = None
+        self.bead_angles = None
+        self.recorder = None
+        # czasy faz podkroków; domyślnie wyłączony
+        self.profiler = profiler or PhaseProfiler()
+
+    def arrays(self):
+        # tablice dla bieżącej listy koralików (setup_scene podmienia listę)
+        if self.bead_arrays is None or self.bead_arrays.beads is not self.beads:
+            self.bead_arrays = BeadArrays(self.beads, self.shared_arrays)
+        return self.bead_arrays
+
+    def angles(self):
+        # jak arrays(), ale stan w kątach na drucie
+        if self.bead_angles is None or self.bead_angles.beads is not self.beads:
+            self.bead_angles = BeadAngles(self.beads, self.wire_center, self.wire_radius)
+        return self.bead_angles
+
+    def record(self, path):
+        # każda klatka step() trafia do nagrania; świat jest dwa razy większy niż środek drutu
+        world = (2 * self.wire_center.x, 2 * self.wire_center.y)
+        self.recorder = TrajectoryRecorder(path, self.dt, world, source="zadanie2")
+        return self.recorder
+
+    def _record_frame(self, arrays=None):
+        if arrays is None:
+            pos = [(b.pos.x, b.pos.y) for b in self.beads]
+            vel = [(b.vel.x, b.vel.y) for b in self.beads]
+            radius = [b.radius for b in self.beads]
+        else:
+            pos, vel, radius = arrays.pos, arrays.vel, arrays.radius
+        self.recorder.record(np.asarray(pos).reshape(-1, 2), vel, radius, (255, 0, 0))
+
+    def step(self, n_steps=1):
+        if self.engine == "angles":
+            angles = self.angles()
+            for _ in range(n_steps):
+                simulate_angles(self, angles)
+                if self.recorder is not None:
+                    with self.profiler.phase("record"):
+                        self._record_frame(angles)
+            angles.store()
+        elif self.engine == "arrays":
+            arrays = self.arrays()
+            for _ in range(n_steps):
+                simulate_arrays(self, arrays)
+                if self.recorder is not None:
+                    with self.profiler.phase("record"):
+                        self._record_frame(arrays)
+            arrays.store()
+        else:
+            if self.shared_arrays:
+                self.arrays()
+            for _ in range(n_steps):
+                simulate(self)
+                if self.recorder is not None:
+                    with self.profiler.phase("record"):
+                        self._record_frame()
 
 scene = PhysicsScene()
 
-def setup_scene(screen_width, screen_height):
+def setup_scene(screen_width, screen_height, num_beads=5, scene=scene):
     scene.beads = []
     sim_min_width = 2.0
     c_scale = min(screen_width, screen_height) / sim_min_width
@@ -98,8 +316,9 @@ def setup_scene(screen_width, screen_height):
     scene.wire_center.y = sim_height / 2.0
     scene.wire_radius = sim_min_width * 0.4
 
-    num_beads = 5
-    r = 0.1
+    # przy większej liczbie koralików promienie maleją, żeby zmieściły się na drucie
+    size = min(1.0, 5 / max(num_beads, 1))
+    r = 0.1 * size
     angle = 0.0
     for i in range(num_beads):
         mass = math.pi * r * r
@@ -109,7 +328,11 @@ def setup_scene(screen_width, screen_height):
         )
         scene.beads.append(Bead(r, mass, pos))
         angle += math.pi / num_beads
-        r = 0.05 + random.random() * 0.1
+        r = (0.05 + random.random() * 0.1) * size
+
+def bead_positions(scene):
+    # położenia koralików jako tablica (N,2), np. do interpolacji przy rysowaniu
+    return np.array([(b.pos.x, b.pos.y) for b in scene.beads]).reshape(-1, 2)
 
 def draw_circle(screen, pos, radius, scale, color, filled=True):
     x = int(pos.x * scale)
@@ -122,7 +345,7 @@ def draw_circle(screen, pos, radius, scale, color, filled=True):
 
 def handle_bead_bead_collision(b1, b2):
     restitution = 1.0
-    dir = Vector2()
+    dir = b1._dir  # wektor roboczy; keep_on_wire b1 już się skończyło
     dir.subtract_vectors(b2.pos, b1.pos)
     d = dir.length()
     if d == 0.0 or d > b1.radius + b2.radius:
@@ -141,29 +364,371 @@ def handle_bead_bead_collision(b1, b2):
     b1.vel.add(dir, new_v1 - v1)
     b2.vel.add(dir, new_v2 - v2)
 
-def simulate():
+def simulate(scene=scene):
     sdt = scene.dt / scene.num_steps
+    # podkrok trwa mikrosekundy - czasy etapów sumujemy tylko przy włączonym profilerze
+    timed = scene.profiler.enabled
+    clock = time.perf_counter
+    spent = [0.0, 0.0, 0.0]
     for step in range(scene.num_steps):
+        if timed: t0 = clock()
         for bead in scene.beads:
             bead.start_step(sdt, scene.gravity)
+        if timed: t1 = clock()
         for bead in scene.beads:
             bead.keep_on_wire(scene.wire_center, scene.wire_radius)
+        if timed: t2 = clock()
         for bead in scene.beads:
             bead.end_step(sdt)
+        if timed: t3 = clock()
         for i, bead1 in enumerate(scene.beads):
             for bead2 in scene.beads[:i]:
                 handle_bead_bead_collision(bead1, bead2)
+        if timed:
+            t4 = clock()
+            spent[0] += (t1 - t0) + (t3 - t2)
+            spent[1] += t2 - t1
+            spent[2] += t4 - t3
+    if timed:
+        for name, seconds in zip(("integrate", "constraint", "collisions"), spent):
+            scene.profiler.add(name, seconds)
+
+def ring_pairs(pos, center):
+    """Pary sąsiadów na okręgu (po posortowaniu po kącie) w grupach bez
+    wspólnych koralików: parzyste, nieparzyste i - przy nieparzystej liczbie -
+    para zamykająca pierścień."""
+    n = len(pos)
+    if n < 2:
+        return np.empty((0, 2), np.intp), []
+    order = np.argsort(np.arctan2(pos[:, 1] - center.y, pos[:, 0] - center.x))
+    if n == 2:
+        return order[None, :], [np.array([0])]
+    return _ring_groups(order)
+
+def _ring_groups(order):
+    # pary kolejnych koralików pierścienia order (n >= 3); ostatnia go zamyka
+    n = len(order)
+    pairs = np.column_stack((order, np.roll(order, -1)))
+    k = np.arange(n)
+    if n % 2 == 0:
+        return pairs, [k[0::2], k[1::2]]
+    return pairs, [k[0:n-1:2], k[1::2], k[n-1:]]
+
+def handle_bead_bead_collisions(arrays, pairs, groups):
+    # handle_bead_bead_collision dla grup par bez wspólnych koralików
+    restitution = 1.0
+    pos, vel, radius, mass = arrays.pos, arrays.vel, arrays.radius, arrays.mass
+    for g in groups:
+        i, j = pairs[g, 0], pairs[g, 1]
+        dir = pos[j] - pos[i]
+        d = np.hypot(dir[:, 0], dir[:, 1])
+        ok = (d != 0.0) & (d <= radius[i] + radius[j])
+        if not ok.any():
+            continue
+        i, j, dir, d = i[ok], j[ok], dir[ok], d[ok]
+        dir /= d[:, None]
+        corr = (radius[i] + radius[j] - d) / 2.0
+        pos[i] -= dir * corr[:, None]
+        pos[j] += dir * corr[:, None]
+
+        v1 = np.einsum("ij,ij->i", vel[i], dir)
+        v2 = np.einsum("ij,ij->i", vel[j], dir)
+        m1 = mass[i]
+        m2 = mass[j]
+        new_v1 = (m1*v1 + m2*v2 - m2*(v1-v2)*restitution) / (m1 + m2)
+        new_v2 = (m1*v1 + m2*v2 - m1*(v2-v1)*restitution) / (m1 + m2)
+        vel[i] += dir * (new_v1 - v1)[:, None]
+        vel[j] += dir * (new_v2 - v2)[:, None]
+
+def simulate_arrays(scene, arrays):
+    # te same etapy co simulate(), ale dla wszystkich koralików naraz; kolizje
+    # tylko między sąsiadami po kącie - na okręgu inne koraliki się nie stykają
+    sdt = scene.dt / scene.num_steps
+    gravity = np.array([scene.gravity.x, scene.gravity.y])
+    center = np.array([scene.wire_center.x, scene.wire_center.y])
+    pos, vel = arrays.pos, arrays.vel
+    timed = scene.profiler.enabled
+    clock = time.perf_counter
+    spent = [0.0, 0.0, 0.0]
+    with scene.profiler.phase("broadphase"):
+        pairs, groups = ring_pairs(pos, scene.wire_center)
+    if kernels.enabled:
+        # cała pętla podkroków w jednym wywołaniu - etapów nie da się osobno zmierzyć
+        with scene.profiler.phase("substeps"):
+            kernels.bead_substeps(pos, arrays.prev_pos, vel, arrays.radius, arrays.mass,
+                                  pairs[np.concatenate(groups)] if groups else pairs,
+                                  gravity, center, scene.wire_radius, sdt, scene.num_steps)
+        return
+    for step in range(scene.num_steps):
+        if timed: t0 = clock()
+        # start_step
+        vel += gravity * sdt
+        arrays.prev_pos[:] = pos
+        pos += vel * sdt
+        if timed: t1 = clock()
+        # keep_on_wire
+        dir = pos - center
+        length = np.hypot(dir[:, 0], dir[:, 1])
+        if length.all():
+            pos += dir * ((scene.wire_radius - length) / length)[:, None]
+        else:
+            ok = length != 0.0
+            pos[ok] += dir[ok] * ((scene.wire_radius - length[ok]) / length[ok])[:, None]
+        if timed: t2 = clock()
+        # end_step
+        np.subtract(pos, arrays.prev_pos, out=vel)
+        vel /= sdt
+        if timed: t3 = clock()
+        handle_bead_bead_collisions(arrays, pairs, groups)
+        if timed:
+            t4 = clock()
+            spent[0] += (t1 - t0) + (t3 - t2)
+            spent[1] += t2 - t1
+            spent[2] += t4 - t3
+    if timed:
+        for name, seconds in zip(("integrate", "constraint", "collisions"), spent):
+            scene.profiler.add(name, seconds)
+
+def angle_ring_pairs(theta):
+    """ring_pairs dla kątów z [-pi, pi): j leży tuż za i w kierunku rosnącego
+    kąta. Zwraca też wrap (przerwa między nimi to theta[j] + wrap - theta[i]);
+    para zamykająca pierścień ma wrap = 2 pi. Przy dwóch koralikach liczą się
+    obie przerwy, więc są dwie pary."""
+    n = len(theta)
+    if n < 2:
+        return np.empty((0, 2), np.intp), [], np.empty(0)
+    order = np.argsort(theta)
+    if n == 2:
+        return np.array([order, order[::-1]]), [np.array([0]), np.array([1])], np.array([0.0, 2 * np.pi])
+    pairs, groups = _ring_groups(order)
+    wrap = np.zeros(n)
+    wrap[-1] = 2 * np.pi
+    return pairs, groups, wrap
+
+def handle_angle_collisions(angles, pairs, groups, wrap, min_gap):
+    # handle_bead_bead_collision w kątach: przerwa mniejsza niż min_gap jest
+    # rozsuwana po połowie, a prędkości kątowe wymieniane jak w zderzeniu 1D -
+    # tylko gdy koraliki się zbliżają. Kolejność na pierścieniu jest stała
+    # w klatce, więc koraliki, które się minęły, mają ujemną przerwę i też
+    # zostaną rozsunięte.
+    restitution = 1.0
+    theta, omega, mass = angles.theta, angles.omega, angles.mass
+    for g in groups:
+        i, j = pairs[g, 0], pairs[g, 1]
+        overlap = min_gap[g] - (theta[j] + wrap[g] - theta[i])
+        ok = overlap > 0.0
+        if not ok.any():
+            continue
+        i, j, overlap = i[ok], j[ok], overlap[ok]
+        theta[i] -= overlap / 2.0
+        theta[j] += overlap / 2.0
+
+        w1 = omega[i]
+        w2 = omega[j]
+        m1 = mass[i]
+        m2 = mass[j]
+        new_w1 = (m1*w1 + m2*w2 - m2*(w1-w2)*restitution) / (m1 + m2)
+        new_w2 = (m1*w1 + m2*w2 - m1*(w2-w1)*restitution) / (m1 + m2)
+        closing = w1 > w2
+        omega[i] = np.where(closing, new_w1, w1)
+        omega[j] = np.where(closing, new_w2, w2)
+
+def simulate_angles(scene, angles):
+    # jeden stopień swobody na koralik: theta'' = (g . styczna) / R, styczna
+    # (-sin, cos); prędkościowy Verlet w angle_steps podkrokach zamiast
+    # num_steps rzutowań keep_on_wire
+    sdt = scene.dt / scene.angle_steps
+    wire_radius = scene.wire_radius
+    gx, gy = scene.gravity.x / wire_radius, scene.gravity.y / wire_radius
+    theta, omega = angles.theta, angles.omega
+    timed = scene.profiler.enabled
+    clock = time.perf_counter
+    spent = [0.0, 0.0]
+    with scene.profiler.phase("broadphase"):
+        theta[:] = np.remainder(theta + np.pi, 2 * np.pi) - np.pi
+        pairs, groups, wrap = angle_ring_pairs(theta)
+        # przerwa kątowa, przy której cięciwa między środkami = suma promieni
+        contact = (angles.radius[pairs[:, 0]] + angles.radius[pairs[:, 1]]) / (2 * wire_radius)
+        min_gap = 2 * np.arcsin(np.minimum(contact, 1.0))
+    if kernels.enabled:
+        with scene.profiler.phase("substeps"):
+            order = np.concatenate(groups) if groups else np.arange(len(pairs))
+            kernels.angle_substeps(theta, omega, angles.mass, pairs[order], wrap[order], min_gap[order],
+                                   gx, gy, sdt, scene.angle_steps)
+        return
+    for step in range(scene.angle_steps):
+        if timed: t0 = clock()
+        omega += 0.5 * sdt * (gy * np.cos(theta) - gx * np.sin(theta))
+        theta += omega * sdt
+        omega += 0.5 * sdt * (gy * np.cos(theta) - gx * np.sin(theta))
+        if timed: t1 = clock()
+        handle_angle_collisions(angles, pairs, groups, wrap, min_gap)
+        if timed:
+            t2 = clock()
+            spent[0] += t1 - t0
+            spent[1] += t2 - t1
+    if timed:
+        for name, seconds in zip(("integrate", "collisions"), spent):
+            scene.profiler.add(name, seconds)
+
+def run_headless(n_steps, num_beads=5, engine="objects", record=None, profiler=None):
+    headless_scene = PhysicsScene(engine, profiler=profiler)
+    setup_scene(800, 600, num_beads, headless_scene)
+    if record:
+        headless_scene.record(record)
+    profiler = headless_scene.profiler
+    t0 = time.perf_counter()
+    for _ in range(n_steps):
+        headless_scene.step()
+        profiler.end_frame()
+    elapsed = time.perf_counter() - t0
+    if headless_scene.recorder is not None:
+        headless_scene.recorder.close()
+    print(f"{engine} | Koraliki: {num_beads} | kroki: {n_steps} | czas: {elapsed:.3f} s | {n_steps / elapsed:.1f} kroków/s")
+    if profiler.enabled:
+        profiler.report()
+        profiler.close()
+    return headless_scene
+
+def _count_calls(codes, call, *args):
+    # liczba wywołań funkcji o kodzie z codes w czasie call(*args); hak
+    # profilera działa tylko na czas pomiaru i nie zmienia żadnej klasy
+    count = 0
+
+    def hook(frame, event, arg):
+        nonlocal count
+        if event == "call" and frame.f_code in codes:
+            count += 1
+
+    sys.setprofile(hook)
+    try:
+        call(*args)
+    finally:
+        sys.setprofile(None)
+    return count
+
+def measure_hot_path(num_beads=5, frames=60):
+    """Kroki/s, liczba nowych wektorów na krok i szczyt pamięci (tracemalloc)
+    dla każdego trybu silnika. "objects, bez slots" to punkt odniesienia:
+    PlainBead i PlainVector2, czyli obiekty z __dict__ i nowym wektorem
+    w każdym keep_on_wire i zderzeniu. tracemalloc widzi tylko żywe bloki,
+    a krótko żyjące wektory są zwalniane od razu, więc ich liczbę daje hak
+    profilera na __init__, a tracemalloc - szczyt pamięci kroku."""
+    print(f"\n=== Koraliki: {num_beads}, kroki: {frames} ===")
+    codes = {Vector2.__init__.__code__, PlainVector2.__init__.__code__}
+    for mode, engine, shared in (("objects, bez slots", "objects", None), ("objects", "objects", False),
+                                 ("objects + widoki", "objects", True), ("arrays", "arrays", False),
+                                 ("arrays + widoki", "arrays", True), ("angles", "angles", False)):
+        random.seed(0)
+        s = PhysicsScene(engine, bool(shared))
+        setup_scene(800, 600, num_beads, s)
+        if shared is None:
+            s.beads = [PlainBead(b.radius, b.mass, b.pos) for b in s.beads]
+        s.step()  # rozgrzewka, tworzy tablice
+
+        t0 = time.perf_counter()
+        s.step(frames)
+        elapsed = time.perf_counter() - t0
+
+        created = _count_calls(codes, s.step, frames)
+        tracemalloc.start()
+        try:
+            s.step(frames)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        print(f"{mode:18s} | {frames / elapsed:8.1f} kroków/s | wektory/krok: {created / frames:8.0f}"
+              f" | szczyt pamięci: {peak / 1024:8.1f} KiB")
+    print("widoki spowalniają silnik objects (każde x/y to property na memoryview);"
+          " oszczędzają kopiowanie silnikowi arrays")
+
+def bead_energy(scene):
+    # energia kinetyczna + potencjalna wszystkich koralików (z obiektów Bead)
+    g = (scene.gravity.x, scene.gravity.y)
+    return sum(b.mass * (0.5 * (b.vel.x ** 2 + b.vel.y ** 2) - g[0] * b.pos.x - g[1] * b.pos.y)
+               for b in scene.beads)
+
+def compare_solvers(seconds=10.0, counts=(5, 500), angle_steps=(1, 2, 4), reference_steps=2000):
+    """PBD z num_steps podkrokami kontra kąty (simulate_angles): kroki/s,
+    dryf energii (5 koralików, zderzenia sprężyste - energia powinna zostać)
+    i największy błąd kąta pojedynczego koralika (wahadło na drucie) względem
+    kątów z reference_steps podkrokami."""
+    frames = int(round(seconds * 60))
+    modes = [("PBD obiekty", "objects", None), ("PBD tablice", "arrays", None)]
+    modes += [(f"kąty, {k} podkr.", "angles", k) for k in angle_steps]
+    # błąd względem wyniku dla bardzo małego kroku: kąty z reference_steps podkrokami
+
+    def make(engine, steps, num_beads):
+        random.seed(0)
+        s = PhysicsScene(engine)
+        setup_scene(800, 600, num_beads, s)
+        if steps is not None:
+            s.angle_steps = steps
+        return s
+
+    def bead_angle(s):
+        b = s.beads[0]
+        return math.atan2(b.pos.y - s.wire_center.y, b.pos.x - s.wire_center.x)
+
+    reference = make("angles", reference_steps, 1)
+    expected = []
+    for _ in range(frames):
+        reference.step()
+        expected.append(bead_angle(reference))
+
+    print(f"=== Koraliki: PBD ({PhysicsScene().num_steps} podkroków, numba: {'tak' if kernels.enabled else 'nie'})"
+          f" vs kąty, {seconds:.0f} s symulacji ===")
+    for label, engine, steps in modes:
+        rates = []
+        for n in counts:
+            if engine == "objects" and n > 50:
+                rates.append(f"{'-':>10s}")  # O(n^2) par na podkrok - za wolno
+                continue
+            s = make(engine, steps, n)
+            s.step()  # rozgrzewka, tablice i jądra
+            t0 = time.perf_counter()
+            s.step(frames)
+            rates.append(f"{frames / (time.perf_counter() - t0):10.1f}")
+        s = make(engine, steps, 5)
+        e0 = bead_energy(s)
+        s.step(frames)
+        drift = bead_energy(s) / e0 - 1
+        single = make(engine, steps, 1)
+        error = 0.0
+        for angle in expected:
+            single.step()
+            error = max(error, abs(math.remainder(bead_angle(single) - angle, 2 * math.pi)))
+        print(f"{label:16s} | kroki/s " + " | ".join(f"{n} kor.: {r}" for n, r in zip(counts, rates))
+              + f" | dryf energii: {drift:+8.3%} | błąd kąta: {math.degrees(error):8.4f}°")
+
+def main(record=None, profiler=None, engine="objects"):
+    if pygame is None:
+        print("Brak pygame — użyj trybu --headless.")
+        return
 
-def main():
     pygame.init()
     screen_width, screen_height = 800, 600
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Constrained Dynamics")
     clock = pygame.time.Clock()
     setup_scene(screen_width, screen_height)
+    scene.engine = engine
+    if record:
+        scene.record(record)
+    if profiler is not None:
+        scene.profiler = profiler
+    profiler = scene.profiler
+    font = pygame.font.SysFont("Consolas", 16) if profiler.enabled else None
 
     sim_min_width = 2.0
     c_scale = min(screen_width, screen_height) / sim_min_width
+    loop = FixedStepLoop(scene.dt)
+    previous = None
+    # drut jest nieruchomy - rysowany raz na tło
+    background = pygame.Surface((screen_width, screen_height)).convert()
+    background.fill((0, 0, 0))
+    draw_circle(background, scene.wire_center, scene.wire_radius, c_scale, (255, 0, 0), filled=False)
+    renderer = SpriteRenderer(screen, background)
 
     running = True
     while running:
@@ -172,17 +737,52 @@ def main():
                 running = False
             if event.type == pygame.KEYDOWN and event.key == pygame.K_r:
                 setup_scene(screen_width, screen_height)
+                previous = None
 
-        simulate()
-        screen.fill((0, 0, 0))
-        draw_circle(screen, scene.wire_center, scene.wire_radius, c_scale, (255, 0, 0), filled=False)
-        for bead in scene.beads:
-            draw_circle(screen, bead.pos, bead.radius, c_scale, (255, 0, 0), filled=True)
+        # stały krok dt niezależnie od FPS; previous - położenia sprzed ostatniego kroku
+        for _ in range(loop.frame()):
+            previous = bead_positions(scene)
+            scene.step()
 
-        pygame.display.flip()
+        if loop.render():
+            with profiler.phase("draw"):
+                renderer.clear()
+                pos = interpolate(previous, bead_positions(scene), loop.alpha)
+                radius = np.array([bead.radius for bead in scene.beads])
+                renderer.circles(pos[:, 0] * c_scale, screen_height - pos[:, 1] * c_scale,
+                                 (radius * c_scale).astype(int), (255, 0, 0))
+                for row, line in enumerate(profiler.hud_lines()):
+                    renderer.text(font, line, (240, 240, 240), (12, 12 + 18 * row))
+                renderer.present()
+        profiler.end_frame()
         clock.tick(60)
 
+    if scene.recorder is not None:
+        scene.recorder.close()
+    profiler.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Koraliki na drucie (dynamika z więzami)")
+    parser.add_argument("--headless", action="store_true", help="liczy fizykę bez okna i podaje kroki/s")
+    parser.add_argument("--steps", type=int, default=600, help="liczba kroków w trybie --headless")
+    parser.add_argument("--beads", type=int, default=5, help="liczba koralików w trybie --headless")
+    parser.add_argument("--engine", choices=("objects", "arrays", "angles"), default="objects",
+                        help="obiekty Bead, silnik tablicowy albo kąty na drucie (bez rzutowania PBD)")
+    parser.add_argument("--measure", action="store_true",
+                        help="porównuje tryby silnika: kroki/s i alokacje")
+    parser.add_argument("--compare-solvers", action="store_true",
+                        help="PBD kontra kąty: kroki/s, dryf energii i błąd kąta")
+    parser.add_argument("--record", metavar="DIR", help="zapisz trajektorie do katalogu (recorder.py replay DIR)")
+    parser.add_argument("--profile", action="store_true", help="czasy faz kroku (HUD / podsumowanie)")
+    parser.add_argument("--profile-out", metavar="FILE", help="czasy faz każdej klatki do .csv albo .jsonl")
+    args = parser.parse_args()
+    profiler = PhaseProfiler(args.profile or bool(args.profile_out), export=args.profile_out)
+    if args.measure:
+        measure_hot_path(args.beads, args.steps)
+    elif args.compare_solvers:
+        compare_solvers()
+    elif args.headless:
+        run_headless(args.steps, args.beads, args.engine, args.record, profiler)
+    else:
+        main(args.record, profiler, args.engine)
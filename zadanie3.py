@@ -2,6 +2,18 @@ import random
 import math
 import time
 import statistics
+import tracemalloc
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from recorder import TrajectoryRecorder
+from loop import FixedStepLoop, interpolate
+from render import SpriteRenderer
+from aabbtree import AABBTree
+from profiling import PhaseProfiler
+import kernels
 
 class Circle:
     def __init__(self, x, y, r):
@@ -54,35 +66,1023 @@ def sweep_and_prune_detect(circles):
     return checks, collisions
 
 
+def spatial_hash_cell_size(circles):
+    # komórka = średnica średniego koła: typowe koło zajmuje 1-4 komórki,
+    # a duże koła trafiają do kilku komórek zamiast powiększać wszystkie
+    return 2 * statistics.fmean(c.r for c in circles)
+
+
+def spatial_hash_pairs(circles, cell_size=None):
+    """Pary kandydatów (i, j), i < j, z jednolitej siatki haszującej.
+
+    Każde koło trafia do wszystkich komórek, które pokrywa jego AABB; para jest
+    zgłaszana tylko w komórce z lewym dolnym rogiem części wspólnej ich zakresów
+    komórek, więc nie ma duplikatów."""
+    if not circles:
+        return
+    if cell_size is None:
+        cell_size = spatial_hash_cell_size(circles)
+    inv = 1.0 / cell_size
+    grid = defaultdict(list)
+    lo_x, lo_y = [], []
+    for idx, c in enumerate(circles):
+        x0, x1 = math.floor((c.x - c.r) * inv), math.floor((c.x + c.r) * inv)
+        y0, y1 = math.floor((c.y - c.r) * inv), math.floor((c.y + c.r) * inv)
+        lo_x.append(x0)
+        lo_y.append(y0)
+        for gx in range(x0, x1 + 1):
+            for gy in range(y0, y1 + 1):
+                grid[(gx, gy)].append(idx)
+    for (gx, gy), bucket in grid.items():
+        for a in range(len(bucket)):
+            i = bucket[a]
+            for b in range(a + 1, len(bucket)):
+                j = bucket[b]
+                if max(lo_x[i], lo_x[j]) == gx and max(lo_y[i], lo_y[j]) == gy:
+                    yield i, j
+
+
+def spatial_hash_detect(circles, cell_size=None):
+    checks = 0
+    collisions = 0
+    for i, j in spatial_hash_pairs(circles, cell_size):
+        checks += 1
+        if overlap_circle(circles[i], circles[j]):
+            collisions += 1
+    return checks, collisions
+
+
+def circle_arrays(circles):
+    # lista obiektów z polami x, y, r -> trzy tablice float64
+    n = len(circles)
+    x = np.fromiter((c.x for c in circles), np.float64, n)
+    y = np.fromiter((c.y for c in circles), np.float64, n)
+    r = np.fromiter((c.r for c in circles), np.float64, n)
+    return x, y, r
+
+
+def _ordered_pairs(i, j):
+    # pary jako (K,2) z i < j w każdym wierszu
+    return np.sort(np.column_stack((i, j)).astype(np.intp), axis=1)
+
+
+def _sorted_pairs(i, j):
+    # jak wyżej, a do tego wiersze posortowane leksykograficznie
+    pairs = _ordered_pairs(i, j)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def _overlapping(x, y, r, i, j):
+    dx = x[i] - x[j]
+    dy = y[i] - y[j]
+    return dx * dx + dy * dy < (r[i] + r[j]) ** 2
+
+
+def brute_force_pairs(x, y, r, block=1024):
+    """Wszystkie nakładające się pary (K,2) - wzorzec do sprawdzania innych detektorów."""
+    n = len(x)
+    found = []
+    for start in range(0, n, block):
+        i = np.arange(start, min(start + block, n))[:, None]
+        j = np.arange(n)[None, :]
+        hit = (j > i) & _overlapping(x, y, r, i, j)
+        ii, jj = np.nonzero(hit)
+        found.append(np.column_stack((ii + start, jj)))
+    return _sorted_pairs(*np.concatenate(found or [np.empty((0, 2), np.intp)]).T)
+
+
+def sweep_and_prune_pairs(x, y, r, max_block_pairs=1 << 22):
+    """Wektorowy Sweep & Prune.
+
+    Koła sortowane po lewym końcu; okno nakładania koła i to kolejne koła,
+    których lewy koniec < prawy koniec i (searchsorted). Zwraca (candidates,
+    collisions) jako tablice (K,2) indeksów z i < j - te same pary, które
+    sprawdza sweep_and_prune_detect. Kolizje są posortowane leksykograficznie,
+    kandydaci - w kolejności przemiatania. Pary generowane blokami, żeby nie
+    trzymać naraz więcej niż max_block_pairs kandydatów pośrednich.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    r = np.asarray(r, dtype=np.float64)
+    left = x - r
+    order = np.argsort(left, kind="stable")
+    left_sorted = left[order]
+    right_sorted = (x + r)[order]
+    if kernels.enabled:
+        candidates, collisions = kernels.sap_walk(order, left_sorted, right_sorted, x, y, r)
+        return candidates, _sorted_pairs(*collisions.T)
+    n = len(order)
+    first = np.arange(1, n + 1)
+    count = np.maximum(np.searchsorted(left_sorted, right_sorted, side="left") - first, 0)
+    ends = np.cumsum(count)
+
+    candidates, collisions = [], []
+    start = 0
+    while start < n:
+        # blok kół, których okna razem mieszczą się w max_block_pairs
+        stop = max(int(np.searchsorted(ends, ends[start] - count[start] + max_block_pairs, side="right")), start + 1)
+        c = count[start:stop]
+        a = np.repeat(np.arange(start, stop), c)
+        b = a + 1 + np.arange(len(a)) - np.repeat(np.cumsum(c) - c, c)
+        i, j = order[a], order[b]
+        hit = _overlapping(x, y, r, i, j)
+        candidates.append(np.column_stack((i, j)))
+        collisions.append(np.column_stack((i[hit], j[hit])))
+        start = stop
+
+    empty = np.empty((0, 2), np.intp)
+    return (_ordered_pairs(*np.concatenate(candidates or [empty]).T),
+            _sorted_pairs(*np.concatenate(collisions or [empty]).T))
+
+
+def _grid_cells(pos, cell_size):
+    """Punkty posortowane po kluczu komórki: (order, cell_start, cell_count,
+    cell_key, stride, forward) - zajęte komórki (pierwszy indeks w order,
+    liczba punktów, klucz) i połowa przesunięć do sąsiadów."""
+    n, dim = pos.shape
+    cell = np.floor((pos - pos.min(axis=0)) / cell_size).astype(np.int64) + 1
+    shape = cell.max(axis=0) + 2  # margines, żeby sąsiad nie przeszedł do innego wiersza
+    stride = np.cumprod(np.r_[1, shape[:0:-1]])[::-1]
+    key = cell @ stride
+    order = np.argsort(key, kind="stable")
+    key_sorted = key[order]
+
+    cell_start = np.flatnonzero(np.r_[True, key_sorted[1:] != key_sorted[:-1]])
+    cell_count = np.diff(np.r_[cell_start, n])
+    cell_key = key_sorted[cell_start]
+
+    # połowa sąsiedztwa 3^D: przesunięcia "dodatnie" leksykograficznie
+    offsets = np.array(np.meshgrid(*[[-1, 0, 1]] * dim, indexing="ij")).reshape(dim, -1).T
+    forward = [o for o in offsets if tuple(o) > (0,) * dim]
+    return order, cell_start, cell_count, cell_key, stride, forward
+
+
+def _neighbour_cells(cell_key, o, stride):
+    """(src, dst) - indeksy zajętych komórek, których sąsiad o przesunięciu o też jest zajęty."""
+    target = cell_key + o @ stride
+    m = np.minimum(np.searchsorted(cell_key, target), len(cell_key) - 1)
+    src = np.flatnonzero(cell_key[m] == target)
+    return src, m[src]
+
+
+def grid_pairs(pos, r, cell_size=None, max_block_pairs=1 << 22):
+    """Wektorowa siatka jednolita w dowolnym wymiarze: pos (N,D), r (N,).
+
+    Komórka = średnica największego koła, więc każde koło leży w jednej
+    komórce, a kolidować może tylko z kołami z tej samej lub sąsiedniej.
+    Punkty sortowane po kluczu komórki; dla każdej połowy przesunięć do
+    sąsiadów komórkę docelową znajduje searchsorted wśród zajętych komórek
+    (raz na komórkę, nie na koło), a pary powstają tylko dla komórek, które
+    mają zajętego sąsiada. Zwraca (candidates, collisions) jak
+    sweep_and_prune_pairs.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    r = np.asarray(r, dtype=np.float64)
+    n, dim = pos.shape
+    empty = np.empty((0, 2), np.intp)
+    if n == 0:
+        return empty, empty
+    if cell_size is None:
+        cell_size = 2 * r.max()
+    order, cell_start, cell_count, cell_key, stride, forward = _grid_cells(pos, cell_size)
+
+    def overlapping(i, j):
+        d = pos[i] - pos[j]
+        return np.einsum("ij,ij->i", d, d) < (r[i] + r[j]) ** 2
+
+    def expand(starts, counts):
+        # konkatenacja zakresów [start, start + count)
+        total = np.cumsum(counts)
+        return np.repeat(starts - total + counts, counts) + np.arange(total[-1] if len(total) else 0)
+
+    candidates, collisions = [], []
+    for o in [np.zeros(dim, np.int64)] + forward:
+        if not o.any():
+            # ta sama komórka: tylko dalsze w kolejności
+            src = np.flatnonzero(cell_count > 1)
+            a_all = expand(cell_start[src], cell_count[src])
+            lo = a_all + 1
+            count = np.repeat(cell_start[src] + cell_count[src], cell_count[src]) - lo
+        else:
+            src, dst = _neighbour_cells(cell_key, o, stride)
+            a_all = expand(cell_start[src], cell_count[src])
+            lo = np.repeat(cell_start[dst], cell_count[src])
+            count = np.repeat(cell_count[dst], cell_count[src])
+        ends = np.cumsum(count)
+        start = 0
+        while start < len(a_all):
+            stop = max(int(np.searchsorted(ends, ends[start] - count[start] + max_block_pairs, side="right")), start + 1)
+            c = count[start:stop]
+            a = np.repeat(a_all[start:stop], c)
+            b = np.repeat(lo[start:stop], c) + np.arange(len(a)) - np.repeat(np.cumsum(c) - c, c)
+            i, j = order[a], order[b]
+            hit = overlapping(i, j)
+            candidates.append(np.column_stack((i, j)))
+            collisions.append(np.column_stack((i[hit], j[hit])))
+            start = stop
+
+    return (_ordered_pairs(*np.concatenate(candidates or [empty]).T),
+            _sorted_pairs(*np.concatenate(collisions or [empty]).T))
+
+
+def grid_numpy_detect(circles):
+    x, y, r = circle_arrays(circles)
+    candidates, collisions = grid_pairs(np.column_stack((x, y)), r)
+    return len(candidates), len(collisions)
+
+
+def sweep_and_prune_numpy_detect(circles):
+    candidates, collisions = sweep_and_prune_pairs(*circle_arrays(circles))
+    return len(candidates), len(collisions)
+
+
+# detektory porównywane w benchmarku; pierwszy jest punktem odniesienia
+DETECTORS = {
+    "Brute Force": brute_force_detect,
+    "Sweep & Prune": sweep_and_prune_detect,
+    "Spatial Hash": spatial_hash_detect,
+    "SAP NumPy": sweep_and_prune_numpy_detect,
+    "Grid NumPy": grid_numpy_detect,
+}
+
+
+# --- scenariusze benchmarku: (n, rng) -> x, y, r ---
+def scenario_uniform(n, rng, width=1000, height=1000, radius=(2, 8)):
+    return rng.random(n) * width, rng.random(n) * height, rng.uniform(*radius, n)
+
+
+def scenario_clustered(n, rng, side=1000, radius=(2, 8), per_cluster=50, spread=25):
+    # skupiska po ~per_cluster kół, rozrzut gaussowski wokół losowych środków
+    centers = rng.random((max(1, n // per_cluster), 2)) * side
+    pos = centers[rng.integers(0, len(centers), n)] + rng.normal(0, spread, (n, 2))
+    return pos[:, 0], pos[:, 1], rng.uniform(*radius, n)
+
+
+def scenario_strip(n, rng, side=1000, radius=(2, 8), aspect=100):
+    # ta sama powierzchnia co kwadrat, ale wąski pionowy pas - rzuty na oś x
+    # (oś Sweep & Prune) prawie wszystkie na siebie zachodzą
+    width, height = side / math.sqrt(aspect), side * math.sqrt(aspect)
+    return rng.random(n) * width, rng.random(n) * height, rng.uniform(*radius, n)
+
+
+def scenario_wide_radius(n, rng, side=1000, radius=(1, 60)):
+    # promienie log-jednostajne: kilka dużych kół i mnóstwo małych
+    return rng.random(n) * side, rng.random(n) * side, np.exp(rng.uniform(*np.log(radius), n))
+
+
+def scenario_jammed(n, rng, side=1000, jitter=0.03):
+    # siatka heksagonalna wypełniająca kwadrat, koła prawie stykają się z sąsiadami
+    spacing = side * math.sqrt(2 / (math.sqrt(3) * n))
+    cols = max(1, int(side / spacing))
+    k = np.arange(n)
+    row, col = k // cols, k % cols
+    x = (col + 0.5 * (row % 2)) * spacing + rng.normal(0, jitter * spacing, n)
+    y = row * spacing * math.sqrt(3) / 2 + rng.normal(0, jitter * spacing, n)
+    return x, y, spacing / 2 * rng.uniform(0.95, 1.0, n)
+
+
+SCENARIOS = {
+    "uniform": scenario_uniform,
+    "clustered": scenario_clustered,
+    "strip": scenario_strip,
+    "wide_radius": scenario_wide_radius,
+    "jammed": scenario_jammed,
+}
+
+
+def peak_memory(call):
+    """Szczyt pamięci (bajty) zaalokowanej przez call() - tracemalloc widzi też bufory NumPy."""
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
 def benchmark_detection(width=1000, height=1000, radiuss=(2, 8),
-                        counts=(100, 200, 500, 1000, 2000), trials=3):
+                        counts=(100, 200, 500, 1000, 2000), trials=3,
+                        large_counts=(10**4, 10**5, 10**6), scenarios=("uniform",)):
     print("\n=== BENCHMARK: wykrywanie kolizji (tylko detekcja) ===")
     print("Ustawienia: area={}x{}, r∈[{},{}], próby/próba={}".format(width, height, radiuss[0], radiuss[1], trials))
-    for n in counts:
-        times_bf, times_sap = [], []
-        for _ in range(trials):
-            circles = [Circle(random.random()*width, random.random()*height,
-                              random.uniform(radiuss[0], radiuss[1])) for _ in range(n)]
-
-            t0 = time.perf_counter()
-            brute_force_detect(circles)
-            t1 = time.perf_counter()
-
-            t2 = time.perf_counter()
-            sweep_and_prune_detect(circles)
-            t3 = time.perf_counter()
-
-            times_bf.append((t1 - t0)*1000)
-            times_sap.append((t3 - t2)*1000)
-
-        mean_b = statistics.mean(times_bf)
-        mean_s = statistics.mean(times_sap)
-        ratio = mean_b / mean_s if mean_s > 0 else float('inf')
-        print(f"n={n:5d} | Brute Force: {mean_b:8.3f} ms | Sweep & Prune: {mean_s:8.3f} ms | Speedup: {ratio:5.2f}x")
+    rng = np.random.default_rng()
+    for scenario in scenarios:
+        if scenario != "uniform" or len(scenarios) > 1:
+            print(f"--- scenariusz: {scenario} ---")
+        generate = SCENARIOS[scenario]
+        if scenario == "uniform":
+            generate = lambda n, rng: scenario_uniform(n, rng, width, height, radiuss)
+        for n in counts:
+            times = {name: [] for name in DETECTORS}
+            # rozgrzewka poza pomiarem - pierwsze wywołanie wczytuje jądra numba z cache
+            warmup = [Circle(*c) for c in zip(*(a.tolist() for a in generate(n, rng)))]
+            for detect in DETECTORS.values():
+                detect(warmup)
+            for _ in range(trials):
+                x, y, r = generate(n, rng)
+                circles = [Circle(*c) for c in zip(x.tolist(), y.tolist(), r.tolist())]
+                for name, detect in DETECTORS.items():
+                    t0 = time.perf_counter()
+                    detect(circles)
+                    t1 = time.perf_counter()
+                    times[name].append((t1 - t0)*1000)
+            # pamięć osobno - tracemalloc spowalnia alokacje i zafałszowałby czasy
+            peaks = {name: peak_memory(lambda: detect(circles)) for name, detect in DETECTORS.items()}
+
+            means = {name: statistics.mean(t) for name, t in times.items()}
+            base = means["Brute Force"]
+            row = [f"n={n:5d}", f"Brute Force: {base:8.3f} ms {peaks['Brute Force'] / 1024:7.0f} KiB"]
+            for name, mean in list(means.items())[1:]:
+                ratio = base / mean if mean > 0 else float('inf')
+                row.append(f"{name}: {mean:8.3f} ms {peaks[name] / 1024:7.0f} KiB | Speedup: {ratio:5.2f}x")
+            print(" | ".join(row))
+            best = min(means, key=means.get)
+            auto = DETECTOR_NAMES[choose_detector(circle_stats(x, y, r))]
+            print(f"        wybór automatyczny: {auto} ({means[auto] / means[best]:.2f}x najlepszego: {best})")
+
+    # duże zbiory tylko dla wersji wektorowej; pas o stałej wysokości wydłuża
+    # się z n, żeby gęstość (także wzdłuż osi x) była taka jak dla największego
+    # n powyżej - w kwadracie liczba kandydatów SAP rosłaby jak n^1.5
+    ref = max(counts) if counts else 1
+    for n in large_counts:
+        w, h = width * n / ref, height
+        x = rng.random(n) * w
+        y = rng.random(n) * h
+        r = rng.uniform(radiuss[0], radiuss[1], n)
+        t0 = time.perf_counter()
+        candidates, collisions = sweep_and_prune_pairs(x, y, r)
+        t1 = time.perf_counter()
+        peak = peak_memory(lambda: sweep_and_prune_pairs(x, y, r))
+        print(f"n={n:7d} | area={w:.0f}x{h:.0f} | SAP NumPy: {(t1 - t0)*1000:9.3f} ms"
+              f" | szczyt pamięci: {peak / 2**20:8.1f} MiB"
+              f" | kandydaci: {len(candidates)} | kolizje: {len(collisions)}")
     print("=== KONIEC BENCHMARKU ===\n")
 
 
-def run_pygame_simulation(initial_count=200):
+def _fit_costs(features, times):
+    """Nieujemne współczynniki modelu kosztu metodą najmniejszych kwadratów błędu
+    względnego (pomiar 50 µs waży tyle co 5 ms); kolumny, którym wyszedł ujemny
+    współczynnik, zerujemy i dopasowujemy resztę od nowa."""
+    features, times = np.asarray(features, dtype=np.float64), np.asarray(times, dtype=np.float64)
+    a, b = features / times[:, None], np.ones(len(times))
+    free = features.any(axis=0)
+    coef = np.zeros(features.shape[1])
+    while free.any():
+        coef[:] = 0.0
+        coef[free] = np.linalg.lstsq(a[:, free], b, rcond=None)[0]
+        if (coef >= 0).all():
+            break
+        free &= coef > 0
+    return coef
+
+
+def fit_selector_costs(counts=(200, 500, 1000, 2000, 5000), trials=3, scenarios=tuple(SCENARIOS), seed=0):
+    """Mierzy detektory z DETECTOR_NAMES na scenariuszach z SCENARIOS (sama detekcja na
+    liście Circle i resolwer z RESOLVERS na kulkach) i dopasowuje do pomiarów modele
+    kosztu choose_detector; wypisuje SELECTOR_COSTS (i SELECTOR_COSTS_NUMBA, gdy jest
+    numba) w postaci do wklejenia w kod."""
+    print("=== Dopasowanie kosztów wyboru detektora ===")
+    backends = (False, True) if kernels.enabled else (False,)
+    for backend in backends:
+        kernels.enabled, saved = backend, kernels.enabled
+        samples = {mode: {name: ([], []) for name in DETECTOR_NAMES} for mode in ("detect", "resolve")}
+        rng = np.random.default_rng(seed)
+        try:
+            for scenario in scenarios:
+                for n in counts:
+                    # próba 0 to rozgrzewka poza pomiarem (cache jąder numba, alokacje)
+                    for trial in range(trials + 1):
+                        x, y, r = SCENARIOS[scenario](n, rng)
+                        candidates = circle_stats(x, y, r)["candidates"]
+                        circles = [Circle(*c) for c in zip(x.tolist(), y.tolist(), r.tolist())]
+                        vx, vy = rng.uniform(-150, 150, (2, n)).tolist()
+                        for name, label in DETECTOR_NAMES.items():
+                            t0 = time.perf_counter()
+                            DETECTORS[label](circles)
+                            t1 = time.perf_counter()
+                            balls = [BallSim(*b) for b in zip(x.tolist(), y.tolist(), vx, vy, r.tolist())]
+                            t2 = time.perf_counter()
+                            _, collisions = RESOLVERS[name](balls)
+                            t3 = time.perf_counter()
+                            if trial:
+                                for mode, elapsed, hits in (("detect", t1 - t0, 0), ("resolve", t3 - t2, collisions)):
+                                    samples[mode][name][0].append((1, n, candidates[name], hits))
+                                    samples[mode][name][1].append(elapsed * 1e6)
+        finally:
+            kernels.enabled = saved
+        print(f"{'SELECTOR_COSTS_NUMBA' if backend else 'SELECTOR_COSTS'} = {{")
+        for mode, fits in samples.items():
+            print(f'    "{mode}": {{')
+            for name, (features, times) in fits.items():
+                coef = _fit_costs(features, times)
+                error = np.median(np.abs(np.asarray(features) @ coef / times - 1))
+                terms = ", ".join(f"{float(f'{c:.2g}'):g}" for c in coef)
+                print(f'        "{name}": ({terms}),  # mediana błędu {error:.0%}')
+            print("    },")
+        print("}")
+
+
+class BallSim:
+    base_color = (0, 200, 0)
+    hit_color = (255, 50, 50)
+
+    def __init__(self, x, y, vx, vy, r):
+        self.x, self.y, self.vx, self.vy, self.r = x, y, vx, vy, r
+        self.mass = math.pi * r * r
+        self.color = self.base_color
+        self.timer = 0.0
+
+    @property
+    def left(self): return self.x - self.r
+    @property
+    def right(self): return self.x + self.r
+
+    def mark_collision(self):
+        self.color = self.hit_color
+        self.timer = 0.12
+
+    def update(self, dt, width, height):
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        if self.x - self.r < 0 or self.x + self.r > width:
+            self.vx *= -1
+            self.mark_collision()
+        if self.y - self.r < 0 or self.y + self.r > height:
+            self.vy *= -1
+            self.mark_collision()
+        if self.timer > 0:
+            self.timer -= dt
+            if self.timer <= 0:
+                self.color = self.base_color
+
+
+def resolve(a: BallSim, b: BallSim):
+    dx = b.x - a.x
+    dy = b.y - a.y
+    dist = math.hypot(dx, dy)
+    if dist == 0 or dist >= a.r + b.r:
+        return False
+    nx, ny = dx/dist, dy/dist
+    dvx, dvy = b.vx - a.vx, b.vy - a.vy
+    vn = dvx*nx + dvy*ny
+    if vn > 0: return False
+    j = -(1+1.0)*vn / (1/a.mass + 1/b.mass)
+    a.vx -= (j*nx)/a.mass; a.vy -= (j*ny)/a.mass
+    b.vx += (j*nx)/b.mass; b.vy += (j*ny)/b.mass
+    overlap = (a.r + b.r - dist)/2
+    a.x -= overlap*nx; a.y -= overlap*ny
+    b.x += overlap*nx; b.y += overlap*ny
+    a.mark_collision(); b.mark_collision()
+    return True
+
+
+def brute_force_resolve(balls):
+    checks = collisions = 0
+    for i in range(len(balls)):
+        for j in range(i+1, len(balls)):
+            checks += 1
+            if resolve(balls[i], balls[j]):
+                collisions += 1
+    return checks, collisions
+
+
+def sweep_and_prune_resolve(balls):
+    checks = collisions = 0
+    sorted_balls = sorted(balls, key=lambda b: b.left)
+    active = []
+    for min_x, max_x, idx in [(b.left, b.right, i) for i,b in enumerate(sorted_balls)]:
+        new_active = []
+        for a_min,a_max,a_idx in active:
+            if a_max > min_x:
+                checks += 1
+                if abs(sorted_balls[idx].y - sorted_balls[a_idx].y) < (sorted_balls[idx].r + sorted_balls[a_idx].r):
+                    if resolve(sorted_balls[idx], sorted_balls[a_idx]):
+                        collisions += 1
+                new_active.append((a_min,a_max,a_idx))
+        new_active.append((min_x,max_x,idx))
+        active = new_active
+    return checks, collisions
+
+
+def spatial_hash_resolve(balls):
+    checks = collisions = 0
+    for i, j in spatial_hash_pairs(balls):
+        checks += 1
+        if resolve(balls[i], balls[j]):
+            collisions += 1
+    return checks, collisions
+
+
+def _ball_pairs_in_order(pairs, balls):
+    """Pary kulek w stałej kolejności: (i, j), i < j według miejsca na liście balls,
+    posortowane jak w pętli po wszystkich parach. Kolejność iteracji zbioru zależy
+    od id() kulek i historii zbioru, a od kolejności par zależy wynik resolve()."""
+    if not pairs:
+        return []
+    index = {b: i for i, b in enumerate(balls)}
+    i, j = np.array([(index[a], index[b]) for a, b in pairs], dtype=np.intp).T
+    return [(balls[i], balls[j]) for i, j in _sorted_pairs(i, j).tolist()]
+
+
+class IncrementalSAP:
+    """Sweep & Prune z pamięcią między klatkami.
+
+    Listy końców przedziałów na osiach x i y są trwałe i co klatkę naprawiane
+    sortowaniem przez wstawianie - kolejność prawie się nie zmienia, więc koszt
+    to O(n + zamian). Zamiany końców aktualizują zbiór par, których AABB
+    nakładają się na obu osiach; started/ended to pary, które w ostatniej
+    klatce się pojawiły/zniknęły. Dodane i usunięte kulki są zbierane
+    i wstawiane do list / wycinane z nich raz na klatkę w update().
+    """
+
+    def __init__(self):
+        self.xs, self.ys = [], []  # [wartość, kulka, czy_prawy_koniec]
+        self.pairs = set()
+        self.started, self.ended = set(), set()
+        self.swaps = 0
+        self._members = set()
+        self._added = []
+        self._removed = set()
+
+    @staticmethod
+    def _key(a, b):
+        return (a, b) if id(a) < id(b) else (b, a)
+
+    def add(self, ball):
+        # końce i pary kulki pojawiają się przy najbliższym update()
+        self._members.add(ball)
+        self._added.append(ball)
+
+    def remove(self, ball):
+        # końce i pary kulki znikają przy najbliższym update()
+        if ball in self._members:
+            self._members.discard(ball)
+            self._removed.add(ball)
+
+    def _insert_added(self):
+        # nowe końce dopisane i jedno sortowanie (lista jest już posortowana,
+        # więc to scalenie dwóch serii), potem pary nowych kulek z jednego
+        # przejścia po osi x z otwartymi przedziałami
+        added, self._added = self._added, []
+        added = [b for b in added if b in self._members]
+        self.xs += [[b.x + s * b.r, b, s > 0] for b in added for s in (-1, 1)]
+        self.ys += [[b.y + s * b.r, b, s > 0] for b in added for s in (-1, 1)]
+        self.xs.sort(key=lambda e: e[0])
+        self.ys.sort(key=lambda e: e[0])
+        fresh = set(added)
+        open_old, open_new = set(), set()
+        for _, a, right in self.xs:
+            is_new = a in fresh
+            if right:
+                (open_new if is_new else open_old).discard(a)
+                continue
+            for others in ((open_old, open_new) if is_new else (open_new,)):
+                for b in others:
+                    if abs(a.x - b.x) < a.r + b.r and abs(a.y - b.y) < a.r + b.r:
+                        key = self._key(a, b)
+                        if key not in self.pairs:
+                            self.pairs.add(key)
+                            self.started.add(key)
+            (open_new if is_new else open_old).add(a)
+
+    def _drop_removed(self):
+        removed = self._removed
+        self.xs = [e for e in self.xs if e[1] not in removed]
+        self.ys = [e for e in self.ys if e[1] not in removed]
+        gone = {p for p in self.pairs if p[0] in removed or p[1] in removed}
+        self.pairs -= gone
+        self.ended |= gone
+        self._removed = set()
+
+    def _repair(self, eps):
+        pairs, swaps = self.pairs, 0
+        for i in range(1, len(eps)):
+            e = eps[i]
+            v = e[0]
+            j = i - 1
+            while j >= 0 and eps[j][0] > v:
+                f = eps[j]
+                swaps += 1
+                if not e[2] and f[2]:
+                    # lewy koniec e mija prawy koniec f - AABB mogą zacząć się nakładać
+                    a, b = e[1], f[1]
+                    if abs(a.x - b.x) < a.r + b.r and abs(a.y - b.y) < a.r + b.r:
+                        key = self._key(a, b)
+                        if key not in pairs:
+                            pairs.add(key)
+                            self.started.add(key)
+                elif e[2] and not f[2]:
+                    # prawy koniec e mija lewy koniec f - przestają się nakładać
+                    key = self._key(e[1], f[1])
+                    if key in pairs:
+                        pairs.remove(key)
+                        self.ended.add(key)
+                eps[j + 1] = f
+                j -= 1
+            eps[j + 1] = e
+        return swaps
+
+    def update(self, balls):
+        self.started, self.ended = set(), set()
+        # kulki mogą znikać i pojawiać się w tej samej klatce (spawn / despawn_at),
+        # więc sama długość listy nie wystarcza - nowe szukane po kolei
+        members = self._members
+        for b in balls:
+            if b not in members:
+                self.add(b)
+        if len(members) != len(balls):
+            for b in members - set(balls):
+                self.remove(b)
+        if self._removed:
+            self._drop_removed()
+
+        # stare końce naprawiane sortowaniem przez wstawianie, nowe wstawiane potem
+        for e in self.xs:
+            b = e[1]
+            e[0] = b.x + b.r if e[2] else b.x - b.r
+        for e in self.ys:
+            b = e[1]
+            e[0] = b.y + b.r if e[2] else b.y - b.r
+        self.swaps = self._repair(self.xs) + self._repair(self.ys)
+        if self._added:
+            self._insert_added()
+
+    def __call__(self, balls):
+        self.update(balls)
+        checks = collisions = 0
+        for a, b in _ball_pairs_in_order(self.pairs, balls):
+            checks += 1
+            if resolve(a, b):
+                collisions += 1
+        return checks, collisions
+
+
+
+class DynamicTreeResolver:
+    """Drzewo AABB (aabbtree.AABBTree) trwałe między klatkami.
+
+    Kulki dodane do listy dostają liść przy pierwszym wywołaniu, usunięte
+    tracą go, gdy liczba liści przestanie się zgadzać z listą. Ruch
+    przebudowuje drzewo tylko dla kulek, które wyszły poza poszerzony
+    prostokąt, a pary kandydatów zmieniają się tylko dla nich. W --churn
+    (2000 kulek) i tak jest najwolniejszy ze wszystkich - z wymianą kulek
+    i bez niej.
+    """
+
+    def __init__(self, margin=2.0, predict=16.0, dt=1/60):
+        # zapas na 16 kroków ruchu: przy ~150 px/s liście przenoszone raz na kilkanaście klatek
+        self.tree = AABBTree(margin, predict)
+        self.dt = dt
+        self.proxies = {}
+
+    def update(self, balls):
+        tree, proxies, dt = self.tree, self.proxies, self.dt
+        boxes = tree.boxes
+        for b in balls:
+            proxy = proxies.get(b)
+            x, y, r = b.x, b.y, b.r
+            if proxy is None:
+                proxies[b] = tree.insert(b, x - r, y - r, x + r, y + r)
+                continue
+            # większość kulek nie wychodzi z poszerzonego prostokąta - bez wywołania move()
+            box = boxes[proxy]
+            if box[0] <= x - r and box[1] <= y - r and x + r <= box[2] and y + r <= box[3]:
+                continue
+            tree.move(proxy, x - r, y - r, x + r, y + r, b.vx * dt, b.vy * dt)
+        if len(proxies) != len(balls):
+            current = set(balls)
+            for b in [b for b in proxies if b not in current]:
+                tree.remove(proxies.pop(b))
+        return tree.item_pairs()
+
+    def __call__(self, balls):
+        checks = collisions = 0
+        for a, b in self.update(balls):
+            checks += 1
+            if resolve(a, b):
+                collisions += 1
+        return checks, collisions
+
+def color_pairs(pairs):
+    """Dzieli pary (K,2) na grupy, w których żadne ciało nie występuje dwa razy.
+
+    Para trafia do bieżącej grupy, gdy żadna wcześniejsza (w kolejności
+    tablicy) nierozwiązana para nie dotyczy jej ciał. Dzięki temu rozwiązanie
+    grup po kolei daje ten sam wynik co pętla po parach w kolejności tablicy.
+    Zwraca listę tablic indeksów do pairs.
+    """
+    remaining = np.arange(len(pairs))
+    groups = []
+    while len(remaining):
+        p = pairs[remaining]
+        # pierwsze wystąpienie każdego ciała wśród pozostałych par
+        bodies, first = np.unique(p.ravel(), return_index=True)
+        first_pair = np.empty(bodies[-1] + 1, np.intp)
+        first_pair[bodies] = first // 2
+        k = np.arange(len(remaining))
+        free = (first_pair[p[:, 0]] == k) & (first_pair[p[:, 1]] == k)
+        groups.append(remaining[free])
+        remaining = remaining[~free]
+    return groups
+
+
+def resolve_pairs(x, y, vx, vy, r, mass, pairs, groups=None):
+    """Wektorowa wersja resolve() dla tablicy par; tablice stanu są zmieniane
+    w miejscu. Zwraca maskę par, które faktycznie zostały rozwiązane."""
+    if groups is None:
+        if kernels.enabled:
+            # grupy color_pairs dają ten sam wynik co łańcuch par po kolei
+            return kernels.resolve_chain(x, y, vx, vy, r, mass, pairs)
+        groups = color_pairs(pairs)
+    resolved = np.zeros(len(pairs), bool)
+    for g in groups:
+        i, j = pairs[g, 0], pairs[g, 1]
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        dist = np.hypot(dx, dy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            nx, ny = dx/dist, dy/dist
+        dvx, dvy = vx[j] - vx[i], vy[j] - vy[i]
+        vn = dvx*nx + dvy*ny
+        ok = (dist > 0) & (dist < r[i] + r[j]) & (vn <= 0)
+        g, i, j, nx, ny, vn, dist = g[ok], i[ok], j[ok], nx[ok], ny[ok], vn[ok], dist[ok]
+        jn = -(1+1.0)*vn / (1/mass[i] + 1/mass[j])
+        vx[i] -= (jn*nx)/mass[i]; vy[i] -= (jn*ny)/mass[i]
+        vx[j] += (jn*nx)/mass[j]; vy[j] += (jn*ny)/mass[j]
+        overlap = (r[i] + r[j] - dist)/2
+        x[i] -= overlap*nx; y[i] -= overlap*ny
+        x[j] += overlap*nx; y[j] += overlap*ny
+        resolved[g] = True
+    return resolved
+
+
+def _numpy_resolve(balls, detect):
+    n = len(balls)
+    x, y, r = circle_arrays(balls)
+    vx = np.fromiter((b.vx for b in balls), np.float64, n)
+    vy = np.fromiter((b.vy for b in balls), np.float64, n)
+    mass = np.fromiter((b.mass for b in balls), np.float64, n)
+    candidates, pairs = detect(x, y, r)
+    resolved = resolve_pairs(x, y, vx, vy, r, mass, pairs)
+    # z powrotem do obiektów tylko kulki, które brały udział w kolizji
+    for k in np.unique(pairs[resolved]).tolist():
+        b = balls[k]
+        b.x, b.y, b.vx, b.vy = float(x[k]), float(y[k]), float(vx[k]), float(vy[k])
+        b.mark_collision()
+    return len(candidates), int(resolved.sum())
+
+
+def sweep_and_prune_numpy_resolve(balls):
+    return _numpy_resolve(balls, sweep_and_prune_pairs)
+
+
+def grid_numpy_resolve(balls):
+    return _numpy_resolve(balls, lambda x, y, r: grid_pairs(np.column_stack((x, y)), r))
+
+
+# algorytmy dostępne w symulacji 2D (SPACE przełącza po kolei)
+RESOLVERS = {
+    "sap": sweep_and_prune_resolve,
+    "brute": brute_force_resolve,
+    "grid": spatial_hash_resolve,
+    "sap_inc": IncrementalSAP,
+    "tree": DynamicTreeResolver,
+    "sap_np": sweep_and_prune_numpy_resolve,
+    "grid_np": grid_numpy_resolve,
+}
+
+
+
+# --- automatyczny wybór detektora ---
+# nazwy z RESOLVERS, między którymi wybiera tryb auto, i odpowiadające im nazwy w DETECTORS;
+# brute i grid (hash na obiektach) nigdy nie wygrywały, sap_inc i tree trzymają stan między klatkami
+DETECTOR_NAMES = {"sap": "Sweep & Prune", "sap_np": "SAP NumPy", "grid_np": "Grid NumPy"}
+
+# modele kosztu w µs: (stały, na ciało, na kandydata, na kolizję), dopasowane
+# metodą najmniejszych kwadratów do pomiarów na scenariuszach z SCENARIOS
+# (python zadanie3.py --fit-selector wypisuje obie tabele dla bieżącej maszyny);
+# "detect" - sama detekcja na liście Circle, "resolve" - krok symulacji 2D
+SELECTOR_COSTS = {
+    "detect": {
+        "sap": (0, 0.39, 0.19, 0),
+        "sap_np": (61, 0.16, 0.052, 0),
+        "grid_np": (290, 0.43, 0.067, 0),
+    },
+    "resolve": {
+        "sap": (8.6, 0.34, 0.11, 1.2),
+        "sap_np": (210, 0, 0.046, 5),
+        "grid_np": (490, 0.16, 0.14, 2.4),
+    },
+}
+# z jądrami numba pary SAP NumPy i łańcuch resolve() są dużo tańsze
+SELECTOR_COSTS_NUMBA = {
+    "detect": {
+        "sap": (0, 0.4, 0.19, 0),
+        "sap_np": (21, 0.23, 0.005, 0),
+        "grid_np": (290, 0.4, 0.064, 0),
+    },
+    "resolve": {
+        "sap": (2.4, 0.36, 0.11, 1.3),
+        "sap_np": (42, 0.22, 0.005, 0.78),
+        "grid_np": (280, 0.42, 0.055, 0.94),
+    },
+}
+
+
+def circle_stats(x, y, r):
+    """Tanie statystyki zbioru kół (dwa sortowania, bez par):
+    n, aspect (dłuższy / krótszy bok obrysu), coverage (suma pól kół / pole obrysu),
+    radius_spread (max r / mediana r), clustering (średnie zatłoczenie komórki
+    siatki względem rozkładu jednostajnego) i candidates - dokładna liczba
+    kandydatów SAP (przedziały na osi x) i siatki z grid_pairs."""
+    x, y, r = (np.asarray(a, dtype=np.float64) for a in (x, y, r))
+    n = len(x)
+    if n == 0:
+        return {"n": 0, "aspect": 1.0, "coverage": 0.0, "radius_spread": 1.0, "clustering": 1.0,
+                "candidates": {"sap": 0, "sap_np": 0, "grid_np": 0}}
+    extent = np.array([np.ptp(x), np.ptp(y)]) + 2 * r.max()
+    # SAP: dla każdego przedziału liczba późniejszych lewych końców < jego prawy koniec
+    left = x - r
+    order = np.argsort(left)
+    ahead = np.searchsorted(left[order], (x + r)[order]) - np.arange(1, n + 1)
+    sap = int(np.maximum(ahead, 0).sum())
+    # siatka: pary w tej samej komórce i w połowie sąsiednich, jak w grid_pairs
+    pos = np.column_stack((x, y))
+    cell_size = 2 * r.max()
+    _, _, cell_count, cell_key, stride, forward = _grid_cells(pos, cell_size)
+    grid = int((cell_count * (cell_count - 1) // 2).sum())
+    for o in forward:
+        src, dst = _neighbour_cells(cell_key, o, stride)
+        grid += int((cell_count[src] * cell_count[dst]).sum())
+    cells = float(np.prod(np.floor(extent / cell_size) + 1))
+    return {
+        "n": n,
+        "aspect": float(extent.max() / extent.min()),
+        "coverage": float(np.pi * (r ** 2).sum() / extent.prod()),
+        "radius_spread": float(r.max() / np.median(r)),
+        # średnia liczba sąsiadów w komórce widziana przez koło vs oczekiwana przy jednostajnym
+        "clustering": float((cell_count ** 2).sum() / n / (1 + (n - 1) / cells)),
+        "candidates": {"sap": sap, "sap_np": sap, "grid_np": grid},
+    }
+
+
+def choose_detector(stats, collisions=0, mode="detect"):
+    """Nazwa z DETECTOR_NAMES o najmniejszym przewidywanym koszcie; collisions -
+    liczba kolizji z poprzedniego kroku (w trybie "resolve" ich obsługa kosztuje)."""
+    costs = (SELECTOR_COSTS_NUMBA if kernels.enabled else SELECTOR_COSTS)[mode]
+
+    def cost(name):
+        fixed, per_body, per_candidate, per_collision = costs[name]
+        return (fixed + per_body * stats["n"] + per_candidate * stats["candidates"][name]
+                + per_collision * collisions)
+
+    return min(DETECTOR_NAMES, key=cost)
+
+def create_balls(n, width, height):
+    arr = []
+    for _ in range(n):
+        r = random.uniform(6, 14)
+        arr.append(BallSim(random.uniform(r, width-r),
+                           random.uniform(r, height-r),
+                           random.uniform(-150,150),
+                           random.uniform(-150,150),
+                           r))
+    return arr
+
+
+class BallSimScene:
+    """Scena 2D bez pygame: ruch kulek + wykrywanie i rozwiązywanie kolizji."""
+
+    def __init__(self, count=200, width=1000, height=700, algorithm="sap", profiler=None, reselect_every=60):
+        self.width, self.height = width, height
+        self.balls = create_balls(count, width, height)
+        self.algorithm = algorithm
+        # algorithm="auto": co reselect_every kroków choose_detector wybiera resolwer na nowo
+        self.reselect_every = reselect_every
+        self.selected = None
+        self.steps = 0
+        # klasy w RESOLVERS trzymają stan między klatkami - każda scena ma własne instancje
+        self.resolvers = {name: r() if isinstance(r, type) else r for name, r in RESOLVERS.items()}
+        self.checks = self.collisions = 0
+        self.recorder = None
+        self.profiler = profiler or PhaseProfiler()
+
+    def record(self, path, dt=1/60):
+        # każdy krok step() trafia do nagrania (współrzędne ekranu, oś y w dół)
+        self.recorder = TrajectoryRecorder(path, dt, (self.width, self.height), y_up=False,
+                                           source="zadanie3")
+        return self.recorder
+
+    @property
+    def label(self):
+        if self.algorithm == "auto" and self.selected is not None:
+            return f"AUTO({self.selected})"
+        return self.algorithm.upper()
+
+    def spawn(self, x, y, r=None, speed=150):
+        """Nowa kulka w (x, y); domyślny promień log-jednostajny 3..40 - małe i duże naraz."""
+        r = r or math.exp(random.uniform(math.log(3), math.log(40)))
+        r = min(r, self.width / 2, self.height / 2)
+        ball = BallSim(min(max(x, r), self.width - r), min(max(y, r), self.height - r),
+                       random.uniform(-speed, speed), random.uniform(-speed, speed), r)
+        self.balls.append(ball)
+        return ball
+
+    def despawn_at(self, x, y):
+        """Usuwa kulki zawierające punkt (x, y); zwraca ich liczbę."""
+        kept = [b for b in self.balls if (b.x - x) ** 2 + (b.y - y) ** 2 > b.r * b.r]
+        removed = len(self.balls) - len(kept)
+        self.balls[:] = kept
+        return removed
+
+    def next_algorithm(self):
+        names = list(RESOLVERS) + ["auto"]
+        self.algorithm = names[(names.index(self.algorithm) + 1) % len(names)]
+        self.selected = None
+
+    def select(self):
+        stats = circle_stats(*circle_arrays(self.balls))
+        self.selected = choose_detector(stats, self.collisions, mode="resolve")
+        return self.selected
+
+    def step(self, n_steps=1, dt=1/60):
+        profiler = self.profiler
+        for _ in range(n_steps):
+            with profiler.phase("move"):
+                for b in self.balls:
+                    b.update(dt, self.width, self.height)
+            name = self.algorithm
+            if name == "auto":
+                if self.selected is None or self.steps % self.reselect_every == 0:
+                    with profiler.phase("select"):
+                        self.select()
+                name = self.selected
+            # resolwery łączą fazę szeroką i wąską - mierzymy je razem
+            with profiler.phase("collisions"):
+                self.checks, self.collisions = self.resolvers[name](self.balls)
+            self.steps += 1
+            if self.recorder is not None:
+                with profiler.phase("record"):
+                    state = np.array([(b.x, b.y, b.vx, b.vy) for b in self.balls]).reshape(-1, 4)
+                    self.recorder.record(state[:, :2], state[:, 2:], [b.r for b in self.balls],
+                                         BallSim.base_color)
+
+
+def run_headless(steps=1000, count=200, algorithm="sap", record=None, profiler=None):
+    scene = BallSimScene(count, algorithm=algorithm, profiler=profiler)
+    if record:
+        scene.record(record)
+    profiler = scene.profiler
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        scene.step()
+        profiler.end_frame()
+    elapsed = time.perf_counter() - t0
+    if scene.recorder is not None:
+        scene.recorder.close()
+    print(f"{scene.label} | Kulki: {count} | kroki: {steps} | czas: {elapsed:.3f} s | {steps / elapsed:.1f} kroków/s")
+    if profiler.enabled:
+        profiler.report()
+        profiler.close()
+    return scene
+
+
+def benchmark_churn(count=2000, steps=300, rates=(0.0, 0.01, 0.05), algorithms=("sap", "sap_inc", "sap_np", "tree"),
+                    seed=0):
+    """Kroki/s, gdy co krok ułamek rate kulek znika, a tyle samo nowych pojawia
+    się w losowych miejscach. Wszystkie kulki z spawn() (promienie 3..40); obszar
+    rośnie z count jak 1000x700 na 200 kulek, co daje pokrycie ok. 30%.
+    sap_inc wstawia i usuwa kulki raz na klatkę, więc wymiana spowalnia go
+    umiarkowanie; tree jest wolniejsze od sap i sap_np przy każdym rate."""
+    scale = math.sqrt(count / 200)
+    width, height = 1000 * scale, 700 * scale
+    print(f"=== Churn: {count} kulek, {width:.0f}x{height:.0f}, {steps} kroków ===")
+    for rate in rates:
+        k = int(round(rate * count))
+        for algorithm in algorithms:
+            random.seed(seed)
+            scene = BallSimScene(0, width, height, algorithm)
+            for _ in range(count):
+                scene.spawn(random.uniform(0, width), random.uniform(0, height))
+            scene.step()  # poza pomiarem: budowa struktur, jądra numba
+            elapsed = 0.0
+            for _ in range(steps):
+                for b in random.sample(scene.balls, k):
+                    scene.balls.remove(b)
+                for _ in range(k):
+                    scene.spawn(random.uniform(0, width), random.uniform(0, height))
+                t0 = time.perf_counter()
+                scene.step()
+                elapsed += time.perf_counter() - t0
+            extra = ""
+            if algorithm == "tree":
+                tree = scene.resolvers["tree"].tree
+                extra = f" | przeniesienia liści/krok: {tree.reinserts / steps:7.1f} | wysokość: {tree.height[tree.root]}"
+            print(f"wymiana/krok: {k:4d} | {algorithm:8s} | {steps / elapsed:8.1f} kroków/s"
+                  f" | kandydaci: {scene.checks:6d}{extra}")
+
+def run_pygame_simulation(initial_count=200, record=None, profiler=None, algorithm="sap"):
     try:
         import pygame
     except Exception:
@@ -92,118 +1092,57 @@ def run_pygame_simulation(initial_count=200):
     pygame.init()
     WIDTH, HEIGHT = 1000, 700
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("Kolizje 2D — Brute Force vs Sweep & Prune")
+    pygame.display.set_caption("Kolizje 2D — SPACE: algorytm, LPM: dodaj kulki, PPM: usuń kulki")
     clock = pygame.time.Clock()
     font = pygame.font.SysFont("Consolas", 18)
 
-    class BallSim:
-        def __init__(self, x, y, vx, vy, r):
-            self.x, self.y, self.vx, self.vy, self.r = x, y, vx, vy, r
-            self.mass = math.pi * r * r
-            self.base_color = pygame.Color(0, 200, 0)
-            self.color = self.base_color
-            self.timer = 0.0
-
-        @property
-        def left(self): return self.x - self.r
-        @property
-        def right(self): return self.x + self.r
-
-        def mark_collision(self):
-            self.color = pygame.Color(255, 50, 50)
-            self.timer = 0.12
-
-        def update(self, dt):
-            self.x += self.vx * dt
-            self.y += self.vy * dt
-            if self.x - self.r < 0 or self.x + self.r > WIDTH:
-                self.vx *= -1
-                self.mark_collision()
-            if self.y - self.r < 0 or self.y + self.r > HEIGHT:
-                self.vy *= -1
-                self.mark_collision()
-            if self.timer > 0:
-                self.timer -= dt
-                if self.timer <= 0:
-                    self.color = self.base_color
-
-        def draw(self, surf):
-            pygame.draw.circle(surf, self.color, (int(self.x), int(self.y)), int(self.r))
-
-    def resolve(a: BallSim, b: BallSim):
-        dx = b.x - a.x
-        dy = b.y - a.y
-        dist = math.hypot(dx, dy)
-        if dist == 0 or dist >= a.r + b.r:
-            return False
-        nx, ny = dx/dist, dy/dist
-        dvx, dvy = b.vx - a.vx, b.vy - a.vy
-        vn = dvx*nx + dvy*ny
-        if vn > 0: return False
-        j = -(1+1.0)*vn / (1/a.mass + 1/b.mass)
-        a.vx -= (j*nx)/a.mass; a.vy -= (j*ny)/a.mass
-        b.vx += (j*nx)/b.mass; b.vy += (j*ny)/b.mass
-        overlap = (a.r + b.r - dist)/2
-        a.x -= overlap*nx; a.y -= overlap*ny
-        b.x += overlap*nx; b.y += overlap*ny
-        a.mark_collision(); b.mark_collision()
-        return True
-
-    def create_balls(n):
-        arr = []
-        for _ in range(n):
-            r = random.uniform(6, 14)
-            arr.append(BallSim(random.uniform(r, WIDTH-r),
-                               random.uniform(r, HEIGHT-r),
-                               random.uniform(-150,150),
-                               random.uniform(-150,150),
-                               r))
-        return arr
-
-    balls = create_balls(initial_count)
-    algorithm = "sap"
+    scene = BallSimScene(initial_count, WIDTH, HEIGHT, algorithm, profiler)
+    if record:
+        scene.record(record)
+    profiler = scene.profiler
+    # fizyka ze stałym krokiem 1/60 s niezależnie od FPS (dawniej dt = clock.tick(60)/1000)
+    loop = FixedStepLoop(1/60)
+    previous = None
+    renderer = SpriteRenderer(screen, (12, 12, 20))
 
     running = True
     while running:
-        dt = clock.tick(60) / 1000
         for ev in pygame.event.get():
             if ev.type == pygame.QUIT:
                 running = False
             elif ev.type == pygame.KEYDOWN:
                 if ev.key == pygame.K_SPACE:
-                    algorithm = "brute" if algorithm == "sap" else "sap"
+                    scene.next_algorithm()
+        # przytrzymany lewy przycisk sypie kulkami, prawy je zabiera
+        left, _, right = pygame.mouse.get_pressed()
+        if left:
+            scene.spawn(*pygame.mouse.get_pos())
+        if right:
+            scene.despawn_at(*pygame.mouse.get_pos())
+        if left or right:
+            previous = None
 
-        for b in balls:
-            b.update(dt)
+        for _ in range(loop.frame()):
+            previous = np.array([(b.x, b.y) for b in scene.balls]).reshape(-1, 2)
+            scene.step(dt=loop.dt)
 
-        checks = collisions = 0
-        if algorithm == "brute":
-            for i in range(len(balls)):
-                for j in range(i+1, len(balls)):
-                    checks += 1
-                    if resolve(balls[i], balls[j]):
-                        collisions += 1
-        else:
-            sorted_balls = sorted(balls, key=lambda b: b.left)
-            active = []
-            for min_x, max_x, idx in [(b.left, b.right, i) for i,b in enumerate(sorted_balls)]:
-                new_active = []
-                for a_min,a_max,a_idx in active:
-                    if a_max > min_x:
-                        checks += 1
-                        if abs(sorted_balls[idx].y - sorted_balls[a_idx].y) < (sorted_balls[idx].r + sorted_balls[a_idx].r):
-                            if resolve(sorted_balls[idx], sorted_balls[a_idx]):
-                                collisions += 1
-                        new_active.append((a_min,a_max,a_idx))
-                new_active.append((min_x,max_x,idx))
-                active = new_active
-
-        screen.fill((12,12,20))
-        for b in balls: b.draw(screen)
-        info = f"{algorithm.upper()} | Balls: {len(balls)} | Checks: {checks} | Collisions: {collisions}"
-        screen.blit(font.render(info, True, (240,240,240)), (12,12))
-        pygame.display.flip()
+        if loop.render():
+            with profiler.phase("draw"):
+                renderer.clear()
+                pos = interpolate(previous, np.array([(b.x, b.y) for b in scene.balls]).reshape(-1, 2), loop.alpha)
+                radius = np.array([b.r for b in scene.balls], dtype=int)
+                renderer.circles(pos[:, 0], pos[:, 1], radius, [b.color for b in scene.balls])
+                info = f"{scene.label} | Balls: {len(scene.balls)} | Checks: {scene.checks} | Collisions: {scene.collisions}"
+                renderer.text(font, info, (240,240,240), (12,12))
+                for row, line in enumerate(profiler.hud_lines()):
+                    renderer.text(font, line, (240,240,240), (12, 36 + 20 * row))
+                renderer.present()
+        profiler.end_frame()
+        clock.tick(60)
 
+    if scene.recorder is not None:
+        scene.recorder.close()
+    profiler.close()
     pygame.quit()
 
 
@@ -252,6 +1191,102 @@ def run_vpython_bouncing():
             color_timer -= dt
             if color_timer <= 0:
                 ball.color = color.green
+
+
+# --- 3D: kulki w pudełku na tablicach ---
+def collide_pairs_3d(pos, vel, radius, pairs, groups=None, restitution=1.1):
+    """Zderzenia par (K,2) kul o równych masach: impuls j = -restitution*vn/2
+    wzdłuż normalnej i rozsunięcie o połowę przekrycia. pos, vel (N,3)
+    zmieniane w miejscu; zwraca maskę rozwiązanych par."""
+    if groups is None:
+        groups = color_pairs(pairs)
+    resolved = np.zeros(len(pairs), bool)
+    for g in groups:
+        i, j = pairs[g, 0], pairs[g, 1]
+        d = pos[j] - pos[i]
+        dist = np.sqrt(np.einsum("ij,ij->i", d, d))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = d / dist[:, None]
+        vn = np.einsum("ij,ij->i", vel[j] - vel[i], n)
+        ok = (dist > 0) & (dist < radius[i] + radius[j]) & (vn < 0)
+        g, i, j, n, vn, dist = g[ok], i[ok], j[ok], n[ok], vn[ok], dist[ok]
+        # w grupie żadna kula nie powtarza się, więc przypisania indeksowe są bezpieczne
+        impulse = (-restitution * vn / 2)[:, None] * n
+        vel[i] -= impulse
+        vel[j] += impulse
+        push = ((radius[i] + radius[j] - dist) / 2)[:, None] * n
+        pos[i] -= push
+        pos[j] += push
+        resolved[g] = True
+    return resolved
+
+
+class BoxScene3D:
+    """Kule w sześciennym pudełku [-half, half]^3 bez grawitacji: odbicia od
+    ścian i między sobą, faza szeroka przez grid_pairs w 3D.
+
+    Domyślny rozmiar pudełka rośnie z liczbą kul tak, żeby gęstość była jak
+    w dawnej scenie VPython (25 kul o promieniu 0.3 w pudełku 10 x 10 x 10).
+    """
+
+    def __init__(self, count=25, half=None, radius=0.3, speed=3.0, seed=None, profiler=None):
+        rng = np.random.default_rng(seed)
+        self.half = half if half is not None else 5.0 * (count / 25) ** (1 / 3)
+        self.radius = np.full(count, radius)
+        inner = self.half - radius
+        self.pos = rng.uniform(-inner, inner, (count, 3))
+        self.vel = rng.uniform(-speed, speed, (count, 3))
+        # czas (s), przez który kula jest jeszcze "po zderzeniu" - kolor w podglądzie
+        self.timer = np.zeros(count)
+        self.checks = self.collisions = 0
+        self.profiler = profiler or PhaseProfiler()
+
+    def step(self, n_steps=1, dt=0.01):
+        profiler = self.profiler
+        pos, vel, radius, timer = self.pos, self.vel, self.radius, self.timer
+        limit = (self.half - radius)[:, None]
+        for _ in range(n_steps):
+            with profiler.phase("move"):
+                pos += vel * dt
+                timer -= dt
+            with profiler.phase("walls"):
+                # ścian dotyka garstka kul - poprawiamy tylko je
+                for side, rows, axes in ((1, *np.nonzero(pos > limit)), (-1, *np.nonzero(pos < -limit))):
+                    pos[rows, axes] = side * limit[rows, 0]
+                    vel[rows, axes] = -side * np.abs(vel[rows, axes])
+                    timer[rows] = 0.2
+            with profiler.phase("broadphase"):
+                candidates, pairs = grid_pairs(pos, radius)
+            with profiler.phase("narrowphase"):
+                resolved = collide_pairs_3d(pos, vel, radius, pairs)
+                timer[pairs[resolved].ravel()] = 0.2
+            self.checks, self.collisions = len(candidates), int(resolved.sum())
+
+    @property
+    def hit(self):
+        return self.timer > 0
+
+
+def run_headless_3d(steps=200, count=10_000, profiler=None, seed=0):
+    scene = BoxScene3D(count, seed=seed, profiler=profiler)
+    profiler = scene.profiler
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        scene.step()
+        profiler.end_frame()
+    elapsed = time.perf_counter() - t0
+    print(f"3D | Kulki: {count} | pudełko: {2 * scene.half:.1f} | kroki: {steps} | czas: {elapsed:.3f} s "
+          f"| {steps / elapsed:.1f} kroków/s | {count * steps / elapsed / 1e6:.2f} M kulko-kroków/s "
+          f"| pary w ostatnim kroku: {scene.checks} / {scene.collisions}")
+    if profiler.enabled:
+        profiler.report()
+        profiler.close()
+    return scene
+
+
+def run_vpython_box(count=25, shown=200, seed=None):
+    """Podgląd BoxScene3D w VPython. Fizyka liczy wszystkie kule, do VPython
+    trafia tylko losowa próbka shown kul (położenie i kolor)."""
     try:
         from vpython import sphere, box, vector, rate, color
     except Exception:
@@ -259,85 +1294,70 @@ def run_vpython_bouncing():
         return
 
     print("\nUruchamiam symulację 3D — zamknij okno, by zakończyć.")
-    N = 25
-    BOX_SIZE = 5
-    SPEED = 3.0
-    RADIUS = 0.3
-
-    for pos,size in [
-        (vector(0,BOX_SIZE,0), vector(2*BOX_SIZE,0.05,2*BOX_SIZE)),
-        (vector(0,-BOX_SIZE,0), vector(2*BOX_SIZE,0.05,2*BOX_SIZE)),
-        (vector(BOX_SIZE,0,0), vector(0.05,2*BOX_SIZE,2*BOX_SIZE)),
-        (vector(-BOX_SIZE,0,0), vector(0.05,2*BOX_SIZE,2*BOX_SIZE)),
-        (vector(0,0,BOX_SIZE), vector(2*BOX_SIZE,2*BOX_SIZE,0.05)),
-        (vector(0,0,-BOX_SIZE), vector(2*BOX_SIZE,2*BOX_SIZE,0.05))
+    scene = BoxScene3D(count, seed=seed)
+    half = scene.half
+    for pos, size in [
+        (vector(0, half, 0), vector(2*half, 0.05, 2*half)),
+        (vector(0, -half, 0), vector(2*half, 0.05, 2*half)),
+        (vector(half, 0, 0), vector(0.05, 2*half, 2*half)),
+        (vector(-half, 0, 0), vector(0.05, 2*half, 2*half)),
+        (vector(0, 0, half), vector(2*half, 2*half, 0.05)),
+        (vector(0, 0, -half), vector(2*half, 2*half, 0.05))
     ]:
-        box(pos=pos, size=size, color=color.gray(0.5))
-
-    class Ball:
-        def __init__(self, pos, vel):
-            self.obj = sphere(pos=pos, radius=RADIUS, color=color.green)
-            self.vel = vel
-            self.timer = 0
-
-        def update(self, dt):
-            self.obj.pos += self.vel * dt
-            for axis in ['x','y','z']:
-                val = getattr(self.obj.pos, axis)
-                if val + RADIUS > BOX_SIZE:
-                    setattr(self.obj.pos, axis, BOX_SIZE - RADIUS)
-                    setattr(self.vel, axis, -getattr(self.vel, axis))
-                    self.mark_collision()
-                elif val - RADIUS < -BOX_SIZE:
-                    setattr(self.obj.pos, axis, -BOX_SIZE + RADIUS)
-                    setattr(self.vel, axis, -getattr(self.vel, axis))
-                    self.mark_collision()
-            if self.timer > 0:
-                self.timer -= dt
-                if self.timer <= 0:
-                    self.obj.color = color.green
-
-        def mark_collision(self):
-            self.obj.color = color.red
-            self.timer = 0.2
-
-    balls = [
-        Ball(vector(random.uniform(-BOX_SIZE+RADIUS, BOX_SIZE-RADIUS),
-                    random.uniform(-BOX_SIZE+RADIUS, BOX_SIZE-RADIUS),
-                    random.uniform(-BOX_SIZE+RADIUS, BOX_SIZE-RADIUS)),
-             vector(random.uniform(-SPEED, SPEED),
-                    random.uniform(-SPEED, SPEED),
-                    random.uniform(-SPEED, SPEED)))
-        for _ in range(N)
-    ]
-
-    def collide(a, b):
-        dp = b.obj.pos - a.obj.pos
-        dist = dp.mag
-        if dist < 2 * RADIUS:
-            n = dp.hat
-            rel = b.vel - a.vel
-            vn = rel.dot(n)
-            if vn < 0:
-                j = -1.1 * vn / 2
-                a.vel -= j*n
-                b.vel += j*n
-                overlap = (2*RADIUS - dist)/2
-                a.obj.pos -= n*overlap
-                b.obj.pos += n*overlap
-                a.mark_collision(); b.mark_collision()
+        box(pos=pos, size=size, color=color.gray(0.5), opacity=0.2)
 
+    sample = np.sort(np.random.default_rng(seed).choice(count, min(count, shown), replace=False))
+    spheres = [sphere(pos=vector(*scene.pos[k]), radius=scene.radius[k], color=color.green)
+               for k in sample.tolist()]
     dt = 0.01
     while True:
         rate(100)
-        for b in balls: b.update(dt)
-        for i in range(N):
-            for j in range(i+1, N):
-                collide(balls[i], balls[j])
+        scene.step(dt=dt)
+        for s, p, hit in zip(spheres, scene.pos[sample].tolist(), scene.hit[sample].tolist()):
+            s.pos = vector(*p)
+            s.color = color.red if hit else color.green
 
 
 if __name__ == "__main__":
-    benchmark_detection(counts=(200, 500, 1000), trials=3)
-    print("Uruchamiam symulację 2D...")
-    run_pygame_simulation(initial_count=200)
-    run_vpython_bouncing()
+    parser = argparse.ArgumentParser(description="Wykrywanie kolizji 2D: Brute Force vs Sweep & Prune vs Spatial Hash")
+    parser.add_argument("--headless", action="store_true", help="liczy fizykę 2D bez okna i podaje kroki/s")
+    parser.add_argument("--steps", type=int, default=1000, help="liczba kroków w trybie --headless")
+    parser.add_argument("--balls", type=int, default=200, help="liczba kulek w trybie --headless")
+    parser.add_argument("--algorithm", choices=list(RESOLVERS) + ["auto"], default="sap",
+                        help="auto - wybór co sekundę na podstawie statystyk sceny (circle_stats)")
+    parser.add_argument("--churn", action="store_true",
+                        help="kroki/s przy ciągłym dodawaniu i usuwaniu kulek (--balls, --steps)")
+    parser.add_argument("--benchmark", action="store_true", help="tylko benchmark detekcji, bez symulacji")
+    parser.add_argument("--scenario", choices=list(SCENARIOS), nargs="+", default=list(SCENARIOS),
+                        help="scenariusze benchmarku (domyślnie wszystkie)")
+    parser.add_argument("--large", action="store_true",
+                        help="benchmark także SAP NumPy dla 10^4-10^6 kół (kilka sekund, kilkaset MiB)")
+    parser.add_argument("--fit-selector", action="store_true",
+                        help="dopasuj SELECTOR_COSTS do pomiarów na scenariuszach (--scenario)")
+    parser.add_argument("--record", metavar="DIR", help="zapisz trajektorie 2D do katalogu (recorder.py replay DIR)")
+    parser.add_argument("--box3d", action="store_true",
+                        help="kulki w pudełku 3D (z --headless bez okna, inaczej podgląd VPython)")
+    parser.add_argument("--shown", type=int, default=200, help="ile kul 3D pokazać w VPython")
+    parser.add_argument("--profile", action="store_true", help="czasy faz kroku (HUD / podsumowanie)")
+    parser.add_argument("--profile-out", metavar="FILE", help="czasy faz każdej klatki do .csv albo .jsonl")
+    args = parser.parse_args()
+    profiler = PhaseProfiler(args.profile or bool(args.profile_out), export=args.profile_out)
+    large_counts = (10**4, 10**5, 10**6) if args.large else ()
+    if args.box3d and args.headless:
+        run_headless_3d(args.steps, args.balls, profiler)
+    elif args.box3d:
+        run_vpython_box(args.balls, args.shown)
+    elif args.headless:
+        run_headless(args.steps, args.balls, args.algorithm, args.record, profiler)
+    elif args.churn:
+        benchmark_churn(args.balls, args.steps)
+    elif args.fit_selector:
+        fit_selector_costs(scenarios=args.scenario)
+    elif args.benchmark:
+        benchmark_detection(counts=(200, 1000, 2000), trials=3, large_counts=large_counts,
+                            scenarios=args.scenario)
+    else:
+        benchmark_detection(counts=(200, 500, 1000), trials=3, large_counts=large_counts)
+        print("Uruchamiam symulację 2D...")
+        run_pygame_simulation(initial_count=200, record=args.record, profiler=profiler, algorithm=args.algorithm)
+        run_vpython_bouncing()